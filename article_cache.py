@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from cache_store import CACHE_DIR, SQLiteCache
+from http_fetcher import FetchResult, fetch_articles, fetch_page
+
+# entries younger than this are served without touching the network
+ARTICLE_TTL = float(os.getenv("ARTICLE_CACHE_TTL", 6 * 3600))
+ARTICLE_CACHE_MAX_BYTES = int(os.getenv("ARTICLE_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+
+def _validators(headers: Dict[str, str]) -> Dict[str, str]:
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    return {'etag': headers.get('etag', ''), 'last_modified': headers.get('last-modified', '')}
+
+
+class ArticleCache:
+    """
+    URL-keyed cache of parsed articles.
+
+    Each entry holds content, publish_date, title, fetch time and the
+    ETag/Last-Modified validators of the response it came from. Entries
+    within `ttl` are served directly; older entries with validators are
+    revalidated with a conditional GET, so unchanged articles cost a 304
+    instead of a download and re-parse. When refreshing a stale entry fails
+    the stale article is served rather than dropped.
+    """
+
+    def __init__(self, path: str = None, ttl: float = ARTICLE_TTL, max_bytes: int = ARTICLE_CACHE_MAX_BYTES):
+        self.store = SQLiteCache(path or os.path.join(CACHE_DIR, 'articles.sqlite'), ttl=None, max_bytes=max_bytes)
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stale': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+        metrics.inc('article_cache_total', n, result=key)
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for url regardless of age, or None."""
+        return self.store.get(url)
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry['fetched_at'] <= self.ttl
+
+    def save(self, url: str, article: Dict[str, Any], title: str = '', headers: Dict[str, str] = None):
+        entry = {
+            'content': article['content'],
+            'publish_date': article['publish_date'],
+            'title': title,
+            'fetched_at': time.time(),
+            **_validators(headers),
+        }
+        self.store.set(url, entry)
+        return entry
+
+    def touch(self, url: str, entry: Dict[str, Any]):
+        """Record a successful revalidation (HTTP 304)."""
+        entry['fetched_at'] = time.time()
+        self.store.set(url, entry)
+
+    @staticmethod
+    def conditional_headers(entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def as_article(entry: Dict[str, Any], via: str = 'cache') -> Dict[str, str]:
+        """`via` records what served it: 'cache', 'revalidated' (a 304) or 'stale' (the refresh failed)."""
+        return {'content': entry['content'], 'publish_date': entry['publish_date'], 'fetched_via': via}
+
+    def get_or_fetch(self, url: str, fetch: Callable[[str], Tuple[Dict[str, str], Dict[str, str]]],
+                     parse: Callable[[str], Dict[str, str]] = None, title: str = '') -> Dict[str, str]:
+        """
+        Return the article for url, using the cache where possible.
+
+        fetch: full fetch used on a miss, url -> (article, response headers);
+            the headers' validators let the entry be revalidated once stale
+            (a browser crawl has none: pass {}).
+        parse: html -> article, enables conditional-GET revalidation of stale entries.
+        """
+        entry = self.lookup(url)
+        if entry and self.is_fresh(entry):
+            self._count('hits')
+            return self.as_article(entry)
+
+        conditional = self.conditional_headers(entry) if entry else {}
+        if conditional and parse is not None:
+            result = fetch_page(url, headers=conditional)
+            try:
+                if result.status == 304:
+                    self._count('revalidated')
+                    self.touch(url, entry)
+                    return self.as_article(entry, 'revalidated')
+                if result.error:
+                    raise RuntimeError(result.error)
+                if result.ok:
+                    article = parse(result.text)
+                    if article['content']:
+                        article['fetched_via'] = 'http'
+                        self._count('misses')
+                        self.save(url, article, title or entry.get('title', ''), result.headers)
+                        return article
+            except Exception as e:
+                print(f"Revalidation failed for {url}: {e}")
+
+        self._count('misses')
+        try:
+            article, headers = fetch(url)
+        except Exception as e:
+            if not entry:
+                raise
+            print(f"Refetching {url} failed: {e}")
+            article, headers = {'content': '', 'publish_date': ''}, {}
+        if article['content']:
+            self.save(url, article, title, headers)
+        elif entry:
+            print(f"Could not refresh {url}, serving the cached copy")
+            self._count('stale')
+            return self.as_article(entry, 'stale')
+        return article
+
+    def fetch_many(self, urls: List[str], parse: Callable[[str], Dict[str, str]], titles: Dict[str, str] = None,
+                   on_result: Callable[[FetchResult, Any], None] = None, **fetcher_kwargs) -> Dict[str, Dict[str, str]]:
+        """
+        Concurrent variant for plain-HTTP sources: fresh entries are served
+        from the cache, stale ones are revalidated (or served as they are when
+        that fails) and misses are downloaded, all through one
+        `http_fetcher.fetch_articles` call.
+        """
+        titles = titles or {}
+        articles, entries, headers, to_fetch = {}, {}, {}, []
+        for url in dict.fromkeys(urls):
+            entry = self.lookup(url)
+            if entry and self.is_fresh(entry):
+                articles[url] = self.as_article(entry)
+                continue
+            if entry:
+                entries[url] = entry
+                headers[url] = self.conditional_headers(entry)
+            to_fetch.append(url)
+        self._count('hits', len(articles))
+
+        def handle(result: FetchResult, article):
+            entry = entries.get(result.url)
+            if result.status == 304 and entry is not None:
+                self._count('revalidated')
+                self.touch(result.url, entry)
+                articles[result.url] = self.as_article(entry, 'revalidated')
+            elif article is not None and (article['content'] or entry is None):
+                article['fetched_via'] = 'http'
+                self._count('misses')
+                if article['content']:
+                    self.save(result.url, article, titles.get(result.url, ''), result.headers)
+                articles[result.url] = article
+            elif entry is not None:
+                # the refresh failed or came back empty: the stale copy beats no article
+                self._count('stale')
+                articles[result.url] = self.as_article(entry, 'stale')
+            if on_result is not None:
+                on_result(result, articles.get(result.url))
+
+        if to_fetch:
+            fetch_articles(to_fetch, parse, on_result=handle, headers=headers, **fetcher_kwargs)
+        return articles
+
+
+_default_cache: Optional[ArticleCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_article_cache() -> Optional[ArticleCache]:
+    """Process-wide article cache, or None when disabled with ARTICLE_CACHE=0."""
+    global _default_cache
+    if os.getenv("ARTICLE_CACHE", "1") == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArticleCache()
+        return _default_cache
@@ -0,0 +1,302 @@
+"""
+Persistent store of crawled articles with a full-text index.
+
+Articles live in one SQLite database (.cache/articles.db): metadata in
+plain columns, bodies zlib-compressed, and an FTS5 index over title and
+body that stores no second copy of the text. Every crawl is written
+into it, tagged with its topic, so earlier crawls stay queryable by topic,
+source, publish date and full text without crawling again.
+
+Reads are lazy: `iter_articles` and `texts` stream rows from a cursor, so
+deduplication and analysis can walk a large topic with only the rows in
+flight held in memory.
+
+    store = ArticleStore()
+    store.add(articles, topic='Tesla')
+    for article in store.iter_articles(topic='Tesla', source='CNN', since='2025-11-01'):
+        ...
+    store.search('pay package', topic='Tesla')
+
+Usage from the command line:
+    python article_store.py search "pay package" --topic Tesla --since 2025-11-01
+    python article_store.py stats
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from cache_store import CACHE_DIR
+
+ARTICLE_STORE_PATH = os.getenv("ARTICLE_STORE_PATH", os.path.join(CACHE_DIR, 'articles.db'))
+
+# columns readable through iter_articles; content is decompressed on the way out
+FIELDS = ('id', 'url', 'title', 'source', 'publish_date', 'content', 'fetched_via', 'fetched_at')
+META_FIELDS = tuple(field for field in FIELDS if field != 'content')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    source TEXT NOT NULL,
+    publish_date TEXT NOT NULL,
+    content BLOB NOT NULL,
+    content_hash TEXT NOT NULL,
+    fetched_via TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_source_date ON articles(source, publish_date);
+CREATE INDEX IF NOT EXISTS articles_date ON articles(publish_date);
+CREATE TABLE IF NOT EXISTS article_topics (
+    topic TEXT NOT NULL,
+    article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (topic, article_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, content, content='', tokenize='porter unicode61');
+"""
+
+
+def _normalize_topic(topic: str) -> str:
+    return topic.strip().lower()
+
+
+def _content_hash(title: str, content: str) -> str:
+    return hashlib.sha1(f"{title}\0{content}".encode('utf-8')).hexdigest()
+
+
+class ArticleStore:
+    """
+    SQLite article store. Safe to share between threads; every method
+    runs under one lock on a single connection.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or ARTICLE_STORE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def add(self, articles: Iterable[Dict[str, Any]], topic: str = None) -> List[int]:
+        """
+        Insert or update articles (keyed by url) and tag them with topic.
+        Unchanged articles are not rewritten. Returns their ids in input order.
+        """
+        ids = []
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for article in articles:
+                    ids.append(self._upsert(article, now))
+                if topic:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO article_topics (topic, article_id, seen_at) VALUES (?, ?, ?)",
+                        [(_normalize_topic(topic), article_id, now) for article_id in ids])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def _upsert(self, article: Dict[str, Any], now: float) -> int:
+        title, content = article.get('title', ''), article.get('content', '')
+        digest = _content_hash(title, content)
+        row = self._conn.execute("SELECT id, title, content, content_hash FROM articles WHERE url = ?",
+                                 (article['url'],)).fetchone()
+        if row is not None and row[3] == digest:
+            return row[0]
+
+        values = (title, article.get('source', ''), article.get('publish_date', ''),
+                  zlib.compress(content.encode('utf-8')), digest, article.get('fetched_via', ''), now)
+        if row is None:
+            cursor = self._conn.execute(
+                "INSERT INTO articles (title, source, publish_date, content, content_hash, fetched_via, fetched_at, url)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values + (article['url'],))
+            article_id = cursor.lastrowid
+        else:
+            article_id = row[0]
+            # a contentless FTS5 index forgets a row only when given the exact text it indexed
+            self._conn.execute("INSERT INTO articles_fts (articles_fts, rowid, title, content) "
+                               "VALUES ('delete', ?, ?, ?)", (article_id, row[1], zlib.decompress(row[2]).decode('utf-8')))
+            self._conn.execute(
+                "UPDATE articles SET title = ?, source = ?, publish_date = ?, content = ?, content_hash = ?, "
+                "fetched_via = ?, fetched_at = ? WHERE id = ?", values + (article_id,))
+        self._conn.execute("INSERT INTO articles_fts (rowid, title, content) VALUES (?, ?, ?)",
+                           (article_id, title, content))
+        return article_id
+
+    @staticmethod
+    def _where(topic: str = None, source: str = None, since: str = None, until: str = None,
+               query: str = None, ids: Sequence[int] = None):
+        clauses, params = [], []
+        if topic:
+            clauses.append("a.id IN (SELECT article_id FROM article_topics WHERE topic = ?)")
+            params.append(_normalize_topic(topic))
+        if source:
+            clauses.append("a.source = ?")
+            params.append(source)
+        if since:
+            clauses.append("a.publish_date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("a.publish_date <= ?")
+            params.append(until)
+        if query:
+            clauses.append("a.id IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)")
+            params.append(query)
+        if ids is not None:
+            clauses.append(f"a.id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def ids(self, **filters) -> List[int]:
+        """Ids matching the filters (topic, source, since, until, query), newest first."""
+        where, params = self._where(**filters)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                f"SELECT a.id FROM articles a{where} ORDER BY a.publish_date DESC, a.id", params)]
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM articles a{where}", params).fetchone()[0]
+
+    def iter_articles(self, ids: Sequence[int] = None, fields: Sequence[str] = FIELDS, batch: int = 256,
+                      **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Stream articles as dicts, `batch` rows at a time. With `ids` they come
+        in that order, otherwise newest first. Leave 'content' out of `fields`
+        to skip decompressing bodies.
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"unknown fields {sorted(unknown)}")
+        columns = ', '.join(f'a.{field}' for field in fields)
+        if ids is not None:
+            for start in range(0, len(ids), batch):
+                chunk = list(ids[start:start + batch])
+                where, params = self._where(ids=chunk, **filters)
+                with self._lock:
+                    rows = {row[0]: row for row in self._conn.execute(
+                        f"SELECT a.id, {columns} FROM articles a{where}", params)}
+                for article_id in chunk:
+                    if article_id in rows:
+                        yield self._as_dict(fields, rows[article_id][1:])
+            return
+
+        where, params = self._where(**filters)
+        last = None
+        # keyset pagination: the lock is only held while a batch is read
+        while True:
+            page_where, page_params = where, list(params)
+            if last is not None:
+                page_where += (' AND ' if where else ' WHERE ') + "(a.publish_date < ? OR (a.publish_date = ? AND a.id > ?))"
+                page_params += [last[0], last[0], last[1]]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT a.publish_date, a.id, {columns} FROM articles a{page_where} "
+                    f"ORDER BY a.publish_date DESC, a.id LIMIT ?", page_params + [batch]).fetchall()
+            for row in rows:
+                yield self._as_dict(fields, row[2:])
+            if len(rows) < batch:
+                return
+            last = rows[-1][:2]
+
+    @staticmethod
+    def _as_dict(fields: Sequence[str], row: Sequence[Any]) -> Dict[str, Any]:
+        article = dict(zip(fields, row))
+        if 'content' in article:
+            article['content'] = zlib.decompress(article['content']).decode('utf-8')
+        return article
+
+    def get(self, ids: Sequence[int], fields: Sequence[str] = FIELDS) -> List[Dict[str, Any]]:
+        return list(self.iter_articles(ids, fields))
+
+    def texts(self, ids: Sequence[int]) -> Iterator[str]:
+        """title + ' ' + content per id (see dedup.news_texts), decompressed one batch at a time."""
+        for article in self.iter_articles(ids, ('title', 'content')):
+            yield article['title'] + ' ' + article['content']
+
+    def search(self, query: str, limit: int = 20, **filters) -> List[Dict[str, Any]]:
+        """Best full-text matches (FTS5 query syntax, bm25 ranking) without their bodies."""
+        where, params = self._where(**filters)
+        match = "a.id = f.rowid AND articles_fts MATCH ?"
+        where = (where + ' AND ' + match) if where else ' WHERE ' + match
+        with self._lock:
+            ranked = [row[0] for row in self._conn.execute(
+                f"SELECT a.id FROM articles a, articles_fts f{where} ORDER BY bm25(articles_fts) LIMIT ?",
+                params + [query, limit])]
+        return self.get(ranked, META_FIELDS)
+
+    def topics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT topic, COUNT(*) FROM article_topics GROUP BY topic ORDER BY topic"))
+
+
+_default_store: Optional[ArticleStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_article_store() -> ArticleStore:
+    """Process-wide article store."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ArticleStore()
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the article store")
+    parser.add_argument('--path', default=None)
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help='full-text search')
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=20)
+    listing = commands.add_parser('list', help='articles by topic, source and date')
+    for command in (search, listing):
+        command.add_argument('--topic')
+        command.add_argument('--source')
+        command.add_argument('--since', help='YYYY-MM-DD')
+        command.add_argument('--until', help='YYYY-MM-DD')
+    commands.add_parser('stats', help='articles per topic')
+    args = parser.parse_args()
+
+    store = ArticleStore(args.path)
+    if args.command == 'stats':
+        print(f"{len(store)} articles")
+        for topic, count in store.topics().items():
+            print(f"  {topic}: {count}")
+        return
+    filters = {'topic': args.topic, 'source': args.source, 'since': args.since, 'until': args.until}
+    if args.command == 'search':
+        articles = store.search(args.query, limit=args.limit, **filters)
+    else:
+        articles = store.iter_articles(fields=META_FIELDS, **filters)
+    for article in articles:
+        print(f"{article['publish_date'] or '----------'}  {article['source']:<10} {article['title']}\n    {article['url']}")
+
+
+if __name__ == '__main__':
+    main()
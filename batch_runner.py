@@ -0,0 +1,180 @@
+"""
+Generate reports for many topics in one process.
+
+Topics share the browser pool, the article and LLM caches, the HTTP
+sessions and one LLM client. Crawling and summarizing run in separate
+worker pools: while one topic waits on the LLM the next ones are
+already being crawled.
+
+Usage:
+    python batch_runner.py Tesla "Federal Reserve" Gaza --output-dir reports
+    python batch_runner.py --topics-file topics.txt --crawl-workers 2 --llm-workers 4
+    python batch_runner.py Tesla --metrics metrics.prom --trace
+    python batch_runner.py Tesla --incremental   # hourly refresh: only crawl what is new
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import metrics
+from article_store import get_article_store
+from news_pipeline import NewsSummaryPipeline
+from watermarks import get_watermark_store
+
+CRAWL_WORKERS = 2
+LLM_WORKERS = 4
+
+
+def topic_filename(topic: str) -> str:
+    slug = re.sub(r'[^\w]+', '_', topic.strip().lower()).strip('_')
+    return f"{slug or 'topic'}.html"
+
+
+def unique_topics(topics: List[str]) -> List[str]:
+    """
+    Topics in input order, one per report file. Spellings of the same topic
+    ("Tesla", " tesla") are merged into the first one; different topics that
+    would share a file ("C++", "C#") raise ValueError.
+    """
+    by_file: Dict[str, str] = {}
+    for topic in topics:
+        name = topic_filename(topic)
+        first = by_file.setdefault(name, topic)
+        if first == topic:
+            continue
+        if first.strip().lower() != topic.strip().lower():
+            raise ValueError(f"topics {first!r} and {topic!r} would both be written to {name}")
+        print(f"Topic {topic!r} is the same as {first!r}, merged")
+    return list(by_file.values())
+
+
+def _summarize_topic(pipeline: NewsSummaryPipeline, news: List[Dict], output_file: str,
+                     report: Dict[str, Any], queued_at: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    report['llm_wait'] = round(start - queued_at, 2)
+    try:
+        pipeline.write_report(news, output_file)
+        report['status'] = 'ok'
+        report['output'] = output_file
+    except Exception as e:
+        print(f"Error summarizing {pipeline.topic}: {e}")
+        report['status'] = 'failed'
+        report['error'] = str(e)
+    report['summarize'] = round(time.perf_counter() - start, 2)
+    return report
+
+
+def _crawl_topic(pipeline: NewsSummaryPipeline, output_file: str, llm_executor: ThreadPoolExecutor,
+                 started_at: float) -> Future:
+    report = {'topic': pipeline.topic, 'output': '', 'status': '', 'error': ''}
+    start = time.perf_counter()
+    report['crawl_wait'] = round(start - started_at, 2)
+    try:
+        news = pipeline.collect_news()
+    except Exception as e:
+        print(f"Error crawling {pipeline.topic}: {e}")
+        news = None
+        report.update(status='failed', error=str(e))
+    report['crawl'] = round(time.perf_counter() - start, 2)
+    report['articles'] = len(news or [])
+    report['sources'] = pipeline.fetch_stats
+
+    done = Future()
+    if news is None:
+        done.set_result(report)
+    elif not news and pipeline.dedup_index is not None:
+        report['status'] = 'unchanged'
+        done.set_result(report)
+    else:
+        done = llm_executor.submit(_summarize_topic, pipeline, news, output_file, report, time.perf_counter())
+    return done
+
+
+def run_topics(topics: List[str], output_dir: str = '.', crawl_workers: int = CRAWL_WORKERS,
+               llm_workers: int = LLM_WORKERS, **pipeline_kwargs) -> List[Dict[str, Any]]:
+    """
+    Run the pipeline for every topic and return one timing report per topic,
+    in input order (see unique_topics for topics sharing a report file): seconds spent waiting for and in each stage, article
+    count, per-source fetch stats, output file and status.
+
+    crawl_workers: topics crawled at the same time (each crawls its sources in parallel).
+    llm_workers: topics summarized at the same time.
+    pipeline_kwargs: passed to every NewsSummaryPipeline (llm, dedup_index, ...).
+    """
+    topics = unique_topics(topics)
+    os.makedirs(output_dir, exist_ok=True)
+    pipelines = []
+    for topic in topics:
+        pipeline = NewsSummaryPipeline(topic=topic, **pipeline_kwargs)
+        # one client (and connection pool) for every topic
+        pipeline_kwargs.setdefault('llm', pipeline.llm)
+        pipelines.append(pipeline)
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix='summarize') as llm_executor, \
+            ThreadPoolExecutor(max_workers=crawl_workers, thread_name_prefix='crawl') as crawl_executor:
+        crawls = [crawl_executor.submit(_crawl_topic, pipeline, os.path.join(output_dir, topic_filename(pipeline.topic)),
+                                        llm_executor, started_at)
+                  for pipeline in pipelines]
+        reports = [crawl.result().result() for crawl in crawls]
+
+    for report in reports:
+        report['total'] = round(report.get('crawl_wait', 0) + report.get('crawl', 0)
+                                + report.get('llm_wait', 0) + report.get('summarize', 0), 2)
+    print(f"{len(topics)} topics finished in {time.perf_counter() - started_at:.1f}s")
+    return reports
+
+
+def print_report(reports: List[Dict[str, Any]]):
+    print(f"{'topic':<30} {'status':<10} {'articles':>8} {'crawl':>8} {'llm wait':>9} {'summarize':>10} {'total':>8}")
+    for r in reports:
+        print(f"{r['topic'][:30]:<30} {r['status']:<10} {r['articles']:>8} {r.get('crawl', 0):>8.1f} "
+              f"{r.get('llm_wait', 0):>9.1f} {r.get('summarize', 0):>10.1f} {r['total']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('topics', nargs='*')
+    parser.add_argument('--topics-file', help='file with one topic per line')
+    parser.add_argument('--output-dir', default='reports')
+    parser.add_argument('--crawl-workers', type=int, default=CRAWL_WORKERS)
+    parser.add_argument('--llm-workers', type=int, default=LLM_WORKERS)
+    parser.add_argument('--report', help='also write the timing report as JSON to this file')
+    parser.add_argument('--gzip', action='store_true', help='also write a pre-compressed .html.gz per topic')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only crawl results earlier runs did not process and merge them into the stored set')
+    parser.add_argument('--store', action='store_true', help='keep every crawl in the article store')
+    parser.add_argument('--metrics', help='write metrics here (.prom/.txt: Prometheus text, otherwise JSON)')
+    parser.add_argument('--trace', action='store_true', help='also record tracing spans (JSON output only)')
+    args = parser.parse_args()
+
+    topics = list(args.topics)
+    if args.topics_file:
+        with open(args.topics_file, encoding='utf-8') as f:
+            topics += [line.strip() for line in f if line.strip()]
+    if not topics:
+        parser.error('no topics given')
+    try:
+        topics = unique_topics(topics)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.metrics:
+        metrics.enable(tracing=args.trace)
+
+    reports = run_topics(topics, args.output_dir, crawl_workers=args.crawl_workers, llm_workers=args.llm_workers,
+                         gzip_output=args.gzip, watermarks=get_watermark_store() if args.incremental else None,
+                         article_store=get_article_store() if args.store else None)
+    print_report(reports)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+    if args.metrics:
+        metrics.write(args.metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Pages/sec of the crawler article stage with and without the shared browser pool.
+
+Loads the local HTML fixtures through the real `get_article_content` functions,
+once with a pool that recycles the browser after every page (the old
+one-browser-per-article behaviour) and once with a warm pool.
+
+Usage (from the repo root, needs msedgedriver):
+    python -m benchmarks.bench_browser_pool --pages 30 --pool-size 3
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import crawl_bbc
+import crawl_cnn
+from browser_pool import BrowserPool, set_browser_pool
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+CASES = [
+    (crawl_cnn.get_article_content, (FIXTURES / 'cnn_article.html').resolve().as_uri()),
+    (crawl_bbc.get_article_content, (FIXTURES / 'bbc_article.html').resolve().as_uri()),
+]
+
+
+def run(pool: BrowserPool, pages: int, workers: int) -> dict:
+    set_browser_pool(pool)
+    jobs = [CASES[i % len(CASES)] for i in range(pages)]
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda job: job[0](job[1]), jobs))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    pool.close()
+
+    return {
+        'pages': pages,
+        'ok': sum(1 for r in results if r['content']),
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2),
+        'cpu_seconds': round(cpu, 3),
+        'pool_stats': dict(pool.stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--pool-size', type=int, default=3)
+    args = parser.parse_args()
+
+    results = {
+        # max_pages=1 quits the browser after each page, i.e. no reuse
+        'no_pool': run(BrowserPool(size=1, max_pages=1), args.pages, workers=1),
+        'pool_serial': run(BrowserPool(size=1, max_pages=1000), args.pages, workers=1),
+        'pool_parallel': run(BrowserPool(size=args.pool_size, max_pages=1000), args.pages, workers=args.pool_size),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
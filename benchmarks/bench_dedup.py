@@ -0,0 +1,110 @@
+"""
+Near-duplicate detection: the previous dense cosine_similarity + double loop
+vs the sparse prefix-filtered search in dedup.py, on synthetic articles.
+
+A fraction of the synthetic articles are lightly edited copies of earlier ones,
+so both implementations have real duplicates to merge; their outputs are
+compared whenever the dense baseline is run.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_dedup --sizes 1000 10000 100000
+"""
+import argparse
+import copy
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from dedup import DEDUP_THRESHOLD, deduplicate, news_texts, tfidf_matrix
+
+SOURCES = ['CNN', 'AP News', 'BBC News']
+
+
+def synthetic_news(n, vocab_size=30000, words=150, dup_rate=0.1, edit_rate=0.03, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}x" for i in range(vocab_size)])
+    # Zipf-like word frequencies, like real text
+    probs = 1.0 / np.arange(1, vocab_size + 1) ** 1.1
+    probs /= probs.sum()
+
+    docs = []
+    for i in range(n):
+        if docs and rng.random() < dup_rate:
+            tokens = docs[rng.integers(len(docs))].copy()
+            edits = rng.random(len(tokens)) < edit_rate
+            tokens[edits] = rng.choice(vocab, size=edits.sum(), p=probs)
+        else:
+            tokens = rng.choice(vocab, size=words, p=probs)
+        docs.append(tokens)
+
+    return [{
+        'title': ' '.join(tokens[:8]),
+        'content': ' '.join(tokens[8:]),
+        'url': f'https://example.com/{i}',
+        'source': SOURCES[i % len(SOURCES)],
+    } for i, tokens in enumerate(docs)]
+
+
+def dense_deduplicate(news_list):
+    """The implementation deduplicate_news shipped with before dedup.py."""
+    _, tfidf = tfidf_matrix(news_texts(news_list))
+    similarity_matrix = cosine_similarity(tfidf)
+
+    unique_news = []
+    seen_indices = set()
+    for i, news in enumerate(news_list):
+        if i in seen_indices:
+            continue
+        seen_indices.add(i)
+        news['urls'] = [news['url']]
+        for j in range(i + 1, len(news_list)):
+            if j not in seen_indices and similarity_matrix[i, j] >= DEDUP_THRESHOLD:
+                news['urls'].append(news_list[j]['url'])
+                if news_list[j]['source'] not in news['source']:
+                    news['source'] += ', ' + news_list[j]['source']
+                seen_indices.add(j)
+        unique_news.append(news)
+    return unique_news
+
+
+def measure(fn, news_list):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(news_list)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {'seconds': round(elapsed, 3), 'peak_mb': round(peak / 2 ** 20, 1), 'unique': len(result)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dense-max', type=int, default=10000,
+                        help='largest size to run the dense baseline on (n^2 float64 memory)')
+    args = parser.parse_args()
+
+    report = []
+    for n in args.sizes:
+        news = synthetic_news(n)
+        row = {'articles': n}
+
+        sparse_result, row['sparse'] = measure(deduplicate, copy.deepcopy(news))
+        if n <= args.dense_max:
+            dense_result, row['dense'] = measure(dense_deduplicate, copy.deepcopy(news))
+            row['identical'] = ([a['urls'] for a in dense_result] == [a['urls'] for a in sparse_result]
+                                and [a['source'] for a in dense_result] == [a['source'] for a in sparse_result])
+            row['speedup'] = round(row['dense']['seconds'] / row['sparse']['seconds'], 1)
+        else:
+            row['dense'] = f'skipped (needs ~{n * n * 8 / 2 ** 30:.0f} GB for the similarity matrix)'
+        report.append(row)
+        print(json.dumps(row), flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Embedding for visualization: the dense path visualize.ipynb used to take
+(TF-IDF .toarray() + 1e-10 and an X @ X.T heatmap) vs embedding_viz
+(sparse TF-IDF, TruncatedSVD, centroid similarity), on synthetic articles.
+
+Each size also times a second, cached call of embedding_viz.embed.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_embedding --sizes 1000 10000 100000
+    python -m benchmarks.bench_embedding --sizes 20000 --method tsne
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_dedup import synthetic_news
+
+
+def dense_embedding(documents):
+    """What the notebook did before the 2-D projection."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    X = TfidfVectorizer(stop_words='english', norm='l2').fit_transform(d['text'] for d in documents).toarray() + 1e-10
+    return X @ X.T
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': round(elapsed, 3), 'peak_mb': round(peak / 2 ** 20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--topics', type=int, default=20)
+    parser.add_argument('--method', default='svd', help='2-D projection: svd, tsne or umap')
+    parser.add_argument('--dense-max', type=int, default=5000,
+                        help='largest size to run the dense baseline on (n x vocabulary float64 memory)')
+    args = parser.parse_args()
+
+    # a fresh cache, so the first call of every size really computes
+    os.environ['EMBED_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench_embedding_')
+    from embedding_viz import Corpus, embed, label_similarity
+
+    report = []
+    for n in args.sizes:
+        documents = [{'text': news['title'] + ' ' + news['content'], 'label': f'topic {i % args.topics}',
+                      'role': 'article', 'title': news['title'], 'url': news['url']}
+                     for i, news in enumerate(synthetic_news(n, dup_rate=0.0))]
+        corpus = Corpus()
+        corpus._sources.append(lambda: iter(documents))
+        row = {'articles': n}
+
+        def run():
+            result = embed(corpus, method=args.method)
+            label_similarity(result['reduced'], result['labels'])
+
+        row['sparse'] = measure(run)
+        row['cached'] = measure(run)
+        if n <= args.dense_max:
+            row['dense'] = measure(lambda: dense_embedding(documents))
+            row['speedup'] = round(row['dense']['seconds'] / row['sparse']['seconds'], 1)
+        else:
+            row['dense'] = 'skipped'
+        report.append(row)
+        print(json.dumps(row), flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+HTML extraction: the previous BeautifulSoup(html.parser) extractors vs the
+lxml/XPath ones in the crawlers, over the recorded fixtures and the saved
+pages in html/.
+
+Every extractor is run on every page and the outputs are compared. Parse
+time is the median of --repeat runs. Peak memory is the tracemalloc peak
+of one run; lxml builds its tree with malloc outside the Python heap, so
+for lxml the size of the parsed tree (glibc mallinfo2) is added to it.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_extract --repeat 50
+"""
+import argparse
+import ctypes
+import glob
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from benchmarks.fixture_server import FIXTURES
+from html_extract import parse_html
+from crawl_apnews import parse_ap_article, parse_ap_search_page
+from crawl_bbc import parse_article as parse_bbc_article, parse_search_page as parse_bbc_search_page
+from crawl_cnn import parse_article as parse_cnn_article, parse_search_page as parse_cnn_search_page
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --- the BeautifulSoup extractors the crawlers shipped with ---
+
+def bs4_cnn_article(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    content = ' '.join(p.get_text(strip=True) for p in
+                       soup.find_all('p', class_='paragraph-elevate inline-placeholder vossi-paragraph'))
+    publish_date = soup.find('span', class_="timestamp__time-since")
+    if publish_date:
+        dt = datetime.fromisoformat(publish_date['data-first-publish'].replace('Z', '+00:00'))
+        publish_date = dt.strftime("%Y-%m-%d")
+    else:
+        publish_date = ''
+    return {'content': content, 'publish_date': publish_date}
+
+
+def bs4_bbc_article(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    content_parts = []
+    for p in soup.select('div[data-component="text-block"] p.ssrcss-1q0x1qg-Paragraph'):
+        text = p.get_text(strip=True)
+        if text:
+            content_parts.append(text)
+    publish_date = ''
+    time_tag = soup.select_one('time[data-testid="timestamp"]')
+    if time_tag and time_tag.has_attr('datetime'):
+        dt = datetime.fromisoformat(time_tag['datetime'].replace('Z', '+00:00'))
+        publish_date = dt.strftime("%Y-%m-%d")
+    return {'content': ' '.join(content_parts), 'publish_date': publish_date}
+
+
+def bs4_ap_article(html):
+    soup = BeautifulSoup(html, "html.parser")
+    content = " ".join(p.get_text(strip=True) for p in soup.select("div.RichTextStoryBody p"))
+    publish_date = ""
+    t = soup.find("meta", attrs={"property": "article:published_time"})
+    if t and t.get("content"):
+        dt = datetime.fromisoformat(t["content"].replace("Z", "+00:00"))
+        publish_date = dt.strftime("%Y-%m-%d")
+    return {"content": content, "publish_date": publish_date}
+
+
+def bs4_cnn_search(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    news_list = []
+    for headline in soup.find_all(['span', 'a'], class_=lambda x: x and 'headline' in x)[:10]:
+        title = headline.get_text(strip=True)
+        if title and len(title) > 10:
+            link = headline.find_parent('a')
+            url = link.get('href') if link else ''
+            if url and not url.startswith('http'):
+                url = 'https://edition.cnn.com' + url
+            news_list.append({'title': title, 'url': url})
+    return news_list
+
+
+def bs4_bbc_search(html, size=100):
+    soup = BeautifulSoup(html, "html.parser")
+    news_list = []
+    for it in soup.select("li"):
+        if len(news_list) >= size:
+            break
+        link_tag = it.select_one("a.ssrcss-163mj99-PromoLink")
+        if not link_tag:
+            continue
+        title_tag = link_tag.select_one("p.ssrcss-1b1mki6-PromoHeadline")
+        news_list.append({"title": title_tag.get_text(strip=True) if title_tag else "", "url": link_tag["href"]})
+    return news_list
+
+
+def bs4_ap_search(html, size=100):
+    soup = BeautifulSoup(html, 'html.parser')
+    news_list = []
+    for card in soup.find_all('div', class_='PagePromo-title'):
+        if len(news_list) >= size:
+            break
+        a_tag = card.find('a')
+        if a_tag:
+            news_list.append({'title': a_tag.get_text(strip=True), 'url': a_tag['href']})
+    return news_list
+
+
+EXTRACTORS = {
+    'cnn_article': (bs4_cnn_article, parse_cnn_article),
+    'bbc_article': (bs4_bbc_article, parse_bbc_article),
+    'ap_article': (bs4_ap_article, parse_ap_article),
+    'cnn_search': (bs4_cnn_search, parse_cnn_search_page),
+    'bbc_search': (bs4_bbc_search, lambda html: parse_bbc_search_page(html, 100)),
+    'ap_search': (bs4_ap_search, lambda html: parse_ap_search_page(html, 100)),
+}
+
+
+def pages():
+    paths = sorted(glob.glob(os.path.join(FIXTURES, '*.html'))) + sorted(glob.glob(os.path.join(ROOT, 'html', '*.html')))
+    return {os.path.relpath(path, ROOT): path for path in paths}
+
+
+def native_extractor(page_name):
+    """The extractor a page was recorded for (cnn_article.html -> cnn_article), else None."""
+    name = os.path.splitext(os.path.basename(page_name))[0]
+    return name if name in EXTRACTORS else None
+
+
+def run_safely(fn, html):
+    try:
+        return fn(html)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+
+def time_it(fn, html, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_safely(fn, html)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+class _MallInfo2(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in
+                ('arena', 'ordblks', 'smblks', 'hblks', 'hblkhd', 'usmblks', 'fsmblks', 'uordblks', 'fordblks',
+                 'keepcost')]
+
+
+def _native_heap_bytes():
+    """Bytes currently malloc'ed outside the Python allocator, or None off glibc."""
+    try:
+        libc = ctypes.CDLL(None)
+        libc.mallinfo2.restype = _MallInfo2
+    except (OSError, AttributeError):
+        return None
+    info = libc.mallinfo2()
+    return info.uordblks + info.hblkhd
+
+
+def peak_kb(fn, html, native_tree=False):
+    extra = 0
+    if native_tree:
+        before = _native_heap_bytes()
+        tree = parse_html(html)
+        after = _native_heap_bytes()
+        extra = max(after - before, 0) if before is not None else 0
+        del tree
+    tracemalloc.start()
+    run_safely(fn, html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round((peak + extra) / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    report, mismatches = [], []
+    for page_name, path in pages().items():
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+
+        # every extractor must agree on every page, recorded for it or not
+        for extractor, (old, new) in EXTRACTORS.items():
+            if run_safely(old, html) != run_safely(new, html):
+                mismatches.append(f'{extractor} on {page_name}')
+
+        # timing and memory for the page's own extractor, or the CNN article one for other pages
+        extractor = native_extractor(page_name) or 'cnn_article'
+        old, new = EXTRACTORS[extractor]
+        row = {
+            'page': page_name,
+            'kb': round(len(html.encode('utf-8')) / 1024, 1),
+            'extractor': extractor,
+            'bs4_ms': round(time_it(old, html, args.repeat) * 1000, 3),
+            'lxml_ms': round(time_it(new, html, args.repeat) * 1000, 3),
+            'bs4_peak_kb': peak_kb(old, html),
+            'lxml_peak_kb': peak_kb(new, html, native_tree=True),
+        }
+        row['speedup'] = round(row['bs4_ms'] / row['lxml_ms'], 1)
+        report.append(row)
+        print(json.dumps(row), flush=True)
+
+    print(json.dumps({'pages': report, 'identical': not mismatches, 'mismatches': mismatches}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Offline end-to-end benchmark of NewsSummaryPipeline.
+
+The crawlers run against benchmarks.news_site (recorded pages served from a
+local HTTP server with configurable latency) and the LLM is a deterministic
+fake with configurable latency, so no network access or API key is needed.
+Each run times the stages of run_pipeline (fetch, dedup, summarize, render)
+for a given number of search results per source and writes one JSON
+report. Pass --baseline with an earlier report to fail on regressions.
+
+By default the browser is replaced by a plain HTTP "driver" (no browser
+install needed; the pool, waits and parsers still run). Use --browser edge
+to drive real Edge against the local site.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_pipeline --articles 5 10 20 --output bench.json
+    python -m benchmarks.bench_pipeline --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, List, Optional
+
+import requests
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+import metrics
+from benchmarks.news_site import NewsSite
+from html_extract import has_class, parse_html, select
+
+STAGES = ['fetch', 'dedup', 'summarize', 'render']
+
+FAKE_SUMMARY = {
+    'topic': 'Benchmark Topic',
+    'entities': {'organizations': ['Tesla'], 'people': ['Elon Musk'], 'locations': ['Austin'],
+                 'key_terms': ['pay package']},
+    'summary': 'Deterministic summary returned by the benchmark model.',
+    'timeline': [{'date': '2025-11-06', 'event': 'Shareholder vote', 'description': 'The package was approved.'}],
+}
+
+
+class FakeChatModel(SimpleChatModel):
+    """Stands in for ChatOpenAI: answers every prompt with FAKE_SUMMARY after `latency` seconds."""
+
+    latency: float = 1.0
+    model_name: str = 'benchmark-fake'
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'benchmark-fake'
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return json.dumps(FAKE_SUMMARY)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._call(messages, stop, run_manager, **kwargs)
+        for start in range(0, len(text), 16):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + 16]))
+
+
+class HTTPElement:
+    """
+    A found element. Unlike a bare lxml element, which is falsy when it has
+    no children, it is always true, as Selenium's waits expect.
+    """
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def text(self) -> str:
+        return self.element.text_content()
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        return self.element.get(name)
+
+
+class HTTPDriver:
+    """
+    The part of the Selenium WebDriver API the crawlers use, over plain HTTP.
+    Scripts are not executed; element lookups run against the fetched page.
+    """
+
+    current_window_handle = 'http-driver'
+
+    def __init__(self):
+        self._session = requests.Session()
+        self.page_source = ''
+        self._root = parse_html('')
+
+    def get(self, url: str):
+        self.page_source = self._session.get(url, timeout=30).text
+        self._root = parse_html(self.page_source)
+
+    def execute_script(self, script, *args):
+        return None
+
+    @staticmethod
+    def _xpath(by: str, value: str) -> str:
+        if by == By.TAG_NAME:
+            return f'//{value}'
+        if by == By.CLASS_NAME:
+            return f'//*[{has_class(value)}]'
+        if by == By.CSS_SELECTOR:
+            # the simple `tag[attr="value"]` selectors the crawlers wait on
+            tag, _, attr = value.partition('[')
+            if attr:
+                name, _, attr_value = attr.rstrip(']').partition('=')
+                return f"//{tag or '*'}[@{name}='{attr_value.strip(chr(34) + chr(39))}']"
+            return f'//{tag}'
+        raise ValueError(f'unsupported locator {by}')
+
+    def find_elements(self, by=By.ID, value=None) -> List[Any]:
+        return select(self._root, self._xpath(by, value))
+
+    def find_element(self, by=By.ID, value=None):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f'{by}={value}')
+        return HTTPElement(found[0])
+
+    def quit(self):
+        self._session.close()
+
+
+def run_once(articles: int, args, baseline_run: Optional[dict] = None) -> dict:
+    from news_pipeline import NewsSummaryPipeline
+
+    metrics.reset()
+    with NewsSite(articles=articles, latency=args.latency, dup_rate=args.dup_rate) as site:
+        site.configure_crawlers()
+        llm = FakeChatModel(latency=args.llm_latency)
+        pipeline = NewsSummaryPipeline(topic='Tesla', llm=llm)
+
+        timings = {}
+        start = time.perf_counter()
+        news = pipeline.fetch_news_data(pipeline.topic)
+        timings['fetch'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        unique = pipeline.deduplicate_news(news)
+        timings['dedup'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        processed = pipeline.summarize_stage(unique)
+        timings['summarize'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        html = pipeline.generate_html(processed, unique)
+        with open(os.path.join(args.workdir, f'report_{articles}.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+        timings['render'] = time.perf_counter() - start
+
+    return {
+        'articles_per_source': articles,
+        'fetched': len(news),
+        'unique': len(unique),
+        'clusters': len(processed.get('clusters', [])),
+        'llm_calls': llm.calls,
+        'http_requests': site.server.requests,
+        'stages': {stage: round(timings[stage], 4) for stage in STAGES},
+        'total': round(sum(timings.values()), 4),
+        'sources': {name: {k: v for k, v in stats.items() if k != 'error'}
+                    for name, stats in pipeline.fetch_stats.items()},
+        'metrics': metrics.snapshot() if metrics.enabled() else None,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float, floor: float) -> List[str]:
+    """Stages slower than the baseline by more than `tolerance` (and `floor` seconds)."""
+    previous = {run['articles_per_source']: run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in report['runs']:
+        old = previous.get(run['articles_per_source'])
+        if old is None:
+            continue
+        for stage in STAGES + ['total']:
+            new_s = run['stages'][stage] if stage != 'total' else run['total']
+            old_s = old['stages'][stage] if stage != 'total' else old['total']
+            if new_s > old_s * (1 + tolerance) and new_s - old_s > floor:
+                regressions.append(f"{run['articles_per_source']} articles/source: {stage} "
+                                   f"{old_s:.3f}s -> {new_s:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, nargs='+', default=[5, 10, 20],
+                        help='search results per source (CNN reads at most 10)')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated site latency per request (s)')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='simulated LLM latency per call (s)')
+    parser.add_argument('--dup-rate', type=float, default=0.3)
+    parser.add_argument('--browser', choices=['http', 'edge'], default='http')
+    parser.add_argument('--pool-size', type=int, default=3)
+    parser.add_argument('--scroll-idle', type=float, default=0.0,
+                        help='how long a search page scroll may take to load more results (the live default is 1.5 s)')
+    parser.add_argument('--crawl-rate', type=float, default=0.0,
+                        help='starting requests/s per site for the rate scheduler; 0 (default) does not pace')
+    parser.add_argument('--caches', action='store_true',
+                        help='keep the article and LLM caches on (in a temporary directory)')
+    parser.add_argument('--metrics', action='store_true', help='include a metrics snapshot in every run')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='earlier report to compare against; exits 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown per stage (fraction)')
+    parser.add_argument('--floor', type=float, default=0.05, help='ignore slowdowns smaller than this (s)')
+    args = parser.parse_args()
+
+    args.workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    # nothing from a developer's own cache directory may leak into the numbers
+    os.environ['NEWS_CACHE_DIR'] = os.path.join(args.workdir, 'cache')
+    if not args.caches:
+        os.environ['ARTICLE_CACHE'] = '0'
+        os.environ['LLM_CACHE'] = '0'
+    os.environ.setdefault('DASHSCOPE_API_KEY', 'unused')
+    if args.metrics:
+        metrics.enable()
+
+    import browser_pool
+    from browser_pool import BrowserPool, create_edge_driver, set_browser_pool
+    from rate_scheduler import RateScheduler, set_rate_scheduler
+    browser_pool.SCROLL_IDLE = args.scroll_idle
+    # the local site serves every source from one host, so a paced run shares one rate between them
+    set_rate_scheduler(RateScheduler(rate=args.crawl_rate, global_rate=0))
+    factory = HTTPDriver if args.browser == 'http' else create_edge_driver
+    set_browser_pool(BrowserPool(size=args.pool_size, factory=factory))
+
+    config = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'workdir')}
+    report = {'config': config, 'runs': []}
+    for articles in args.articles:
+        run = run_once(articles, args)
+        report['runs'].append(run)
+        print(json.dumps(run), flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.floor)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
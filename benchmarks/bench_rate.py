@@ -0,0 +1,124 @@
+"""
+Crawl pacing: fixed politeness delays versus the adaptive rate scheduler.
+
+A local site serves article pages but answers 429 (with Retry-After) once
+it sees more than --site-limit requests in a second, and can go down with
+503s for --outage seconds. The same article loop the crawlers run fetches
+--pages pages once with the old fixed sleep after each article and once
+paced by rate_scheduler. The report has wall time, pages fetched, 429/503
+responses and the rate the scheduler settled on.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_rate --pages 40 --site-limit 5
+    python -m benchmarks.bench_rate --pages 40 --outage 3 --fixed-delay 0
+"""
+import argparse
+import collections
+import json
+import threading
+import time
+
+from benchmarks.fixture_server import FixtureServer
+
+PAGE = (b'<html><head><meta property="article:published_time" content="2025-11-06T00:00:00Z"></head>'
+        b'<body><div class="RichTextStoryBody"><p>Body text.</p></div></body></html>')
+
+
+class ThrottlingSite:
+    """Serves /article/N, throttling above `limit` requests/s; 503 for `outage` s from the first request."""
+
+    def __init__(self, limit: float, outage: float = 0.0, latency: float = 0.02):
+        self.limit = limit
+        self.outage = outage
+        self.server = FixtureServer(handler=self._handle, delay=latency)
+        self.statuses = collections.Counter()
+        self._recent = collections.deque()
+        self._started = None
+        self._lock = threading.Lock()
+
+    def _handle(self, path: str):
+        with self._lock:
+            now = time.monotonic()
+            self._started = self._started or now
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if now - self._started < self.outage:
+                status = 503
+            elif len(self._recent) >= self.limit:
+                status = 429
+            else:
+                status = 200
+                self._recent.append(now)
+            self.statuses[status] += 1
+        if status == 200:
+            return 200, PAGE, {}
+        if status == 503:
+            return 503, b'down', {}
+        return 429, b'slow down', {'Retry-After': '1'}
+
+    def __enter__(self):
+        self.server.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.__exit__(*exc)
+
+
+def crawl(site: ThrottlingSite, pages: int, delay: float = 0.0) -> int:
+    """
+    The crawlers' article loop: fetch each page, a second time where the
+    crawlers would fall back to the browser, sleeping after each like the old code.
+    """
+    from http_fetcher import fetch_page
+    fetched = 0
+    for i in range(pages):
+        url = site.server.url(f'/article/{i}')
+        if fetch_page(url).ok or fetch_page(url).ok:
+            fetched += 1
+        if delay:
+            time.sleep(delay)
+    return fetched
+
+
+def run(name: str, args, scheduler, delay: float) -> dict:
+    from rate_scheduler import set_rate_scheduler
+    set_rate_scheduler(scheduler)
+    with ThrottlingSite(args.site_limit, args.outage) as site:
+        start = time.perf_counter()
+        fetched = crawl(site, args.pages, delay)
+        seconds = time.perf_counter() - start
+    result = {'scenario': name, 'seconds': round(seconds, 2), 'fetched': fetched,
+              'throttled': site.statuses[429], 'unavailable': site.statuses[503]}
+    stats = list(scheduler.stats().values())
+    if stats and scheduler.rate > 0:
+        result['final_rate'] = stats[0]['rate']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--site-limit', type=float, default=5, help='requests/s the site tolerates')
+    parser.add_argument('--outage', type=float, default=0.0, help='seconds of 503s at the start')
+    parser.add_argument('--fixed-delay', type=float, default=3.0,
+                        help='the old pause after every article; 0 skips that scenario')
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    from rate_scheduler import RateScheduler
+    report = {'config': vars(args), 'runs': []}
+    scenarios = [('adaptive', RateScheduler(breaker_cooldown=1.0), 0.0)]
+    if args.fixed_delay:
+        scenarios.insert(0, ('fixed', RateScheduler(rate=0, global_rate=0), args.fixed_delay))
+    for name, scheduler, delay in scenarios:
+        result = run(name, args, scheduler, delay)
+        report['runs'].append(result)
+        print(json.dumps(result), flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark report rendering: the old per-call Template + in-memory page
+against report_render's cached Environment streaming to disk.
+
+For each article count, renders `--topics` reports both ways and records
+wall time and peak Python memory (tracemalloc). Both paths must write the
+same HTML.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_render --topics 50 --articles 20 200 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from jinja2 import Template
+
+import report_render
+
+PROCESSED = {
+    'topic': 'Benchmark Topic',
+    'summary': 'A deterministic summary. ' * 20,
+    'entities': {'organizations': ['Tesla', 'SEC'], 'people': ['Elon Musk'], 'locations': ['Austin'],
+                 'key_terms': ['pay package', 'shareholder vote']},
+    'timeline': [{'date': f'2025-11-{day:02d}', 'event': f'Event {day}', 'description': 'Something happened.'}
+                 for day in range(1, 11)],
+}
+
+
+def make_articles(count: int):
+    return [{'title': f'Article {i} about the topic', 'source': ['CNN', 'BBC News', 'AP News'][i % 3],
+             'publish_date': '2025-11-06', 'content': f'Paragraph {i}. ' * 120,
+             'urls': [f'https://example.com/{i}', f'https://example.org/{i}'][:1 + i % 2]}
+            for i in range(count)]
+
+
+def legacy_render(processed, news_list, output_file):
+    # what NewsSummaryPipeline.generate_html + run_pipeline did before report_render
+    with open(os.path.join(report_render.TEMPLATE_DIR, report_render.TEMPLATE_NAME), 'r', encoding='utf-8') as f:
+        template = Template(f.read())
+    html = template.render(
+        topic=processed['topic'], summary=processed['summary'], entities=processed['entities'],
+        timeline=processed['timeline'], news_articles=news_list,
+        generated_date=datetime.now().strftime("%B %d, %Y %H:%M"))
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(seconds, 4), peak
+
+
+def run(topics: int, articles: int, workdir: str, compress: bool) -> dict:
+    news = make_articles(articles)
+    legacy_files = [os.path.join(workdir, f'legacy_{i}.html') for i in range(topics)]
+    engine_files = [os.path.join(workdir, f'engine_{i}.html') for i in range(topics)]
+
+    def legacy():
+        for path in legacy_files:
+            legacy_render(PROCESSED, news, path)
+
+    def engine():
+        report_render.render_batch(((PROCESSED, news, path) for path in engine_files), compress=compress)
+
+    legacy_s, legacy_peak = measure(legacy)
+    engine_s, engine_peak = measure(engine)
+    with open(legacy_files[0], encoding='utf-8') as a, open(engine_files[0], encoding='utf-8') as b:
+        identical = a.read() == b.read()
+    return {
+        'topics': topics, 'articles': articles, 'identical': identical,
+        'page_bytes': os.path.getsize(engine_files[0]),
+        'legacy': {'seconds': legacy_s, 'peak_bytes': legacy_peak},
+        'engine': {'seconds': engine_s, 'peak_bytes': engine_peak},
+        'speedup': round(legacy_s / engine_s, 2) if engine_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--topics', type=int, default=50)
+    parser.add_argument('--articles', type=int, nargs='+', default=[20, 200, 2000])
+    parser.add_argument('--gzip', action='store_true', help='also write .gz files with the engine')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_render_')
+    report_render.get_environment().get_template(report_render.TEMPLATE_NAME)  # compile outside the timings
+    for articles in args.articles:
+        print(json.dumps(run(args.topics, articles, workdir, args.gzip)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
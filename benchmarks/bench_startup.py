@@ -0,0 +1,150 @@
+"""
+Cold-start time of the command line, measured with `python -X importtime`.
+
+Each scenario runs in a fresh interpreter against a run directory of
+synthetic articles prepared up front, so no network, browser or LLM is
+involved. For each it reports wall time, total import time and the most
+expensive top-level imports. A scenario fails when it imports a heavy
+package its stage does not need, e.g. selenium for `render`. The 'eager'
+scenario imports every stage's dependencies, which is what any command paid
+before the imports became lazy. Pass --baseline with an earlier report to
+also fail on slowdowns.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --tolerance 0.3
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ('selenium', 'sklearn', 'scipy', 'langchain_core', 'langchain_openai', 'openai', 'jinja2')
+
+# scenario -> heavy packages it must not import
+FORBIDDEN = {
+    'help': HEAVY,
+    'dedup': ('selenium', 'langchain_core', 'langchain_openai', 'openai', 'jinja2'),
+    'render': ('selenium', 'sklearn', 'scipy', 'langchain_core', 'langchain_openai', 'openai'),
+    'eager': (),
+}
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def prepare_run_dir(run_dir: str, articles: int):
+    """fetch checkpoint of synthetic articles; dedup is produced by the 'dedup' scenario."""
+    from benchmarks.bench_dedup import synthetic_news
+    from checkpoints import RunCheckpoints
+    news = synthetic_news(articles, dup_rate=0.2)
+    for article in news:
+        article['publish_date'] = '2025-11-06'
+    RunCheckpoints(run_dir).run('fetch', 'bench', lambda: news, topic='Benchmark Topic')
+
+
+def add_summary(run_dir: str):
+    from benchmarks.bench_pipeline import FAKE_SUMMARY
+    from checkpoints import RunCheckpoints
+    RunCheckpoints(run_dir).run('summarize', 'bench', lambda: FAKE_SUMMARY)
+
+
+def parse_importtime(stderr: str) -> Dict:
+    total, top, modules = 0, [], set()
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        total += self_us
+        modules.add(name.split('.')[0])
+        if len(indent) <= 1:
+            top.append((cumulative_us, name))
+    top.sort(reverse=True)
+    return {'import_seconds': round(total / 1e6, 3),
+            'top_imports': {name: round(us / 1e6, 3) for us, name in top[:5]},
+            'packages': modules}
+
+
+def run_scenario(argv: List[str], env: Dict[str, str], repeat: int) -> Dict:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime'] + argv, cwd=REPO_ROOT, env=env,
+                              capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(argv)} failed:\n{proc.stderr[-2000:]}")
+        result = {'wall_seconds': round(wall, 3), **parse_importtime(proc.stderr)}
+        if best is None or result['wall_seconds'] < best['wall_seconds']:
+            best = result
+    return best
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float, floor: float) -> List[str]:
+    regressions = []
+    for name, run in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if old is None:
+            continue
+        for field in ('wall_seconds', 'import_seconds'):
+            if run[field] > old[field] * (1 + tolerance) and run[field] - old[field] > floor:
+                regressions.append(f"{name}: {field} {old[field]:.3f}s -> {run[field]:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=300, help='synthetic articles in the run directory')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per scenario; the fastest is kept')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='earlier report to compare against; exits 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed slowdown (fraction)')
+    parser.add_argument('--floor', type=float, default=0.05, help='ignore slowdowns smaller than this (s)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    run_dir = os.path.join(workdir, 'run')
+    env = dict(os.environ, NEWS_CACHE_DIR=os.path.join(workdir, 'cache'), PYTHONPATH=REPO_ROOT)
+    prepare_run_dir(run_dir, args.articles)
+
+    scenarios = {
+        'help': ['cli.py', '--help'],
+        'dedup': ['cli.py', 'dedup', '--run-dir', run_dir],
+        'render': ['cli.py', 'render', '--run-dir', run_dir, '--output', os.path.join(workdir, 'report.html')],
+        'eager': ['-c', 'import news_pipeline, crawl_cnn, crawl_apnews, crawl_bbc, dedup, clustering, summarize, '
+                        'report_render, langchain_openai'],
+    }
+    report = {'config': {'articles': args.articles, 'repeat': args.repeat}, 'scenarios': {}}
+    failures = []
+    for name, argv in scenarios.items():
+        result = run_scenario(argv, env, args.repeat)
+        if name == 'dedup':
+            add_summary(run_dir)
+        loaded = sorted(set(FORBIDDEN[name]) & result.pop('packages'))
+        if loaded:
+            failures.append(f"{name}: imports {', '.join(loaded)}")
+        report['scenarios'][name] = result
+        print(json.dumps({name: result}), flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            failures += compare(report, json.load(f), args.tolerance, args.floor)
+    for line in failures:
+        print(f"REGRESSION {line}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
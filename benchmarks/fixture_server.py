@@ -0,0 +1,102 @@
+"""
+Local stand-in for the news sites: serves files from benchmarks/fixtures over HTTP.
+
+Any path is mapped to a fixture by its basename, so `/cnn/2025/11/06/article-7`
+can be served from `cnn_article.html` via `routes`. The server can add a fixed
+per-request latency, answers If-None-Match with 304 when a handler supplies an
+ETag, and keeps counters that let benchmarks check concurrency.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+class FixtureServer:
+    """
+    Usage:
+        with FixtureServer(routes={'/cnn/': 'cnn_article.html'}, delay=0.05) as server:
+            server.url('/cnn/article-1')
+    """
+
+    def __init__(self, root: Path = FIXTURES, routes: Dict[str, str] = None, delay: float = 0.0,
+                 handler: Optional[Callable[[str], Optional[tuple]]] = None):
+        self.root = Path(root)
+        self.routes = routes or {}
+        self.delay = delay
+        self.handler = handler  # optional hook: path -> (status, body, headers) or None
+
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def url(self, path: str = '/') -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def _resolve(self, path: str):
+        if self.handler is not None:
+            custom = self.handler(path)
+            if custom is not None:
+                return custom
+        clean = path.split('?', 1)[0]
+        for prefix, name in self.routes.items():
+            if clean.startswith(prefix):
+                return 200, (self.root / name).read_bytes(), {}
+        candidate = (self.root / clean.lstrip('/')).resolve()
+        if candidate.is_file() and self.root.resolve() in candidate.parents:
+            return 200, candidate.read_bytes(), {}
+        return 404, b'not found', {}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real sites
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if server.delay:
+                        time.sleep(server.delay)
+                    status, body, headers = server._resolve(self.path)
+                    headers = dict(headers)
+                    if isinstance(body, str):
+                        body = body.encode('utf-8')
+                    if status == 200 and 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+                        status, body = 304, b''
+                    self.send_response(status)
+                    self.send_header('Content-Type', headers.pop('Content-Type', 'text/html; charset=utf-8'))
+                    self.send_header('Content-Length', str(len(body)))
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
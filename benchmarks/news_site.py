@@ -0,0 +1,178 @@
+"""
+Local stand-in for CNN, AP News and BBC News built from the recorded fixtures.
+
+`NewsSite` serves, under /cnn, /ap and /bbc, a search page with any number of
+results and one article page per result. Pages keep the recorded markup, so
+the crawlers' real selectors and parsers run unchanged; only the result
+cards and article paragraphs are replaced with deterministic synthetic text.
+A share of the stories is reported by several sources with light edits, so
+deduplication has real work to do.
+
+    with NewsSite(articles=20, latency=0.05) as site:
+        site.configure_crawlers()  # point crawl_cnn/crawl_apnews/crawl_bbc at it
+"""
+import copy
+import random
+import re
+from typing import Dict, List, Optional
+
+from lxml import html as lxml_html
+
+from benchmarks.fixture_server import FIXTURES, FixtureServer
+from html_extract import has_class, parse_html, select, select_one
+
+# per source: recorded pages and where the cards, links, titles and paragraphs sit in them;
+# `block` is the element repeated once per paragraph
+SOURCES = {
+    'cnn': {
+        'search': 'cnn_search.html', 'article': 'cnn_article.html',
+        'card': f"//div[{has_class('card')}]", 'links': ".//a",
+        'title': f".//span[{has_class('container__headline-text')}]",
+        'paragraphs': "//p[@class='paragraph-elevate inline-placeholder vossi-paragraph']",
+        'block': "//p[@class='paragraph-elevate inline-placeholder vossi-paragraph']",
+        'headline': "//h1",
+    },
+    'ap': {
+        'search': 'ap_search.html', 'article': 'ap_article.html',
+        'card': f"//div[{has_class('PageList-items-item')}]", 'links': ".//a",
+        'title': f".//div[{has_class('PagePromo-title')}]//span",
+        'paragraphs': f"//div[{has_class('RichTextStoryBody')}]//p",
+        'block': f"//div[{has_class('RichTextStoryBody')}]//p",
+        'headline': "//h1",
+    },
+    'bbc': {
+        'search': 'bbc_search.html', 'article': 'bbc_article.html',
+        'card': f"//li[{has_class('ssrcss-1a1yp44-Stack')}]", 'links': f".//a[{has_class('ssrcss-163mj99-PromoLink')}]",
+        'title': f".//p[{has_class('ssrcss-1b1mki6-PromoHeadline')}]/span",
+        'paragraphs': f"//div[@data-component='text-block']//p[{has_class('ssrcss-1q0x1qg-Paragraph')}]",
+        'block': "//div[@data-component='text-block']",
+        'headline': "//h1",
+    },
+}
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]+")
+
+
+def _vocabulary() -> List[str]:
+    words = set()
+    for spec in SOURCES.values():
+        with open(FIXTURES / spec['article'], encoding='utf-8') as f:
+            root = parse_html(f.read())
+        for p in select(root, spec['paragraphs']):
+            words.update(w.lower() for w in _WORD_RE.findall(p.text_content()))
+    # plus made-up names and terms, so unrelated stories share few words
+    rng = random.Random(0)
+    syllables = ['ka', 'lo', 'mi', 'ra', 'ten', 'vos', 'del', 'ari', 'bun', 'zel', 'tor', 'nim']
+    words.update(''.join(rng.choice(syllables) for _ in range(3)) for _ in range(3000))
+    return sorted(words)
+
+
+class NewsSite:
+    """
+    articles: results per source search page (CNN's crawler reads at most 10).
+    dup_rate: share of articles that retell a story another source already ran.
+    """
+
+    def __init__(self, articles: int = 20, latency: float = 0.0, dup_rate: float = 0.3, paragraphs: int = 8,
+                 seed: int = 0):
+        self.articles = articles
+        self.server = FixtureServer(handler=self._handle, delay=latency)
+        self._templates = {}
+        for name, spec in SOURCES.items():
+            for kind in ('search', 'article'):
+                with open(FIXTURES / spec[kind], encoding='utf-8') as f:
+                    self._templates[name, kind] = f.read()
+        self._stories = self._make_stories(articles, dup_rate, paragraphs, seed)
+        self._pages: Dict[str, bytes] = {}
+
+    def _make_stories(self, articles, dup_rate, paragraphs, seed):
+        rng = random.Random(seed)
+        vocab = _vocabulary()
+
+        def sentence():
+            words = rng.choices(vocab, k=rng.randint(14, 26))
+            return ' '.join(words).capitalize() + '.'
+
+        stories, written = {}, []
+        for index in range(articles):
+            for source in SOURCES:
+                if written and rng.random() < dup_rate:
+                    # the same story from another outlet: a few sentences reworded
+                    title, body = rng.choice(written)
+                    body = [sentence() if rng.random() < 0.1 else p for p in body]
+                else:
+                    title = ' '.join(rng.choices(vocab, k=8)).capitalize()
+                    body = [' '.join(sentence() for _ in range(3)) for _ in range(paragraphs)]
+                written.append((title, body))
+                stories[source, index] = (title, body)
+        return stories
+
+    def __enter__(self):
+        self.server.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.__exit__(*exc)
+
+    def base_url(self, source: str) -> str:
+        return self.server.url(f'/{source}')
+
+    def article_url(self, source: str, index: int) -> str:
+        return self.server.url(f'/{source}/article/{index}')
+
+    def configure_crawlers(self):
+        """Point the crawler modules at this site."""
+        import crawl_apnews
+        import crawl_bbc
+        import crawl_cnn
+        crawl_cnn.CNN_BASE_URL = self.base_url('cnn')
+        crawl_apnews.AP_BASE_URL = self.base_url('ap')
+        crawl_bbc.BBC_BASE_URL = self.base_url('bbc')
+
+    def _search_page(self, source: str) -> str:
+        spec = SOURCES[source]
+        root = lxml_html.document_fromstring(self._templates[source, 'search'])
+        cards = select(root, spec['card'])
+        template, parent = cards[0], cards[0].getparent()
+        position = parent.index(template)
+        for card in cards:
+            parent.remove(card)
+        for index in range(self.articles):
+            card = copy.deepcopy(template)
+            for link in select(card, spec['links']):
+                link.set('href', self.article_url(source, index))
+            select_one(card, spec['title']).text = self._stories[source, index][0]
+            parent.insert(position + index, card)
+        return lxml_html.tostring(root, encoding='unicode', doctype='<!DOCTYPE html>')
+
+    def _article_page(self, source: str, index: int) -> str:
+        spec = SOURCES[source]
+        title, body = self._stories[source, index]
+        root = lxml_html.document_fromstring(self._templates[source, 'article'])
+        select_one(root, spec['headline']).text = title
+        blocks = select(root, spec['block'])
+        template, parent = blocks[0], blocks[0].getparent()
+        position = parent.index(template)
+        for block in blocks:
+            block.getparent().remove(block)
+        for offset, text in enumerate(body):
+            block = copy.deepcopy(template)
+            paragraph = select_one(block, 'descendant-or-self::p')
+            for child in list(paragraph):
+                paragraph.remove(child)
+            paragraph.text = text
+            parent.insert(position + offset, block)
+        return lxml_html.tostring(root, encoding='unicode', doctype='<!DOCTYPE html>')
+
+    def _handle(self, path: str) -> Optional[tuple]:
+        match = re.match(r'^/(cnn|ap|bbc)/(search|article/(\d+))', path)
+        if not match:
+            return None
+        source, index = match.group(1), match.group(3)
+        if index is not None and int(index) >= self.articles:
+            return 404, b'not found', {}
+        key = f'{source}:{index}'
+        if key not in self._pages:
+            page = self._search_page(source) if index is None else self._article_page(source, int(index))
+            self._pages[key] = page.encode('utf-8')
+        return 200, self._pages[key], {}
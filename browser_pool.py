@@ -0,0 +1,263 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.edge.options import Options
+from selenium.webdriver.edge.service import Service
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrics
+
+EDGE_DRIVER_PATH = os.getenv("EDGE_DRIVER_PATH", r"D:\edgedriver_win32\msedgedriver.exe")
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0")
+
+# lean page loads: return at DOMContentLoaded and skip images, media, fonts and ad/analytics requests.
+# The crawlers only read the server-rendered markup, so none of that changes what they extract.
+BROWSER_FAST_LOAD = os.getenv("BROWSER_FAST_LOAD", "1") != "0"
+BLOCKED_URL_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.m3u8', '*.ts', '*.mp3', '*.aac',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+]
+BLOCKED_HOSTS = [
+    'doubleclick.net', 'googlesyndication.com', 'googletagmanager.com', 'googletagservices.com',
+    'google-analytics.com', 'adnxs.com', 'amazon-adsystem.com', 'scorecardresearch.com', 'chartbeat.com',
+    'chartbeat.net', 'taboola.com', 'outbrain.com', 'optimizely.com', 'permutive.com', 'hotjar.com',
+    'facebook.net', 'krxd.net', 'quantserve.com', 'nr-data.net', 'segment.io',
+] + [host for host in os.getenv("BROWSER_BLOCKED_HOSTS", "").split(",") if host]
+
+# scrolling a results page: give up after SCROLL_TIMEOUT seconds, or when a scroll
+# loads nothing new within SCROLL_IDLE seconds
+SCROLL_TIMEOUT = float(os.getenv("SCROLL_TIMEOUT", 15))
+SCROLL_IDLE = float(os.getenv("SCROLL_IDLE", 1.5))
+SCROLL_POLL = 0.2
+
+
+def blocked_urls() -> List[str]:
+    """URL patterns for the DevTools Network.setBlockedURLs command."""
+    return BLOCKED_URL_PATTERNS + [f'*{host}*' for host in BLOCKED_HOSTS]
+
+
+def create_edge_driver(driver_path: str = None, fast_load: bool = None):
+    """Start a new headless Edge browser, with the lean page-load profile unless fast_load is False"""
+    fast_load = BROWSER_FAST_LOAD if fast_load is None else fast_load
+    edge_options = Options()
+    edge_options.add_argument("--headless")
+    edge_options.add_argument(f"user-agent={USER_AGENT}")
+    if fast_load:
+        edge_options.page_load_strategy = 'eager'
+        edge_options.add_argument("--blink-settings=imagesEnabled=false")
+        edge_options.add_argument("--mute-audio")
+        edge_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    service = Service(driver_path or EDGE_DRIVER_PATH)
+    driver = webdriver.Edge(service=service, options=edge_options)
+    if fast_load:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls()})
+        except WebDriverException as e:
+            print(f"Could not block resource requests, loading pages in full: {e}")
+    return driver
+
+
+def wait_for(driver, locator: Tuple[str, str], timeout: float = 10) -> bool:
+    """Wait until an element matching locator is present; False if it does not appear within timeout."""
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located(locator))
+        return True
+    except TimeoutException:
+        return False
+
+
+def scroll_until(driver, locator: Tuple[str, str], want: int, stop: Callable[[], bool] = None,
+                 timeout: float = None, idle: float = None) -> int:
+    """
+    Scroll a results page until `want` items matching locator are loaded,
+    `stop()` returns True, a scroll loads no new items within `idle` seconds
+    or `timeout` passes. Returns the number of items loaded.
+    """
+    timeout = SCROLL_TIMEOUT if timeout is None else timeout
+    idle = SCROLL_IDLE if idle is None else idle
+    deadline = time.monotonic() + timeout
+    count = len(driver.find_elements(*locator))
+    while count < want and time.monotonic() < deadline:
+        if stop is not None and stop():
+            break
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        settle_by = min(deadline, time.monotonic() + idle)
+        loaded = count
+        while loaded <= count and time.monotonic() < settle_by:
+            time.sleep(SCROLL_POLL)
+            loaded = len(driver.find_elements(*locator))
+        if loaded <= count:
+            break  # the page has nothing more to load
+        count = loaded
+    return count
+
+
+class PooledBrowser:
+    """A browser owned by the pool plus its usage bookkeeping."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.time()
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of warm browsers shared by the crawlers.
+
+    Browsers are started lazily, handed out with `lease()`, health-checked
+    before every lease, recycled after `max_pages` page loads and replaced
+    when they crash.
+    """
+
+    def __init__(self, size: int = 3, max_pages: int = 50,
+                 factory: Callable = create_edge_driver, lease_timeout: float = 300):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+        self.lease_timeout = lease_timeout
+
+        self._idle = queue.LifoQueue()  # most recently used first, keeps few browsers warm
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {'created': 0, 'recycled': 0, 'replaced': 0, 'leases': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _spawn(self) -> PooledBrowser:
+        with metrics.timer('browser_start_seconds'):
+            browser = PooledBrowser(self.factory())
+        self._count('created')
+        return browser
+
+    @staticmethod
+    def _discard(browser: PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_healthy(browser: PooledBrowser) -> bool:
+        """Cheap round-trip to check the browser process is still responsive."""
+        try:
+            browser.driver.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout: float = None) -> PooledBrowser:
+        if self._closed:
+            raise RuntimeError("browser pool is closed")
+        if not self._slots.acquire(timeout=timeout or self.lease_timeout):
+            raise TimeoutError(f"no browser available after {timeout or self.lease_timeout}s")
+
+        try:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                browser = self._spawn()
+            else:
+                if not self.is_healthy(browser):
+                    print("Browser crashed while idle, replacing it")
+                    self._discard(browser)
+                    self._count('replaced')
+                    browser = self._spawn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._count('leases')
+        return browser
+
+    def release(self, browser: PooledBrowser, broken: bool = False):
+        browser.pages += 1
+        try:
+            if self._closed:
+                self._discard(browser)
+            elif broken and not self.is_healthy(browser):
+                self._discard(browser)
+                self._count('replaced')
+            elif browser.pages >= self.max_pages:
+                self._discard(browser)
+                self._count('recycled')
+            else:
+                self._idle.put(browser)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout: float = None, **labels):
+        """
+        Borrow a browser for one page visit: `with pool.lease() as driver: ...`
+        `labels` (e.g. source, page) tag the wait and page-visit timings in `metrics`.
+        """
+        with metrics.timer('browser_wait_seconds', **labels):
+            browser = self.acquire(timeout)
+        broken = False
+        start = time.perf_counter()
+        try:
+            yield browser.driver
+        except WebDriverException:
+            broken = True
+            metrics.inc('browser_errors_total', **labels)
+            raise
+        finally:
+            metrics.observe('browser_visit_seconds', time.perf_counter() - start, **labels)
+            self.release(browser, broken=broken)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_default_pool: Optional[BrowserPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = BrowserPool(
+                size=int(os.getenv("BROWSER_POOL_SIZE", 3)),
+                max_pages=int(os.getenv("BROWSER_POOL_MAX_PAGES", 50)),
+            )
+        return _default_pool
+
+
+def set_browser_pool(pool: Optional[BrowserPool]) -> Optional[BrowserPool]:
+    """Replace the process-wide pool (e.g. for benchmarks), returning the old one."""
+    global _default_pool
+    with _default_pool_lock:
+        old, _default_pool = _default_pool, pool
+    return old
+
+
+@atexit.register
+def _close_default_pool():
+    if _default_pool is not None:
+        _default_pool.close()
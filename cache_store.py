@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CACHE_DIR = os.getenv("NEWS_CACHE_DIR", ".cache")
+
+
+class SQLiteCache:
+    """
+    Small persistent key/value store with TTL and size-bounded LRU eviction.
+
+    Values are JSON documents. Every entry records when it was stored
+    (`stored_at`, used for TTL) and last read (`accessed_at`, used for LRU).
+    When the total stored size exceeds `max_bytes` the least recently used
+    entries are evicted. The total is kept as a running count, so a write
+    does not scan the table; it is recounted before evicting, which also
+    corrects for other processes writing the same file. Safe to share
+    between threads.
+    """
+
+    def __init__(self, path: str, ttl: float = None, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)")
+        self._total = self._size()
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def is_expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return {'value', 'stored_at'} regardless of age, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return {'value': json.loads(row[0]), 'stored_at': row[1]}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value if present and within TTL."""
+        entry = self.get_entry(key)
+        if entry is None:
+            return default
+        if self.is_expired(entry['stored_at']):
+            self.stats['expired'] += 1
+            return default
+        self.stats['hits'] += 1
+        return entry['value']
+
+    def set(self, key: str, value: Any, stored_at: float = None):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), stored_at or now, now),
+            )
+            self._total += len(data) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def touch(self, key: str):
+        """Mark an entry as freshly stored without rewriting it (e.g. after HTTP 304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE cache SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def delete(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._total -= row[0] if row else 0
+
+    def _evict(self):
+        """Called with the lock held once the running total crosses max_bytes."""
+        self._total = self._size()
+        if self._total <= self.max_bytes:
+            return
+        # drop least recently used entries until we are back under budget
+        excess = self._total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self._total -= freed
+        self.stats['evicted'] += len(victims)
+
+    def purge_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE stored_at < ?", (time.time() - self.ttl,))
+            self._total = self._size()
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
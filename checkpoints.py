@@ -0,0 +1,145 @@
+"""
+Per-stage checkpoints for resumable pipeline runs.
+
+Every stage of a checkpointed run writes its output to the run directory
+(article lists as JSONL, everything else as JSON) and records in
+manifest.json a hash of the inputs it ran on and of the output it wrote:
+
+    runs/tesla/
+        manifest.json
+        fetch.jsonl  dedup.jsonl  summarize.json  render.json
+
+Running again in the same directory skips every stage whose inputs hash the
+same as last time (and, with `max_age`, whose checkpoint is recent enough)
+and loads its output instead. `from_stage` re-runs that
+stage and the ones after it on the checkpoints of the stages before it, so
+re-summarizing or re-rendering an existing crawl needs no network access.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+STAGES = ['fetch', 'dedup', 'summarize', 'render']
+
+# stages whose output is a list of articles, stored one JSON object per line
+_JSONL_STAGES = {'fetch', 'dedup'}
+
+
+def inputs_hash(*parts: Any) -> str:
+    """Stable hash of a stage's inputs (anything JSON-serialisable)."""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RunCheckpoints:
+    """
+    Stage outputs of one run directory plus the manifest describing them.
+    from_stage: first stage to re-run regardless of its inputs; earlier
+        stages must already have a checkpoint and are loaded from it.
+    """
+
+    def __init__(self, run_dir: str, from_stage: str = None):
+        if from_stage is not None and from_stage not in STAGES:
+            raise ValueError(f"unknown stage {from_stage!r}, expected one of {STAGES}")
+        self.run_dir = run_dir
+        self.from_stage = from_stage
+        os.makedirs(run_dir, exist_ok=True)
+        self.manifest_path = os.path.join(run_dir, 'manifest.json')
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def path(self, stage: str) -> str:
+        return os.path.join(self.run_dir, stage + ('.jsonl' if stage in _JSONL_STAGES else '.json'))
+
+    def output_hash(self, stage: str) -> str:
+        return self.manifest[stage]['output']
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _write(self, stage: str, value: Any):
+        tmp = self.path(stage) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            if stage in _JSONL_STAGES:
+                for item in value:
+                    f.write(json.dumps(item, ensure_ascii=False, sort_keys=True) + '\n')
+            else:
+                json.dump(value, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path(stage))
+
+    def load(self, stage: str) -> Any:
+        with open(self.path(stage), encoding='utf-8') as f:
+            if stage in _JSONL_STAGES:
+                return [json.loads(line) for line in f if line.strip()]
+            return json.load(f)
+
+    def _has_checkpoint(self, stage: str) -> bool:
+        entry = self.manifest.get(stage)
+        return (entry is not None and os.path.exists(self.path(stage))
+                and file_hash(self.path(stage)) == entry['output'])
+
+    def age(self, stage: str) -> float:
+        """Seconds since the stage's checkpoint was written."""
+        finished = time.strptime(self.manifest[stage]['finished_at'], '%Y-%m-%dT%H:%M:%S')
+        return time.time() - time.mktime(finished)
+
+    def run(self, stage: str, inputs: Union[str, Callable[[], str]], compute: Callable[[], Any],
+            valid: Optional[Callable[[Any], bool]] = None, max_age: float = None, **info: Any) -> Any:
+        """
+        The stage's output: loaded from its checkpoint when allowed, else
+        computed and checkpointed.
+        inputs: `inputs_hash` of everything the stage depends on, or a function
+            returning it, called only when the checkpoint could be reused or the
+            stage runs (hashing some inputs means importing or creating things).
+        valid: extra check on a loaded output (e.g. that a rendered file still exists).
+        max_age: seconds after which the checkpoint is stale and the stage runs
+            again even with unchanged inputs (e.g. a crawl); a checkpoint loaded
+            for a later from_stage is used at any age.
+        info: extra fields for the stage's manifest entry (e.g. the topic).
+        """
+        order = STAGES.index(stage)
+        forced = self.from_stage is not None and order >= STAGES.index(self.from_stage)
+        before_from = self.from_stage is not None and order < STAGES.index(self.from_stage)
+
+        if before_from and not self._has_checkpoint(stage):
+            raise FileNotFoundError(f"cannot resume from {self.from_stage}: no {stage} checkpoint in {self.run_dir}")
+        if not before_from and callable(inputs):
+            inputs = inputs()
+        reusable = (not forced and not before_from and self._has_checkpoint(stage)
+                    and self.manifest[stage]['inputs'] == inputs)
+        if reusable and max_age is not None and self.age(stage) > max_age:
+            print(f"{stage} checkpoint is older than {max_age:g}s, running it again")
+            reusable = False
+        if before_from or reusable:
+            value = self.load(stage)
+            if valid is None or valid(value):
+                print(f"Skipping {stage}: loaded from {self.path(stage)}")
+                return value
+
+        start = time.perf_counter()
+        value = compute()
+        self._write(stage, value)
+        self.manifest[stage] = {
+            **info,
+            'inputs': inputs,
+            'output': file_hash(self.path(stage)),
+            'seconds': round(time.perf_counter() - start, 3),
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self._save_manifest()
+        return value
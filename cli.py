@@ -0,0 +1,99 @@
+"""
+Command line with one subcommand per pipeline stage.
+
+A command imports only what its stage needs: rendering a checkpointed run
+loads jinja2 but not selenium, scikit-learn or langchain, so cron jobs and
+short container runs start fast (see benchmarks/bench_startup.py). Stage
+commands pass their results on through a run directory (see checkpoints.py)
+and always re-run their own stage; the topic is taken from the directory
+when not given.
+
+Usage:
+    python cli.py crawl --topic Tesla --run-dir runs/tesla
+    python cli.py dedup --run-dir runs/tesla
+    python cli.py summarize --run-dir runs/tesla
+    python cli.py render --run-dir runs/tesla --output tesla.html --gzip
+    python cli.py run --topic Tesla --output tesla.html
+    python cli.py run --topic Tesla --output tesla.html --run-dir runs/tesla --from-stage summarize
+"""
+import argparse
+import sys
+from typing import List
+
+import metrics
+from checkpoints import STAGES, RunCheckpoints
+
+# subcommand -> the pipeline stage it runs
+COMMANDS = {'crawl': 'fetch', 'dedup': 'dedup', 'summarize': 'summarize', 'render': 'render'}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--metrics', help='write metrics here (.prom/.txt: Prometheus text, otherwise JSON)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='every stage, optionally checkpointed')
+    run.add_argument('--topic', required=True)
+    run.add_argument('--output', default='news_summary.html')
+    run.add_argument('--run-dir', help='checkpoint each stage here so the run can be resumed')
+    run.add_argument('--from-stage', choices=STAGES, help='with --run-dir: re-run from this stage on')
+
+    stages = {name: commands.add_parser(name, help=f'run the {stage} stage in a run directory')
+              for name, stage in COMMANDS.items()}
+    for name, command in stages.items():
+        command.add_argument('--run-dir', required=True)
+        command.add_argument('--topic', required=name == 'crawl',
+                             help=None if name == 'crawl' else 'defaults to the topic of the crawl')
+    stages['render'].add_argument('--output', required=True)
+
+    for command in (run, stages['crawl']):
+        command.add_argument('--incremental', action='store_true',
+                             help='only crawl results earlier runs did not process and merge them into the stored set')
+    for command in (run, stages['crawl'], stages['dedup']):
+        command.add_argument('--store', action='store_true', help='keep the crawled articles in the article store')
+    for command in (run, stages['render']):
+        command.add_argument('--gzip', action='store_true', help='also write a pre-compressed .html.gz')
+    return parser
+
+
+def main(argv: List[str] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'from_stage', None) and not args.run_dir:
+        parser.error('--from-stage needs --run-dir')
+
+    topic = args.topic
+    if topic is None:
+        topic = RunCheckpoints(args.run_dir).manifest.get('fetch', {}).get('topic')
+        if topic is None:
+            parser.error(f'--topic is needed: {args.run_dir} has no crawl to take it from')
+    if args.metrics:
+        metrics.enable()
+
+    pipeline_kwargs = {'gzip_output': getattr(args, 'gzip', False)}
+    if getattr(args, 'incremental', False):
+        from watermarks import get_watermark_store
+        pipeline_kwargs['watermarks'] = get_watermark_store()
+    if getattr(args, 'store', False):
+        from article_store import get_article_store
+        pipeline_kwargs['article_store'] = get_article_store()
+
+    from news_pipeline import NewsSummaryPipeline
+    pipeline = NewsSummaryPipeline(topic=topic, **pipeline_kwargs)
+    output = getattr(args, 'output', None)
+    try:
+        if args.command == 'run':
+            pipeline.run_pipeline(output, run_dir=args.run_dir, from_stage=args.from_stage)
+        else:
+            stage = COMMANDS[args.command]
+            pipeline.run_pipeline(output, run_dir=args.run_dir, from_stage=stage, until_stage=stage)
+    except FileNotFoundError as e:
+        # an earlier stage has not been run in this directory yet
+        parser.exit(1, f'{e}\n')
+    finally:
+        if args.metrics:
+            metrics.write(args.metrics)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,125 @@
+"""
+Groups a topic's stories into sub-events and picks the few most central
+articles of each for the summary prompt.
+
+Stories are linked when their TF-IDF cosine similarity reaches
+CLUSTER_THRESHOLD (found with the sparse search of dedup.py) and every
+connected component is one sub-event. Centrality is the similarity of an
+article to its cluster centroid, computed for all articles with sparse
+matrix products. The `max_clusters` largest sub-events contribute their
+`top_k` most central articles; the smaller ones contribute their most
+central article each while the token budget lasts. So the prompt stays
+about the same size however many articles were crawled, without dropping
+the long tail of single-story sub-events wholesale.
+"""
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+import metrics
+from dedup import find_similar_pairs, news_texts, tfidf_matrix
+from prompt_payload import article_tokens
+
+# far below DEDUP_THRESHOLD: different write-ups of one development, not copies
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", 0.3))
+CLUSTER_TOP_K = int(os.getenv("CLUSTER_TOP_K", 3))
+MAX_CLUSTERS = int(os.getenv("MAX_CLUSTERS", 10))
+
+
+def cluster_labels(matrix: sp.csr_matrix, threshold: float = CLUSTER_THRESHOLD) -> np.ndarray:
+    """Cluster id per row, 0 for the largest cluster, then by size (ties by first row)."""
+    n = matrix.shape[0]
+    pairs = find_similar_pairs(matrix, threshold)
+    graph = sp.coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])) if len(pairs) else ([], ([], [])),
+                          shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    sizes = np.bincount(labels)
+    first_row = np.full(len(sizes), n)
+    np.minimum.at(first_row, labels, np.arange(n))
+    order = np.lexsort((first_row, -sizes))
+    relabel = np.empty_like(order)
+    relabel[order] = np.arange(len(order))
+    return relabel[labels]
+
+
+def centrality(matrix: sp.csr_matrix, labels: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every row to the (normalised) centroid of its cluster."""
+    n_clusters = labels.max() + 1
+    membership = sp.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))),
+                               shape=(n_clusters, len(labels)))
+    centroids = membership @ matrix
+    norms = np.sqrt(np.asarray(centroids.multiply(centroids).sum(axis=1)).ravel())
+    centroids = sp.diags(1.0 / np.maximum(norms, 1e-12)) @ centroids
+    return np.asarray(matrix.multiply(centroids[labels]).sum(axis=1)).ravel()
+
+
+def cluster_news(news_list: List[Dict], matrix: sp.csr_matrix = None, threshold: float = CLUSTER_THRESHOLD,
+                 top_k: int = CLUSTER_TOP_K, max_clusters: int = MAX_CLUSTERS,
+                 token_budget: int = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Returns (representatives, clusters).
+
+    matrix: the articles' L2-normalised TF-IDF rows if already computed (e.g.
+        by deduplication); built from the articles otherwise.
+    token_budget: payload tokens the representatives may use (as counted
+        by prompt_payload.article_tokens); sub-events
+        beyond the `max_clusters` largest add their most central article
+        while it lasts. Without it they contribute nothing.
+    representatives: the chosen articles, largest sub-event first, each
+        annotated with 'cluster' (1-based) and 'cluster_size'.
+    clusters: one dict per sub-event with id, size, label (the most central
+        title), the member urls and the representatives' urls.
+    """
+    if not news_list:
+        return [], []
+    if matrix is None or matrix.shape[0] != len(news_list):
+        _, matrix = tfidf_matrix(news_texts(news_list))
+
+    labels = cluster_labels(matrix, threshold)
+    scores = centrality(matrix, labels)
+    # within each cluster, most central first
+    order = np.lexsort((-scores, labels))
+    starts = np.searchsorted(labels[order], np.arange(labels.max() + 2))
+
+    representatives, clusters = [], []
+    used, dropped, dropped_stories = 0, 0, 0
+    for cluster in range(labels.max() + 1):
+        members = order[starts[cluster]:starts[cluster + 1]].tolist()
+        annotated = [{**news_list[i], 'cluster': cluster + 1, 'cluster_size': len(members)}
+                     for i in members[:top_k]]
+        if cluster < max_clusters:
+            chosen = annotated
+            if token_budget:
+                used += sum(article_tokens(article, len(representatives) + n) for n, article in enumerate(chosen, 1))
+        elif token_budget:
+            # the long tail: one article per sub-event while the budget lasts
+            cost = article_tokens(annotated[0], len(representatives) + 1)
+            chosen = annotated[:1] if used + cost <= token_budget else []
+            used += cost if chosen else 0
+        else:
+            chosen = []
+        if not chosen:
+            dropped += 1
+            dropped_stories += len(members)
+        representatives += chosen
+        clusters.append({
+            'id': cluster + 1,
+            'size': len(members),
+            'label': news_list[members[0]]['title'],
+            'urls': [news_list[i]['url'] for i in members],
+            'representatives': [article['url'] for article in chosen],
+        })
+
+    metrics.set_gauge('clusters', len(clusters))
+    metrics.inc('cluster_representatives_total', len(representatives))
+    print(f"{len(news_list)} stories in {len(clusters)} sub-events, "
+          f"summarizing {len(representatives)} representative articles")
+    if dropped:
+        metrics.inc('clusters_dropped_total', dropped)
+        print(f"Warning: {dropped} smaller sub-events ({dropped_stories} stories) left out of the summary, "
+              f"{'over the token budget' if token_budget else f'beyond the {max_clusters} largest'}")
+    return representatives, clusters
+
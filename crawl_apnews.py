@@ -1,95 +1,126 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 import requests
 from datetime import datetime
-import time
-
-EDGE_DRIVER_PATH = r"D:\edgedriver_win32\msedgedriver.exe"
-
-def get_ap_news_list_selenium(topic, size):
-    edge_options = Options()
-    edge_options.add_argument("--headless")
-    edge_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0")
-
-    service = Service(EDGE_DRIVER_PATH)
-    driver = webdriver.Edge(service=service, options=edge_options)
-
-    try:
-        # open search page
-        url = f'https://apnews.com/search?q={topic}'
-        driver.get(url)
+import os
+
+from article_cache import get_article_cache
+from browser_pool import get_browser_pool, scroll_until, wait_for
+from html_extract import has_class, parse_html, select, select_one, text_of
+from http_fetcher import fetch_articles
+from rate_scheduler import get_rate_scheduler
+
+# site root; point it at a mirror or a local stand-in (see benchmarks/bench_pipeline.py)
+AP_BASE_URL = os.getenv("AP_BASE_URL", "https://apnews.com")
+# one search result: the search page waits for and scrolls by these
+AP_SEARCH_ITEM = (By.CLASS_NAME, "PagePromo-title")
+# max article requests in flight against apnews.com
+AP_MAX_CONCURRENCY = 4
+
+_session = requests.Session()
+
+def parse_ap_search_page(html, size):
+    """Titles and links from an AP search results page"""
+    root = parse_html(html)
+
+    news_list = []
+
+    cards = select(root, f"//div[{has_class('PagePromo-title')}]")
+    for card in cards:
+        if len(news_list) >= size:  # stop when limit reached
+            break
+        a_tag = select_one(card, ".//a")
+        if a_tag is not None:
+            title = text_of(a_tag)
+            link = a_tag.attrib['href']
+            news_list.append({'title': title, 'url': link})
+
+    return news_list
+
+
+def get_ap_news_list_selenium(topic, size, stop=None):
+    """stop: called with the results loaded so far; scrolling ends once it returns True"""
+    # open search page
+    url = f'{AP_BASE_URL}/search?q={topic}'
+    with get_browser_pool().lease(source='AP News', page='search') as driver:
+        with get_rate_scheduler().request(url):
+            driver.get(url)
 
         # wait for initial render
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
+        wait_for(driver, AP_SEARCH_ITEM, 20)  # a search without results has none
 
-        # scroll to load more news (simple: scroll twice, adjustable)
-        for _ in range(2):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)  # wait for content load
+        # scroll until enough results are loaded or no more come
+        scroll_until(driver, AP_SEARCH_ITEM, size,
+                     stop=(lambda: stop(parse_ap_search_page(driver.page_source, size))) if stop else None)
 
         # get page source
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        page_source = driver.page_source
+
+    return parse_ap_search_page(page_source, size)
 
-        news_list = []
 
-        cards = soup.find_all('div', class_='PagePromo-title')
-        for card in cards:
-            if len(news_list) >= size:  # stop when limit reached
-                break
-            a_tag = card.find('a')
-            if a_tag:
-                title = a_tag.get_text(strip=True)
-                link = a_tag['href']
-                news_list.append({'title': title, 'url': link})
 
-        return news_list
+def parse_ap_article(html):
+    """Extract body and publish date from an AP article page"""
+    root = parse_html(html)
 
-    finally:
-        driver.quit()
+    # body content
+    paragraphs = select(root, f"//div[{has_class('RichTextStoryBody')}]//p")
+    content = " ".join(text_of(p) for p in paragraphs)
 
+    # publish time
+    publish_date = ""
+    t = select_one(root, "//meta[@property='article:published_time']")
+    if t is not None and t.get("content"):
+        dt = datetime.fromisoformat(t.get("content").replace("Z", "+00:00"))
+        publish_date = dt.strftime("%Y-%m-%d")
+
+    return {
+        "content": content,
+        "publish_date": publish_date
+    }
 
 
-def get_ap_article_content(url):
+def _download_ap_article(url):
+    """Returns (article, response headers)."""
     headers = {
         "User-Agent": "Mozilla/5.0"
     }
 
+    scheduler = get_rate_scheduler()
     try:
         print(f"Crawling article: {url}")
-        resp = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        # body content
-        paragraphs = soup.select("div.RichTextStoryBody p")
-        content = " ".join(p.get_text(strip=True) for p in paragraphs)
-
-        # publish time
-        publish_date = ""
-        t = soup.find("meta", attrs={"property": "article:published_time"})
-        if t and t.get("content"):
-            dt = datetime.fromisoformat(t["content"].replace("Z", "+00:00"))
-            publish_date = dt.strftime("%Y-%m-%d")
-
-        return {
-            "content": content,
-            "publish_date": publish_date
-        }
+        scheduler.acquire(url)
+        try:
+            resp = _session.get(url, headers=headers, timeout=10)
+        except BaseException:
+            scheduler.record(url, error=True)
+            raise
+        scheduler.record(url, resp.status_code, retry_after=resp.headers.get('Retry-After'))
+        return parse_ap_article(resp.text), dict(resp.headers)
 
     except Exception as e:
         print("Article parsing failed:", e)
-        return {"content": "", "publish_date": ""}
+        return {"content": "", "publish_date": ""}, {}
+
 
+def get_ap_article_content(url, title=""):
+    cache = get_article_cache()
+    if cache is None:
+        return _download_ap_article(url)[0]
+    return cache.get_or_fetch(url, _download_ap_article, parse_ap_article, title)
 
-def get_ap_news_with_content(topic, max_articles=100):
+
+def get_ap_news_with_content(topic, max_articles=100, skip_url=None, watermark=None):
+    """With a watermark (see watermarks.py) results processed by earlier runs are skipped."""
     news_list = get_ap_news_list_selenium(topic, max_articles)
+    if watermark is not None:
+        # results are ranked by relevance, not date: a known one says nothing about the rest
+        new = watermark.unseen(news_list)
+        print(f"AP News: {len(new)} of {len(news_list)} results are new since the last run")
+        news_list = new
+    if skip_url is not None:
+        # already-known stories: don't spend a fetch on them
+        news_list = [news for news in news_list if not skip_url(news["url"])]
 
     if not news_list:
         print("AP News found no relevant news")
@@ -97,21 +128,40 @@ def get_ap_news_with_content(topic, max_articles=100):
 
     print(f"AP News found {len(news_list)} articles, starting to crawl body...")
 
-    detailed = []
-    for i, news in enumerate(news_list, 1):
-        print(f"AP News progress: {i}/{min(len(news_list), max_articles)}")
-        article = get_ap_article_content(news["url"])
+    # fetch bodies concurrently; the per-host cap keeps the crawl polite
+    total = min(len(news_list), max_articles)
+    done = 0
+
+    def report(result, article):
+        nonlocal done
+        done += 1
+        if result.error:
+            print(f"Article parsing failed: {result.url}: {result.error}")
+        print(f"AP News progress: {done}/{total}")
+
+    urls = [news["url"] for news in news_list]
+    cache = get_article_cache()
+    if cache is None:
+        articles = fetch_articles(urls, parse_ap_article, on_result=report, per_host=AP_MAX_CONCURRENCY)
+    else:
+        # fresh cache entries never hit the network, stale ones are revalidated
+        titles = {news["url"]: news["title"] for news in news_list}
+        articles = cache.fetch_many(urls, parse_ap_article, titles=titles, on_result=report,
+                                    per_host=AP_MAX_CONCURRENCY)
 
-        if article["content"]:
+    detailed = []
+    for news in news_list:
+        article = articles.get(news["url"])
+        if article and article["content"]:
             detailed.append({
                 "title": news["title"],
                 "url": news["url"],
                 "content": article["content"],
                 "publish_date": article["publish_date"],
-                "source": "AP News"
+                "source": "AP News",
+                "fetched_via": article.get("fetched_via", "http"),
             })
 
-        time.sleep(2)
     return detailed
 
 #
@@ -1,121 +1,179 @@
 # crawl_bbc.py
 import traceback
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from datetime import datetime
-import time
+import os
+
+from article_cache import get_article_cache
+from browser_pool import get_browser_pool, scroll_until, wait_for
+from html_extract import has_class, iso_date, parse_html, select, select_one, structured_article, text_of
+from http_fetcher import HTTP_FAST_PATH, fetch_page
+from rate_scheduler import get_rate_scheduler
+
+# site root; point it at a mirror or a local stand-in (see benchmarks/bench_pipeline.py)
+BBC_BASE_URL = os.getenv("BBC_BASE_URL", "https://www.bbc.co.uk")
+# elements the parsers read: page loads wait for these rather than for <body>
+BBC_ARTICLE_READY = (By.CSS_SELECTOR, 'div[data-component="text-block"]')
+BBC_SEARCH_ITEM = (By.CSS_SELECTOR, 'div[data-testid="default-promo"]')
+
+def parse_article(html):
+    """Extract body and publish date from a BBC News article page"""
+    return _parse_article(parse_html(html))
+
+
+def _parse_article(root):
+    """parse_article on an already parsed page"""
+    # extract body
+    content_parts = []
+    paragraphs = select(root, f"//div[@data-component='text-block']//p[{has_class('ssrcss-1q0x1qg-Paragraph')}]")
+    for p in paragraphs:
+        text = text_of(p)
+        if text:
+            content_parts.append(text)
+    full_content = ' '.join(content_parts)
+
+    # extract publish time
+    publish_date = ''
+    time_tag = select_one(root, "//time[@data-testid='timestamp']")
+    if time_tag is not None:
+        publish_date = iso_date(time_tag.get('datetime', ''))
+
+    return {'content': full_content, 'publish_date': publish_date}
+
+
+def extract_article(html):
+    """
+    parse_article, plus the body or publish date its selectors miss (markup
+    changed, paragraphs not server-rendered) taken from the JSON-LD / meta tags.
+    """
+    root = parse_html(html)
+    article = _parse_article(root)
+    if not article['content'] or not article['publish_date']:
+        structured = structured_article(root)
+        article['content'] = article['content'] or structured['content']
+        article['publish_date'] = article['publish_date'] or structured['publish_date']
+    return article
+
+
+def _crawl_article(url):
+    """Load a BBC News article in a pooled browser and parse it"""
+    try:
+        with get_browser_pool().lease(source='BBC News', page='article') as driver:
+            with get_rate_scheduler().request(url):
+                driver.get(url)
+
+            wait_for(driver, BBC_ARTICLE_READY, 10)
+
+            page_source = driver.page_source
 
-EDGE_DRIVER_PATH = r'D:\edgedriver_win32\msedgedriver.exe'
+        article = extract_article(page_source)
 
-def get_article_content(url):
+    except Exception as e:
+        print(f"Error crawling article {url}: {e}")
+        article = {'content': '', 'publish_date': ''}
+    article['fetched_via'] = 'browser'
+    return article
+
+
+def _download_article(url):
+    """
+    Fetch a BBC News article over plain HTTP; only pages that yield no body go through the browser.
+    Returns (article, response headers); the headers are empty for browser crawls.
+    """
+    print(f"Crawling article: {url}")
+    if HTTP_FAST_PATH:
+        result = fetch_page(url)
+        article = {'content': ''}
+        if result.ok:
+            try:
+                article = extract_article(result.text)
+            except Exception as e:
+                print(f"Error parsing article {url}: {e}")
+            if article['content']:
+                article['fetched_via'] = 'http'
+                return article, result.headers
+        print(f"No article body over HTTP ({result.error or 'empty'}), using the browser: {url}")
+    return _crawl_article(url), {}
+
+
+def get_article_content(url, title=''):
     """Crawl single BBC News article content"""
-    edge_options = Options()
-    edge_options.add_argument("--headless")
-    edge_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
-    )
+    cache = get_article_cache()
+    if cache is None:
+        return _download_article(url)[0]
+    return cache.get_or_fetch(url, _download_article, extract_article, title)
 
-    service = Service(EDGE_DRIVER_PATH)
-    driver = webdriver.Edge(service=service, options=edge_options)
 
-    try:
-        print(f"Crawling article: {url}")
-        driver.get(url)
+def parse_search_page(html, size):
+    """Titles and links from a BBC search results page"""
+    root = parse_html(html)
 
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    # extract news list
+    items = select(root, "//li")
+    news_list = []
 
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+    for it in items:
+        if len(news_list) >= size:  # Stop when upper bound is reached.
+            break
+        link_tag = select_one(it, f".//a[{has_class('ssrcss-163mj99-PromoLink')}]")
+        if link_tag is None:
+            continue
 
-        # extract body
-        content_parts = []
-        paragraphs = soup.select('div[data-component="text-block"] p.ssrcss-1q0x1qg-Paragraph')
-        for p in paragraphs:
-            text = p.get_text(strip=True)
-            if text:
-                content_parts.append(text)
-        full_content = ' '.join(content_parts)
+        url = link_tag.attrib["href"]
+        title_tag = select_one(link_tag, f".//p[{has_class('ssrcss-1b1mki6-PromoHeadline')}]")
+        title = text_of(title_tag) if title_tag is not None else ""
 
-        # extract publish time
-        publish_date = ''
-        time_tag = soup.select_one('time[data-testid="timestamp"]')
-        if time_tag and time_tag.has_attr('datetime'):
-            dt = datetime.fromisoformat(time_tag['datetime'].replace('Z', '+00:00'))
-            publish_date = dt.strftime("%Y-%m-%d")
+        news_list.append({
+            "title": title,
+            "url": url
+        })
 
-        return {'content': full_content, 'publish_date': publish_date}
+    return news_list
 
-    except Exception as e:
-        print(f"Error crawling article {url}: {e}")
-        return {'content': '', 'publish_date': ''}
-    finally:
-        driver.quit()
 
+def get_news_list_selenium(topic, size, stop=None):
+    """
+    Fetch BBC News list.
+    stop: called with the results loaded so far; scrolling ends once it returns True.
+    """
+    try:
+        search_url = f'{BBC_BASE_URL}/search?q={topic}'
+        with get_browser_pool().lease(source='BBC News', page='search') as driver:
+            with get_rate_scheduler().request(search_url):
+                driver.get(search_url)
 
-def get_news_list_selenium(topic, size):
-    """Fetch BBC News list"""
-    edge_options = Options()
-    edge_options.add_argument("--headless")
-    edge_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0")
+            # Wait for the initial rendering finished.
+            WebDriverWait(driver, 20).until(EC.presence_of_all_elements_located(BBC_SEARCH_ITEM))
 
-    service = Service(EDGE_DRIVER_PATH)
-    driver = webdriver.Edge(service=service, options=edge_options)
+            # scroll until enough results are loaded or no more come
+            scroll_until(driver, BBC_SEARCH_ITEM, size,
+                         stop=(lambda: stop(parse_search_page(driver.page_source, size))) if stop else None)
 
-    try:
-        search_url = f'https://www.bbc.co.uk/search?q={topic}'
-        driver.get(search_url)
-
-        # Wait for the initial rendering finished.
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div[data-testid="default-promo"]'))
-        )
-
-        # scroll to load more news (simple: scroll twice)
-        for _ in range(2):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-
-        # extract news list
-        items = soup.select("li")
-        news_list = []
-
-        for it in items:
-            if len(news_list) >= size:  # Stop when upper bound is reached.
-                break
-            link_tag = it.select_one("a.ssrcss-163mj99-PromoLink")
-            if not link_tag:
-                continue
-
-            url = link_tag["href"]
-            title_tag = link_tag.select_one("p.ssrcss-1b1mki6-PromoHeadline")
-            title = title_tag.get_text(strip=True) if title_tag else ""
-
-            news_list.append({
-                "title": title,
-                "url": url
-            })
+            page_source = driver.page_source
 
-        return news_list
+        return parse_search_page(page_source, size)
 
     except Exception as e:
         print(f"Error searching news list: {e}")
         traceback.print_exc()
         return []
-    finally:
-        driver.quit()
 
 
-def get_bbc_news_with_content(topic, max_articles=100):
-    """Fetch BBC News list and crawl full content"""
+def get_bbc_news_with_content(topic, max_articles=100, skip_url=None, watermark=None):
+    """
+    Fetch BBC News list and crawl full content.
+    With a watermark (see watermarks.py) results processed by earlier runs are skipped.
+    """
     news_list = get_news_list_selenium(topic, max_articles)
+    if watermark is not None:
+        # results are ranked by relevance, not date: a known one says nothing about the rest
+        new = watermark.unseen(news_list)
+        print(f"BBC News: {len(new)} of {len(news_list)} results are new since the last run")
+        news_list = new
+    if skip_url is not None:
+        # already-known stories: don't spend a fetch on them
+        news_list = [news for news in news_list if not skip_url(news['url'])]
     if not news_list:
         print("BBC News found no relevant news")
         return []
@@ -125,7 +183,7 @@ def get_bbc_news_with_content(topic, max_articles=100):
 
     for i, news in enumerate(news_list, 1):
         print(f" Progress: {i}/{min(len(news_list), max_articles)}")
-        article_content = get_article_content(news['url'])
+        article_content = get_article_content(news['url'], news['title'])
         if article_content['content']:
             detailed_news.append({
                 'title': news['title'],
@@ -133,8 +191,8 @@ def get_bbc_news_with_content(topic, max_articles=100):
                 'content': article_content['content'],
                 'publish_date': article_content['publish_date'],
                 'source': 'BBC News',
+                'fetched_via': article_content.get('fetched_via', ''),
             })
-        time.sleep(3)
 
     return detailed_news
 
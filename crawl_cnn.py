@@ -1,126 +1,181 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from datetime import datetime
-import time
-
-EDGE_DRIVER_PATH = r"D:\edgedriver_win32\msedgedriver.exe"
+import os
+
+from article_cache import get_article_cache
+from browser_pool import get_browser_pool, wait_for
+from html_extract import has_class, iso_date, parse_html, select, select_one, structured_article, text_of
+from http_fetcher import HTTP_FAST_PATH, fetch_page
+from rate_scheduler import get_rate_scheduler
+
+# site root; point it at a mirror or a local stand-in (see benchmarks/bench_pipeline.py)
+CNN_BASE_URL = os.getenv("CNN_BASE_URL", "https://edition.cnn.com")
+# elements the parsers read: page loads wait for these rather than for <body>
+CNN_ARTICLE_READY = (By.CLASS_NAME, "vossi-paragraph")
+CNN_SEARCH_READY = (By.CLASS_NAME, "container__headline")
+
+def parse_article(html):
+    """Extract body and publish date from a CNN article page"""
+    return _parse_article(parse_html(html))
+
+
+def _parse_article(root):
+    """parse_article on an already parsed page"""
+    # extract content
+    content_parts = []
+
+    # Method 1: finding all the p elements of within the article elements.
+    paragraphs = select(root, "//p[@class='paragraph-elevate inline-placeholder vossi-paragraph']")
+    if paragraphs:
+        for p in paragraphs:
+            text = text_of(p)
+            content_parts.append(text)
+
+    # Merge all the content.
+    full_content = ' '.join(content_parts)
+
+    # extract publish date
+    publish_date = select_one(root, f"//span[{has_class('timestamp__time-since')}]")
+    if publish_date is not None:
+        publish_date = iso_date(publish_date.get('data-first-publish', ''))
+    else:
+        publish_date = ''
+
+    return {
+        'content': full_content,
+        'publish_date': publish_date,
+    }
+
+
+def extract_article(html):
+    """
+    parse_article, plus the body or publish date its selectors miss (markup
+    changed, paragraphs not server-rendered) taken from the JSON-LD / meta tags.
+    """
+    root = parse_html(html)
+    article = _parse_article(root)
+    if not article['content'] or not article['publish_date']:
+        structured = structured_article(root)
+        article['content'] = article['content'] or structured['content']
+        article['publish_date'] = article['publish_date'] or structured['publish_date']
+    return article
+
+
+def _crawl_article(url):
+    """Load a CNN article in a pooled browser and parse it"""
+    try:
+        with get_browser_pool().lease(source='CNN', page='article') as driver:
+            with get_rate_scheduler().request(url):
+                driver.get(url)
 
-def get_article_content(url):
-    """Crawl single CNN article content"""
-    edge_options = Options()
-    edge_options.add_argument("--headless")
-    edge_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0")
+            # Wait until the article paragraphs are in; without them the parser falls back to JSON-LD.
+            wait_for(driver, CNN_ARTICLE_READY, 10)
 
-    service = Service(EDGE_DRIVER_PATH)
-    driver = webdriver.Edge(service=service, options=edge_options)
+            # Obtain the page source.
+            page_source = driver.page_source
 
-    try:
-        print(f"Crawling article: {url}")
-        driver.get(url)
-
-        # Wait until the article content is loaded.
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-
-        # Obtain the page source.
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-
-        # extract content
-        content_parts = []
-
-        # Method 1: finding all the p elements of within the article elements.
-        paragraphs = soup.find_all('p', class_='paragraph-elevate inline-placeholder vossi-paragraph')
-        if paragraphs:
-            for p in paragraphs:
-                text = p.get_text(strip=True)
-                content_parts.append(text)
-
-        # Merge all the content.
-        full_content = ' '.join(content_parts)
-
-        # extract publish date
-        publish_date = soup.find('span', class_="timestamp__time-since")
-        if publish_date:
-            publish_date = publish_date['data-first-publish']
-            dt = datetime.fromisoformat(publish_date.replace('Z', '+00:00'))
-            formatted_date = dt.strftime("%Y-%m-%d")
-            publish_date = formatted_date
-        else:
-            publish_date = ''
-
-        return {
-            'content': full_content,
-            'publish_date': publish_date,
-        }
+        article = extract_article(page_source)
 
     except Exception as e:
         print(f"Error crawling article {url}: {e}")
-        return {
+        article = {
             'content': '',
             'publish_date': '',
         }
-    finally:
-        driver.quit()
-
+    article['fetched_via'] = 'browser'
+    return article
+
+
+def _download_article(url):
+    """
+    Fetch a CNN article over plain HTTP; only pages that yield no body go through the browser.
+    Returns (article, response headers); the headers are empty for browser crawls.
+    """
+    print(f"Crawling article: {url}")
+    if HTTP_FAST_PATH:
+        result = fetch_page(url)
+        article = {'content': ''}
+        if result.ok:
+            try:
+                article = extract_article(result.text)
+            except Exception as e:
+                print(f"Error parsing article {url}: {e}")
+            if article['content']:
+                article['fetched_via'] = 'http'
+                return article, result.headers
+        print(f"No article body over HTTP ({result.error or 'empty'}), using the browser: {url}")
+    return _crawl_article(url), {}
+
+
+def get_article_content(url, title=''):
+    """Crawl single CNN article content"""
+    cache = get_article_cache()
+    if cache is None:
+        return _download_article(url)[0]
+    return cache.get_or_fetch(url, _download_article, extract_article, title)
+
+
+def parse_search_page(html):
+    """Headlines and links from a CNN search results page"""
+    root = parse_html(html)
+
+    news_list = []
+    # find headline elements
+    headlines = select(root, "//*[self::span or self::a][contains(@class, 'headline')]")
+
+    for headline in headlines[:10]:  # Get the top 10 headlines.
+        title = text_of(headline)
+        if title and len(title) > 10:  # filter too short
+            link = select_one(headline, "ancestor::a[1]")
+            url = link.get('href') if link is not None else ''
+            if url and not url.startswith('http'):
+                url = CNN_BASE_URL + url
+
+            news_list.append({
+                'title': title,
+                'url': url
+            })
 
-def get_news_list_selenium(topic, size):
-    edge_options = Options()
-    edge_options.add_argument("--headless")
-    edge_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0")
+    return news_list
 
-    service = Service(EDGE_DRIVER_PATH)
-    driver = webdriver.Edge(service=service, options=edge_options)
 
+def get_news_list_selenium(topic, size):
     try:
-        url = f'https://edition.cnn.com/search?q={topic}&from=0&size={size}&page=1&sort=newest&types=article'
-        driver.get(url)
-
-        # wait for page load
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "container__headline"))
-        )
+        url = f'{CNN_BASE_URL}/search?q={topic}&from=0&size={size}&page=1&sort=newest&types=article'
+        with get_browser_pool().lease(source='CNN', page='search') as driver:
+            with get_rate_scheduler().request(url):
+                driver.get(url)
 
-        # get page source
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+            # wait for page load
+            WebDriverWait(driver, 20).until(EC.presence_of_element_located(CNN_SEARCH_READY))
 
-        news_list = []
-        # find headline elements
-        headlines = soup.find_all(['span', 'a'], class_=lambda x: x and 'headline' in x)
+            # get page source
+            page_source = driver.page_source
 
-        for headline in headlines[:10]:  # Get the top 10 headlines.
-            title = headline.get_text(strip=True)
-            if title and len(title) > 10:  # filter too short
-                link = headline.find_parent('a')
-                url = link.get('href') if link else ''
-                if url and not url.startswith('http'):
-                    url = 'https://edition.cnn.com' + url
-
-                news_list.append({
-                    'title': title,
-                    'url': url
-                })
-
-        return news_list
+        return parse_search_page(page_source)
 
     except Exception as e:
         print(f"Error searching news list: {e}")
         return []
-    finally:
-        driver.quit()
 
 
-def get_cnn_news_with_content(topic, max_articles=100):
-    """Fetch news list and crawl full content"""
+def get_cnn_news_with_content(topic, max_articles=100, skip_url=None, watermark=None):
+    """
+    Fetch news list and crawl full content.
+    With a watermark (see watermarks.py) only results newer than the last run are fetched.
+    """
     # get news list
     news_list = get_news_list_selenium(topic, max_articles)
+    if watermark is not None:
+        # results are sorted newest first: stop at the ones the last run processed
+        # (before skip_url, which would hide the run of known results)
+        new = watermark.take_new(news_list)
+        print(f"CNN: {len(new)} of {len(news_list)} results are new since the last run")
+        news_list = new
+    if skip_url is not None:
+        # already-known stories: don't spend a fetch on them
+        news_list = [news for news in news_list if not skip_url(news['url'])]
 
     if not news_list:
         print("CNN found no relevant news")
@@ -134,7 +189,10 @@ def get_cnn_news_with_content(topic, max_articles=100):
         print(f"CNN progress: {i}/{min(len(news_list), max_articles)}")
 
         # crawl article content
-        article_content = get_article_content(news['url'])
+        article_content = get_article_content(news['url'], news['title'])
+        if watermark is not None and watermark.is_older(article_content['publish_date']):
+            print("CNN reached articles older than the last run, stopping")
+            break
         if article_content['content']:
             # merge info
             detailed_news.append({
@@ -143,11 +201,9 @@ def get_cnn_news_with_content(topic, max_articles=100):
                 'content': article_content['content'],
                 'publish_date': article_content['publish_date'],
                 'source': 'CNN',
+                'fetched_via': article_content.get('fetched_via', ''),
             })
 
-
-        time.sleep(3)
-
     return detailed_news
 
 
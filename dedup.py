@@ -0,0 +1,201 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import metrics
+
+DEDUP_THRESHOLD = 0.85  # high threshold for strict dedup
+
+
+def news_texts(news_list: List[Dict]) -> List[str]:
+    # merge title + body as text representation
+    return [news['title'] + ' ' + news.get('content', '') for news in news_list]
+
+
+def tfidf_matrix(texts: Iterable[str]) -> Tuple[TfidfVectorizer, sp.csr_matrix]:
+    """TF-IDF rows are L2-normalised, so a row dot product is the cosine similarity."""
+    vectorizer = TfidfVectorizer(stop_words='english')
+    return vectorizer, vectorizer.fit_transform(texts).tocsr()
+
+
+class _PrefixIndex:
+    """
+    Prefix-filtering view of L2-normalised rows (Bayardo et al., "Scaling up
+    all pairs similarity search").
+
+    Terms get one global order, most frequent first. Every row drops its most
+    common terms while their combined norm stays below `threshold` and keeps
+    the rest in `kept`. For a pair, let y be the row whose kept part starts
+    later in the order. Shared terms outside both kept parts all lie in y's
+    dropped prefix, so
+
+        x.y <= x_kept.y_kept + |x before y's start| * |y_prefix|
+
+    and as |y_prefix| < threshold, every pair above the threshold shares a
+    kept term.
+    """
+
+    def __init__(self, matrix: sp.csr_matrix, threshold: float):
+        n_rows, n_cols = matrix.shape
+        rows = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+        cols = matrix.indices
+        weights = matrix.data
+
+        doc_freq = np.bincount(cols, minlength=n_cols)
+        rank = np.empty(n_cols, dtype=np.int64)
+        rank[np.argsort(-doc_freq, kind='stable')] = np.arange(n_cols)
+
+        order = np.lexsort((rank[cols], rows))
+        rows, cols, weights = rows[order], cols[order], weights[order]
+        term_rank = rank[cols]
+
+        # running squared norm inside each row, in term order
+        squares = weights.astype(np.float64) ** 2
+        running = np.cumsum(squares)
+        row_start = np.concatenate(([0.0], running))[matrix.indptr[:-1]]
+        running -= np.repeat(row_start, np.diff(matrix.indptr))
+
+        keep = running >= threshold ** 2
+        self.kept = sp.csr_matrix((weights[keep], (rows[keep], cols[keep])), shape=matrix.shape)
+        self.kept_start = np.full(n_rows, n_cols, dtype=np.int64)
+        np.minimum.at(self.kept_start, rows[keep], term_rank[keep])
+        self.prefix_norm = np.sqrt(np.bincount(rows[~keep], weights=squares[~keep], minlength=n_rows))
+
+        self._n_cols = n_cols
+        self._indptr = matrix.indptr
+        self._keys = rows * n_cols + term_rank  # sorted, as entries are ordered by (row, rank)
+        self._running = running
+
+    def norm_before(self, rows: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+        """Norm of each row restricted to terms ordered before the given rank."""
+        last = np.searchsorted(self._keys, rows * self._n_cols + ranks) - 1
+        inside = last >= self._indptr[rows]
+        return np.sqrt(np.where(inside, self._running[np.maximum(last, 0)], 0.0))
+
+    def upper_bound(self, left: np.ndarray, right: np.ndarray, kept_dot: np.ndarray) -> np.ndarray:
+        right_later = self.kept_start[right] >= self.kept_start[left]
+        early = np.where(right_later, left, right)
+        late = np.where(right_later, right, left)
+        return kept_dot + self.norm_before(early, self.kept_start[late]) * self.prefix_norm[late]
+
+
+def _row_dots(matrix: sp.csr_matrix, left: np.ndarray, right: np.ndarray, chunk: int = 20_000) -> np.ndarray:
+    out = np.empty(len(left), dtype=np.float64)
+    for start in range(0, len(left), chunk):
+        stop = start + chunk
+        out[start:stop] = np.asarray(
+            matrix[left[start:stop]].multiply(matrix[right[start:stop]]).sum(axis=1)).ravel()
+    return out
+
+
+def find_similar_pairs(matrix: sp.csr_matrix, threshold: float = DEDUP_THRESHOLD,
+                       block_size: int = 2048) -> np.ndarray:
+    """
+    All pairs (i, j), i < j, of L2-normalised rows with cosine >= threshold.
+
+    Exact, but avoids the dense n x n similarity matrix: candidate pairs are
+    rows sharing one of their rarest terms (see `_PrefixIndex`), found with
+    a sparse product `block_size` rows at a time, pruned with the prefix bound
+    and then verified with exact dot products. Returns an int array of shape (k, 2).
+    """
+    matrix = sp.csr_matrix(matrix)
+    matrix.sum_duplicates()
+    if matrix.shape[0] < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    index = _PrefixIndex(matrix, threshold)
+    kept_t = index.kept.T.tocsr()
+
+    pairs = [np.empty((0, 2), dtype=np.int64)]
+    for start in range(0, matrix.shape[0], block_size):
+        shared = sp.triu((index.kept[start:start + block_size] @ kept_t), k=start + 1).tocoo()
+        left = shared.row.astype(np.int64) + start
+        right = shared.col.astype(np.int64)
+        mask = index.upper_bound(left, right, shared.data) >= threshold - 1e-9
+        metrics.inc('dedup_candidate_pairs_total', len(mask))
+        pairs.append(np.stack([left[mask], right[mask]], axis=1))
+
+    candidates = np.concatenate(pairs)
+    if not len(candidates):
+        return candidates
+    metrics.inc('dedup_verified_pairs_total', len(candidates))
+    similarity = _row_dots(matrix, candidates[:, 0], candidates[:, 1])
+    similar = candidates[similarity >= threshold]
+    metrics.inc('dedup_similar_pairs_total', len(similar))
+    return similar
+
+
+def merge_groups(n: int, pairs: np.ndarray) -> List[Tuple[int, List[int]]]:
+    """
+    Greedy merge in list order: each kept index absorbs the later, not yet
+    merged indices it is similar to. Returns (kept index, absorbed indices).
+    """
+    neighbours: Dict[int, List[int]] = {}
+    for i, j in pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))].tolist():
+        neighbours.setdefault(i, []).append(j)
+
+    groups = []
+    seen_indices = set()
+    for i in range(n):
+        if i in seen_indices:
+            continue
+        seen_indices.add(i)
+        absorbed = [j for j in neighbours.get(i, ()) if j not in seen_indices]
+        seen_indices.update(absorbed)
+        groups.append((i, absorbed))
+    return groups
+
+
+def _absorb(news: Dict, similar: List[Dict]) -> Dict:
+    # init url list. By default it contains the url of the current news.
+    news['urls'] = [news['url']]
+    for other in similar:
+        # The content of the similar news is discarded, only url and source are kept.
+        news['urls'].append(other['url'])
+
+        # merge source if not duplicate
+        if other['source'] not in news['source']:
+            news['source'] += ', ' + other['source']
+    return news
+
+
+def merge_similar(news_list: List[Dict], pairs: np.ndarray) -> List[Dict]:
+    """
+    Greedy merge in list order: each kept article absorbs the later, not yet
+    merged articles it is similar to, collecting their URLs in `urls` and their
+    sources in `source`.
+    """
+    return [_absorb(news_list[i], [news_list[j] for j in absorbed])
+            for i, absorbed in merge_groups(len(news_list), pairs)]
+
+
+def deduplicate(news_list: List[Dict], threshold: float = DEDUP_THRESHOLD, with_matrix: bool = False):
+    """
+    Merged articles; with `with_matrix`, (articles, TF-IDF rows of the kept
+    articles) so later stages (see clustering.py) need not vectorize again.
+    """
+    if not news_list:
+        return ([], None) if with_matrix else []
+    _, matrix = tfidf_matrix(news_texts(news_list))
+    groups = merge_groups(len(news_list), find_similar_pairs(matrix, threshold))
+    unique = [_absorb(news_list[i], [news_list[j] for j in absorbed]) for i, absorbed in groups]
+    return (unique, matrix[[i for i, _ in groups]]) if with_matrix else unique
+
+
+def deduplicate_stored(store, ids: List[int], threshold: float = DEDUP_THRESHOLD, with_matrix: bool = False):
+    """
+    `deduplicate` over articles in an ArticleStore. Texts are streamed from
+    the store into the TF-IDF matrix and only the bodies of the kept
+    articles are loaded, so the whole set's content is never held at once.
+    """
+    if not ids:
+        return ([], None) if with_matrix else []
+    _, matrix = tfidf_matrix(store.texts(ids))
+    groups = merge_groups(len(ids), find_similar_pairs(matrix, threshold))
+    matrix = matrix[[i for i, _ in groups]] if with_matrix else None
+    meta = store.get(ids, ('url', 'source'))
+    kept = store.get([ids[i] for i, _ in groups], ('url', 'title', 'source', 'publish_date', 'content'))
+    unique = [_absorb(news, [meta[j] for j in absorbed]) for news, (_, absorbed) in zip(kept, groups)]
+    return (unique, matrix) if with_matrix else unique
@@ -0,0 +1,232 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from cache_store import CACHE_DIR
+from dedup import DEDUP_THRESHOLD
+
+N_FEATURES = 2 ** 20
+
+
+class DedupIndex:
+    """
+    Persistent, incrementally updated index of already-seen stories.
+
+    Texts are embedded with a HashingVectorizer, so the vocabulary is fixed
+    and nothing is refitted when articles are added. Term weights are
+    sublinear tf times an IDF taken from a snapshot of document frequencies;
+    the snapshot (and every stored vector) is refreshed whenever the index has
+    doubled in size since the last one, so adding stays O(1) amortised.
+
+    Lookups use the same prefix filtering as `dedup.find_similar_pairs`: each
+    story is posted only under its rarest terms, candidates are scored on
+    those terms, pruned with the prefix bound and only the survivors are
+    verified. A query touches a handful of stories, not the whole index.
+    """
+
+    def __init__(self, path: str = None, threshold: float = DEDUP_THRESHOLD, max_age: float = None):
+        self.path = path or os.path.join(CACHE_DIR, 'dedup_index.pkl')
+        self.threshold = threshold
+        self.max_age = max_age  # seconds; stories older than this are dropped by expire()
+
+        # id -> {'key', 'indices', 'tf', 'timestamp', 'urls', 'meta'} plus the weighted
+        # vector and prefix data derived from the current snapshot
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[int, Dict[int, float]] = {}  # term -> {doc id: weight}
+        self._urls: Dict[str, int] = {}
+        self._df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._snapshot_size = 0
+        self._next_id = 0
+        self._take_snapshot()
+        self._lock = threading.RLock()
+        self._init_vectorizer()
+
+    def _init_vectorizer(self):
+        self._vectorizer = HashingVectorizer(n_features=N_FEATURES, stop_words='english',
+                                             alternate_sign=False, norm=None)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # derived data is rebuilt on load
+        for key in ('_lock', '_vectorizer', '_postings', '_idf', '_rank'):
+            del state[key]
+        state['_docs'] = {doc_id: {k: doc[k] for k in ('key', 'indices', 'tf', 'timestamp', 'urls', 'meta')}
+                          for doc_id, doc in self._docs.items()}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._init_vectorizer()
+        self._rebuild()
+
+    def _take_snapshot(self):
+        n_docs = len(self._docs)
+        self._snapshot_size = n_docs
+        self._idf = (np.log((1.0 + n_docs) / (1.0 + self._df)) + 1.0).astype(np.float32)
+        # global term order for prefix filtering: most frequent terms first
+        self._rank = np.empty(N_FEATURES, dtype=np.int32)
+        self._rank[np.lexsort((np.arange(N_FEATURES), -self._df))] = np.arange(N_FEATURES, dtype=np.int32)
+
+    def _term_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        row = self._vectorizer.transform([text])
+        # sublinear tf, so repeated words don't dominate the vector
+        return row.indices.astype(np.int32), (1.0 + np.log(row.data)).astype(np.float32)
+
+    def _weigh(self, indices: np.ndarray, tf: np.ndarray) -> Dict[str, Any]:
+        """Weighted, normalised vector in term order plus its prefix-filtering split."""
+        order = np.argsort(self._rank[indices])
+        indices = indices[order]
+        data = tf[order] * self._idf[indices]
+        data /= np.linalg.norm(data) or 1.0
+        running = np.cumsum(data.astype(np.float64) ** 2)
+        kept = running >= self.threshold ** 2
+        first_kept = int(np.argmax(kept)) if kept.any() else len(indices)
+        ranks = self._rank[indices]
+        return {
+            'indices': indices, 'data': data, 'ranks': ranks, 'running': running,
+            'kept_from': first_kept,
+            'kept_start': int(ranks[first_kept]) if first_kept < len(indices) else N_FEATURES,
+            'prefix_norm': float(np.sqrt(running[first_kept - 1])) if first_kept else 0.0,
+        }
+
+    def _post(self, doc_id: int, doc: Dict[str, Any]):
+        vector = self._weigh(doc['indices'], doc['tf'])
+        doc['vector'] = vector
+        start = vector['kept_from']
+        for term, weight in zip(vector['indices'][start:].tolist(), vector['data'][start:].tolist()):
+            self._postings.setdefault(term, {})[doc_id] = weight
+
+    def _rebuild(self):
+        self._take_snapshot()
+        self._postings = {}
+        for doc_id, doc in self._docs.items():
+            self._post(doc_id, doc)
+
+    @staticmethod
+    def _norm_before(vector: Dict[str, Any], rank: int) -> float:
+        """Norm of the vector restricted to terms ordered before `rank`."""
+        pos = int(np.searchsorted(vector['ranks'], rank))
+        return float(np.sqrt(vector['running'][pos - 1])) if pos else 0.0
+
+    @staticmethod
+    def _dot(sorted_indices: np.ndarray, sorted_data: np.ndarray, vector: Dict[str, Any]) -> float:
+        pos = np.searchsorted(sorted_indices, vector['indices'])
+        pos[pos == len(sorted_indices)] = 0
+        match = sorted_indices[pos] == vector['indices']
+        return float(np.dot(sorted_data[pos[match]], vector['data'][match]))
+
+    def find_duplicate(self, text: str) -> Optional[Tuple[str, float]]:
+        """Return (key, similarity) of the most similar stored story above the threshold, else None."""
+        indices, tf = self._term_counts(text)
+        if not len(indices):
+            return None
+        with self._lock:
+            query = self._weigh(indices, tf)
+
+            # similarity restricted to the kept (rare) terms of both sides
+            partial: Dict[int, float] = {}
+            start = query['kept_from']
+            for term, weight in zip(query['indices'][start:].tolist(), query['data'][start:].tolist()):
+                for doc_id, doc_weight in self._postings.get(term, {}).items():
+                    partial[doc_id] = partial.get(doc_id, 0.0) + weight * doc_weight
+
+            by_index = np.argsort(query['indices'])
+            sorted_indices, sorted_data = query['indices'][by_index], query['data'][by_index]
+
+            best = None
+            for doc_id, score in partial.items():
+                vector = self._docs[doc_id]['vector']
+                # prefix bound, see dedup._PrefixIndex
+                if vector['kept_start'] >= query['kept_start']:
+                    bound = score + self._norm_before(query, vector['kept_start']) * vector['prefix_norm']
+                else:
+                    bound = score + self._norm_before(vector, query['kept_start']) * query['prefix_norm']
+                if bound < self.threshold - 1e-9:
+                    continue
+                similarity = self._dot(sorted_indices, sorted_data, vector)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (self._docs[doc_id]['key'], similarity)
+            return best
+
+    def contains_url(self, url: str) -> bool:
+        return url in self._urls
+
+    def add(self, key: str, text: str, timestamp: float = None, urls=(), **meta) -> int:
+        """Store a story; `urls` are remembered so already-seen articles can be skipped before fetching."""
+        indices, tf = self._term_counts(text)
+        with self._lock:
+            doc_id = self._next_id
+            self._next_id += 1
+            doc = {'key': key, 'indices': indices, 'tf': tf,
+                   'timestamp': timestamp or time.time(), 'urls': list(urls), 'meta': meta}
+            self._docs[doc_id] = doc
+            self._df[indices] += 1
+            for url in doc['urls']:
+                self._urls[url] = doc_id
+
+            if len(self._docs) >= max(2 * self._snapshot_size, 64):
+                self._rebuild()
+            else:
+                self._post(doc_id, doc)
+            return doc_id
+
+    def expire(self, max_age: float = None) -> int:
+        """Drop stories older than max_age seconds (defaults to the index's max_age)."""
+        max_age = max_age if max_age is not None else self.max_age
+        if max_age is None:
+            return 0
+        cutoff = time.time() - max_age
+        with self._lock:
+            stale = [doc_id for doc_id, doc in self._docs.items() if doc['timestamp'] < cutoff]
+            for doc_id in stale:
+                doc = self._docs.pop(doc_id)
+                self._df[doc['indices']] -= 1
+                for term in doc['vector']['indices'][doc['vector']['kept_from']:].tolist():
+                    posting = self._postings.get(term)
+                    if posting is not None:
+                        posting.pop(doc_id, None)
+                        if not posting:
+                            del self._postings[term]
+                for url in doc['urls']:
+                    if self._urls.get(url) == doc_id:
+                        del self._urls[url]
+            return len(stale)
+
+    def save(self):
+        """Write the index atomically; safe to call from several threads (and processes) at once."""
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # a temp file of its own per save, so concurrent saves never rename each other's half-written file
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with self._lock, os.fdopen(fd, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str = None, **kwargs) -> 'DedupIndex':
+        """Load the index stored at path, or start an empty one."""
+        index = cls(path, **kwargs)
+        if os.path.exists(index.path):
+            with open(index.path, 'rb') as f:
+                index = pickle.load(f)
+            index.path = path or index.path
+            for key, value in kwargs.items():
+                setattr(index, key, value)
+            if 'threshold' in kwargs:
+                index._rebuild()  # postings depend on the threshold
+        return index
@@ -0,0 +1,341 @@
+"""
+2-D maps of topic summaries and their articles, for many topics at once.
+
+Documents come straight from pipeline outputs: run directories written by
+`run_pipeline(run_dir=...)` (dedup.jsonl and summarize.json), the article
+store, or, for older runs, the rendered HTML reports. They are streamed
+into a sparse TF-IDF matrix (never densified), reduced to
+EMBED_SVD_COMPONENTS dimensions with TruncatedSVD and only then projected
+to 2-D with UMAP, t-SNE or the first two SVD components. Memory is bounded
+by the sparse matrix and an n x EMBED_SVD_COMPONENTS float32 array, so
+100k+ articles fit comfortably.
+
+The reduced matrix and every projection are cached in .cache/embeddings
+under a hash of the documents and the parameters, so re-plotting, or
+switching between UMAP and t-SNE, does not vectorize the corpus again.
+
+    corpus = Corpus().add_runs(['runs/tesla', 'runs/zootopia'])
+    result = embed(corpus, method='tsne')
+    result['points'], result['labels'], result['roles']
+
+Usage from the command line (t-SNE by default; --method umap needs `pip install umap-learn`):
+    python embedding_viz.py --run runs/tesla runs/zootopia --output points.csv
+    python embedding_viz.py --store-topic Tesla --store-topic Zootopia --method tsne --plot map.png
+    python embedding_viz.py --report html/*.html --method svd
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+import metrics
+from cache_store import CACHE_DIR
+from html_extract import has_class, parse_html, select, select_one, text_of
+
+EMBED_SVD_COMPONENTS = int(os.getenv("EMBED_SVD_COMPONENTS", 100))
+# vocabulary cap; rarer terms barely move a 2-D map but grow the matrix
+EMBED_MAX_FEATURES = int(os.getenv("EMBED_MAX_FEATURES", 200000))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join(CACHE_DIR, 'embeddings'))
+METHODS = ('umap', 'tsne', 'svd')
+
+# per-document fields kept next to the points
+META_FIELDS = ('label', 'role', 'title', 'url')
+
+Document = Dict[str, str]
+
+
+def _run_documents(run_dir: str, label: str = None) -> Iterator[Document]:
+    summary_path = os.path.join(run_dir, 'summarize.json')
+    summary = {}
+    if os.path.exists(summary_path):
+        with open(summary_path, encoding='utf-8') as f:
+            summary = json.load(f)
+    label = label or summary.get('topic') or os.path.basename(os.path.normpath(run_dir))
+    if summary.get('summary'):
+        yield {'text': summary['summary'], 'label': label, 'role': 'topic', 'title': label, 'url': ''}
+    with open(os.path.join(run_dir, 'dedup.jsonl'), encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                article = json.loads(line)
+                yield {'text': article['title'] + ' ' + article.get('content', ''), 'label': label,
+                       'role': 'article', 'title': article['title'], 'url': article.get('url', '')}
+
+
+def _store_documents(store, topic: str, label: str = None, **filters) -> Iterator[Document]:
+    for article in store.iter_articles(topic=topic, fields=('title', 'url', 'content'), **filters):
+        yield {'text': article['title'] + ' ' + article['content'], 'label': label or topic,
+               'role': 'article', 'title': article['title'], 'url': article['url']}
+
+
+def _report_documents(path: str, label: str = None) -> Iterator[Document]:
+    with open(path, encoding='utf-8') as f:
+        root = parse_html(f.read())
+    heading = select_one(root, f"//div[{has_class('container')}]//h1")
+    label = label or (text_of(heading) if heading is not None else os.path.splitext(os.path.basename(path))[0])
+    summary = select_one(root, f"//div[{has_class('summary-content')}]")
+    if summary is not None:
+        yield {'text': text_of(summary), 'label': label, 'role': 'topic', 'title': label, 'url': ''}
+    # reports only keep a 200-character preview of each article
+    for card in select(root, f"//div[{has_class('article-card')}]"):
+        link = select_one(card, f".//*[{has_class('article-title')}]//a")
+        content = select_one(card, f".//*[{has_class('article-content')}]")
+        title = text_of(link) if link is not None else ''
+        yield {'text': title + ' ' + (text_of(content) if content is not None else ''), 'label': label,
+               'role': 'article', 'title': title, 'url': link.get('href', '') if link is not None else ''}
+
+
+class Corpus:
+    """
+    Re-iterable stream of documents ({text, label, role, title, url}, role
+    'topic' for a summary and 'article' otherwise). Nothing is read until
+    the corpus is iterated, and every pass reads its sources again, so the
+    texts are never all held in memory.
+    """
+
+    def __init__(self):
+        self._sources: List[Callable[[], Iterator[Document]]] = []
+
+    def add_run(self, run_dir: str, label: str = None) -> 'Corpus':
+        self._sources.append(lambda: _run_documents(run_dir, label))
+        return self
+
+    def add_runs(self, run_dirs: Iterable[str]) -> 'Corpus':
+        for run_dir in run_dirs:
+            self.add_run(run_dir)
+        return self
+
+    def add_store(self, topic: str, store=None, label: str = None, **filters) -> 'Corpus':
+        """Articles of a topic in the article store (filters as in ArticleStore.iter_articles)."""
+        if store is None:
+            from article_store import get_article_store
+            store = get_article_store()
+        self._sources.append(lambda: _store_documents(store, topic, label, **filters))
+        return self
+
+    def add_report(self, path: str, label: str = None) -> 'Corpus':
+        self._sources.append(lambda: _report_documents(path, label))
+        return self
+
+    def __iter__(self) -> Iterator[Document]:
+        for source in self._sources:
+            yield from source()
+
+    def fingerprint(self) -> str:
+        """Hash of every document, streamed; the cache key of everything derived from the corpus."""
+        digest = hashlib.sha256()
+        for document in self:
+            for field in ('text',) + META_FIELDS:
+                digest.update(document[field].encode('utf-8'))
+                digest.update(b'\0')
+        return digest.hexdigest()
+
+
+def vectorize(documents: Iterable[Document]) -> Tuple[Dict[str, List[str]], sp.csr_matrix]:
+    """
+    Sparse L2-normalised TF-IDF rows of the documents in one streaming pass,
+    plus their metadata as {field: list}.
+    """
+    meta = {field: [] for field in META_FIELDS}
+
+    def texts():
+        for document in documents:
+            for field in META_FIELDS:
+                meta[field].append(document[field])
+            yield document['text']
+
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=EMBED_MAX_FEATURES, dtype=np.float32)
+    with metrics.timer('embed_seconds', step='tfidf'):
+        matrix = vectorizer.fit_transform(texts()).tocsr()
+    return meta, matrix
+
+
+def reduce(matrix: sp.csr_matrix, n_components: int = EMBED_SVD_COMPONENTS) -> np.ndarray:
+    """LSA: TruncatedSVD of the sparse matrix, rows re-normalised so dot products stay cosines."""
+    n_components = min(n_components, min(matrix.shape) - 1)
+    if n_components < 2:
+        # too few documents or terms to decompose; the matrix is tiny anyway
+        dense = np.zeros((matrix.shape[0], 2), dtype=np.float32)
+        dense[:, :min(2, matrix.shape[1])] = matrix[:, :2].toarray()
+        return dense
+    with metrics.timer('embed_seconds', step='svd'):
+        svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=0)
+        reduced = svd.fit_transform(matrix)
+    return normalize(reduced).astype(np.float32)
+
+
+def project(reduced: np.ndarray, method: str = 'tsne', n_neighbors: int = 15, perplexity: float = 30.0) -> np.ndarray:
+    """2-D coordinates of the reduced rows."""
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+    n = reduced.shape[0]
+    # UMAP and t-SNE need a handful of neighbours to work with
+    if method == 'svd' or n < 5:
+        return reduced[:, :2].copy()
+    with metrics.timer('embed_seconds', step=method):
+        if method == 'umap':
+            try:
+                import umap
+            except ImportError as e:
+                raise ImportError("method 'umap' needs umap-learn (pip install umap-learn)") from e
+            # rows are unit length, so euclidean neighbours are cosine neighbours
+            return umap.UMAP(n_neighbors=min(n_neighbors, n - 1), low_memory=True).fit_transform(reduced)
+        from sklearn.manifold import TSNE
+        return TSNE(n_components=2, perplexity=min(perplexity, (n - 1) / 3), init='pca',
+                    random_state=0).fit_transform(reduced)
+
+
+def label_similarity(reduced: np.ndarray, labels: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """(labels, cosine similarity of their centroids): a topics x topics matrix instead of documents x documents."""
+    names, index = np.unique(np.asarray(labels), return_inverse=True)
+    membership = sp.csr_matrix((np.ones(len(index)), (index, np.arange(len(index)))), shape=(len(names), len(index)))
+    centroids = normalize(membership @ reduced)
+    return names.tolist(), centroids @ centroids.T
+
+
+def _cache_path(*parts: Any) -> str:
+    key = hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(EMBED_CACHE_DIR, key)
+
+
+def _save(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, List[str]] = None):
+    os.makedirs(EMBED_CACHE_DIR, exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path + '.npz')
+    if meta is not None:
+        with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + '.json.tmp', path + '.json')
+
+
+def _load(path: str, with_meta: bool = False):
+    if not os.path.exists(path + '.npz') or (with_meta and not os.path.exists(path + '.json')):
+        return None
+    with np.load(path + '.npz') as data:
+        arrays = {name: data[name] for name in data.files}
+    if not with_meta:
+        return arrays
+    with open(path + '.json', encoding='utf-8') as f:
+        return arrays, json.load(f)
+
+
+def embed(corpus: Iterable[Document], method: str = 'tsne', n_components: int = EMBED_SVD_COMPONENTS,
+          cache: bool = True, **params) -> Dict[str, Any]:
+    """
+    Project a corpus to 2-D. Returns {'points', 'reduced', 'labels', 'roles',
+    'titles', 'urls'}; `params` go to `project`. With `cache` the reduced
+    matrix and the projection are reused when the corpus is unchanged.
+    """
+    if not cache or not isinstance(corpus, Corpus):
+        meta, matrix = vectorize(corpus)
+        reduced = reduce(matrix, n_components)
+        points = project(reduced, method, **params)
+    else:
+        fingerprint = corpus.fingerprint()
+        reduced_path = _cache_path(fingerprint, n_components, EMBED_MAX_FEATURES)
+        points_path = _cache_path(fingerprint, n_components, EMBED_MAX_FEATURES, method, params)
+        cached = _load(reduced_path, with_meta=True)
+        if cached is None:
+            metrics.inc('embed_cache_total', result='miss')
+            meta, matrix = vectorize(corpus)
+            reduced = reduce(matrix, n_components)
+            del matrix
+            _save(reduced_path, {'reduced': reduced}, meta)
+        else:
+            metrics.inc('embed_cache_total', result='hit')
+            arrays, meta = cached
+            reduced = arrays['reduced']
+        projected = _load(points_path)
+        if projected is None:
+            points = project(reduced, method, **params)
+            _save(points_path, {'points': points})
+        else:
+            points = projected['points']
+    print(f"Embedded {len(reduced)} documents ({method})")
+    return {
+        'points': np.asarray(points),
+        'reduced': reduced,
+        'labels': meta['label'],
+        'roles': meta['role'],
+        'titles': meta['title'],
+        'urls': meta['url'],
+    }
+
+
+def write_csv(result: Dict[str, Any], path: str):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['x', 'y', 'label', 'role', 'title', 'url'])
+        for (x, y), label, role, title, url in zip(result['points'], result['labels'], result['roles'],
+                                                   result['titles'], result['urls']):
+            writer.writerow([f'{x:.5f}', f'{y:.5f}', label, role, title, url])
+
+
+def plot(result: Dict[str, Any], path: str = None, title: str = None):
+    """Scatter of the points coloured by label, summaries drawn as stars (needs matplotlib)."""
+    import matplotlib.pyplot as plt
+
+    points, labels = result['points'], np.asarray(result['labels'])
+    topics = np.asarray(result['roles']) == 'topic'
+    fig, ax = plt.subplots(figsize=(8, 8), dpi=100)
+    # few points get big markers; 100k points need small translucent ones
+    size = float(np.clip(20000 / max(len(points), 1), 1, 80))
+    for label in np.unique(labels):
+        mask = labels == label
+        color = ax.scatter(points[mask & ~topics, 0], points[mask & ~topics, 1], s=size, alpha=.6,
+                           label=label).get_facecolor()
+        ax.scatter(points[mask & topics, 0], points[mask & topics, 1], marker='*', s=280, c=color,
+                   edgecolors='black', linewidths=.6)
+    ax.grid(True)
+    ax.legend(loc='best', fontsize='small')
+    ax.set_title(title or 'Articles and topic summaries')
+    fig.tight_layout()
+    if path:
+        fig.savefig(path)
+        plt.close(fig)
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="2-D map of topic summaries and articles",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--run', nargs='+', default=[], help='run directories (see run_pipeline(run_dir=...))')
+    parser.add_argument('--store-topic', action='append', default=[], help='a topic from the article store')
+    parser.add_argument('--since', help='with --store-topic: articles published from YYYY-MM-DD')
+    parser.add_argument('--report', nargs='+', default=[], help='rendered HTML reports')
+    parser.add_argument('--method', choices=METHODS, default='tsne')
+    parser.add_argument('--components', type=int, default=EMBED_SVD_COMPONENTS, help='TruncatedSVD dimensions')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--output', default='embedding.csv', help='points as CSV')
+    parser.add_argument('--plot', help='also save a scatter plot here (needs matplotlib)')
+    args = parser.parse_args()
+
+    corpus = Corpus().add_runs(args.run)
+    for topic in args.store_topic:
+        corpus.add_store(topic, since=args.since)
+    for path in args.report:
+        corpus.add_report(path)
+    if not (args.run or args.store_topic or args.report):
+        parser.error('nothing to embed: pass --run, --store-topic or --report')
+
+    result = embed(corpus, method=args.method, n_components=args.components, cache=not args.no_cache)
+    write_csv(result, args.output)
+    print(f"Points written to {args.output}")
+    names, similarity = label_similarity(result['reduced'], result['labels'])
+    for name, row in zip(names, similarity):
+        print(f"  {name[:40]:<40} " + ' '.join(f'{value:5.2f}' for value in row))
+    if args.plot:
+        plot(result, args.plot)
+        print(f"Plot written to {args.plot}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Shared HTML extraction helpers for the crawlers.
+
+Pages are parsed with lxml and queried with XPath, several times faster and
+leaner than BeautifulSoup's pure-Python html.parser. The helpers reproduce
+the BeautifulSoup calls the crawlers used before, so extracted text is
+identical (see benchmarks/bench_extract.py).
+
+When a page's markup changes, `structured_article` still recovers body and
+publish date from the JSON-LD and meta tags most news sites embed. The
+crawlers apply it on top of their parsers (`extract_article`), so the
+parsers themselves keep the BeautifulSoup output.
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from lxml import etree, html as lxml_html
+
+import metrics
+
+# text inside these never shows up in BeautifulSoup's get_text()
+_SKIPPED_TAGS = {'script', 'style', 'template'}
+
+_parser = lxml_html.HTMLParser(encoding='utf-8', no_network=True)
+
+
+def parse_html(page: str):
+    """Parse a page into an lxml tree; empty or unparsable pages give an empty document."""
+    if not page or not page.strip():
+        return lxml_html.fromstring('<html></html>')
+    data = page.encode('utf-8', errors='replace') if isinstance(page, str) else page
+    metrics.inc('html_parsed_bytes_total', len(data))
+    try:
+        with metrics.timer('html_parse_seconds'):
+            return lxml_html.document_fromstring(data, parser=_parser)
+    except (etree.ParserError, ValueError):
+        return lxml_html.fromstring('<html></html>')
+
+
+def has_class(name: str) -> str:
+    """XPath predicate for a single class, like CSS `.name` / bs4 `class_='name'`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def text_of(element) -> str:
+    """Same result as bs4 `element.get_text(strip=True)`: every text node stripped and joined."""
+    parts = []
+
+    def walk(node):
+        if isinstance(node.tag, str) and node.tag not in _SKIPPED_TAGS and node.text:
+            parts.append(node.text.strip())
+        for child in node:
+            if isinstance(child.tag, str):
+                walk(child)
+            if child.tail:
+                parts.append(child.tail.strip())
+
+    walk(element)
+    return ''.join(parts)
+
+
+def select(root, xpath: str) -> List:
+    return root.xpath(xpath)
+
+
+def select_one(root, xpath: str) -> Optional[object]:
+    found = root.xpath(xpath)
+    return found[0] if found else None
+
+
+# schema.org types whose JSON-LD carries articleBody / datePublished
+ARTICLE_TYPES = {'Article', 'NewsArticle', 'ReportageNewsArticle', 'AnalysisNewsArticle', 'BlogPosting', 'LiveBlogPosting'}
+# meta tags holding the publish time, by preference
+PUBLISHED_META = ('article:published_time', 'og:article:published_time', 'datePublished', 'pubdate')
+
+
+def iso_date(value: str) -> str:
+    """'2025-11-06T21:14:00Z' -> '2025-11-06'; '' for anything unparsable."""
+    try:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).strftime("%Y-%m-%d")
+    except (AttributeError, ValueError):
+        return ''
+
+
+def _flatten_json_ld(data: Any) -> Iterable[Dict[str, Any]]:
+    if isinstance(data, list):
+        for item in data:
+            yield from _flatten_json_ld(item)
+    elif isinstance(data, dict):
+        yield data
+        yield from _flatten_json_ld(data.get('@graph', []))
+
+
+def json_ld_article(root) -> Dict[str, Any]:
+    """First schema.org Article-like JSON-LD object on the page, or {}."""
+    for script in select(root, "//script[@type='application/ld+json']"):
+        try:
+            data = json.loads(script.text or '')
+        except ValueError:
+            continue
+        for item in _flatten_json_ld(data):
+            types = item.get('@type', [])
+            types = {types} if isinstance(types, str) else set(types)
+            if types & ARTICLE_TYPES:
+                return item
+    return {}
+
+
+def meta_content(root, *names: str) -> str:
+    """content of the first <meta property|name=...> present among names."""
+    for name in names:
+        tag = select_one(root, f"//meta[@property='{name}' or @name='{name}' or @itemprop='{name}']")
+        if tag is not None and tag.get('content'):
+            return tag.get('content')
+    return ''
+
+
+def structured_article(root) -> Dict[str, str]:
+    """Body and publish date from JSON-LD, with the publish date falling back to meta tags."""
+    article = json_ld_article(root)
+    body = article.get('articleBody') or ''
+    published = article.get('datePublished') or meta_content(root, *PUBLISHED_META)
+    return {
+        'content': ' '.join(body.split()) if isinstance(body, str) else '',
+        'publish_date': iso_date(published) if isinstance(published, str) else '',
+    }
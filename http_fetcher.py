@@ -0,0 +1,229 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+import metrics
+from rate_scheduler import CircuitOpenError, get_rate_scheduler
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# fetch server-rendered article pages over plain HTTP before starting a browser
+HTTP_FAST_PATH = os.getenv("HTTP_FAST_PATH", "1") != "0"
+
+
+class FetchResult:
+    """Outcome of fetching one URL."""
+
+    def __init__(self, url: str, status: int = 0, text: str = '', headers: Dict[str, str] = None,
+                 error: str = '', elapsed: float = 0.0, attempts: int = 0):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+        self.error = error
+        self.elapsed = elapsed
+        self.attempts = attempts
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and 200 <= self.status < 300
+
+    def __repr__(self):
+        return f"FetchResult({self.url!r}, status={self.status}, error={self.error!r})"
+
+
+def _record(result: FetchResult, host: str):
+    if metrics.enabled():
+        metrics.inc('http_requests_total', host=host, status=result.status or 'error')
+        metrics.inc('http_response_bytes_total', len(result.text.encode('utf-8')), host=host)
+        metrics.observe('http_request_seconds', result.elapsed, host=host)
+
+
+class AsyncFetcher:
+    """
+    asyncio HTTP fetcher with a keep-alive connection pool.
+
+    Concurrency is bounded globally (`max_connections`) and per host
+    (`per_host`), so many sources can be fetched at once while each site
+    only ever sees a few requests in flight. Every attempt is also paced by
+    the shared rate scheduler, which slows a host down when it throttles.
+    Transient failures (timeouts, connection errors, 429/5xx) are retried
+    with exponential backoff.
+    Use as `async with AsyncFetcher() as fetcher: ...`.
+    """
+
+    def __init__(self, max_connections: int = 20, per_host: int = 4, timeout: float = 10,
+                 retries: int = 2, backoff: float = 0.5, headers: Dict[str, str] = None,
+                 http2: bool = None):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    async def fetch(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        """Fetch one URL, honouring the per-host cap and retry policy."""
+        host = urlsplit(url).netloc
+        start = time.perf_counter()
+        result = FetchResult(url)
+        scheduler = get_rate_scheduler()
+
+        for attempt in range(self.retries + 1):
+            result.attempts = attempt + 1
+            try:
+                await scheduler.acquire_async(url)
+            except CircuitOpenError as e:
+                result.error = str(e)
+                break
+            async with self._host_slots[host]:
+                try:
+                    resp = await self._client.get(url, headers=headers)
+                    result.status = resp.status_code
+                    result.headers = dict(resp.headers)
+                    result.text = resp.text
+                    result.error = '' if resp.status_code < 400 else f"HTTP {resp.status_code}"
+                    retry = resp.status_code in RETRY_STATUSES
+                    scheduler.record(url, resp.status_code, retry_after=resp.headers.get('Retry-After'))
+                except httpx.TransportError as e:  # timeouts, refused/reset connections
+                    result.error = f"{type(e).__name__}: {e}"
+                    retry = True
+                    scheduler.record(url, error=True)
+                except BaseException:  # anything else (cancellation, decoding) still ends the request
+                    scheduler.record(url, error=True)
+                    raise
+
+            if not retry or attempt == self.retries:
+                break
+            # exponential backoff with jitter, outside the host slot so others can proceed
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+        result.elapsed = time.perf_counter() - start
+        _record(result, host)
+        return result
+
+    async def fetch_all(self, urls: Iterable[str], parse: Callable[[str], Any] = None,
+                        headers: Dict[str, Dict[str, str]] = None) -> AsyncIterator[Tuple[FetchResult, Any]]:
+        """
+        Fetch all URLs concurrently and yield `(result, parsed)` as each completes.
+        `parsed` is `parse(result.text)` for successful responses, otherwise None.
+        `headers` optionally maps a URL to extra request headers for it.
+        """
+        headers = headers or {}
+        tasks = [asyncio.ensure_future(self.fetch(url, headers.get(url))) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                parsed = None
+                if result.ok and parse is not None:
+                    try:
+                        parsed = parse(result.text)
+                    except Exception as e:
+                        result.error = f"parse failed: {e}"
+                yield result, parsed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def fetch_articles(urls: List[str], parse: Callable[[str], Any],
+                   on_result: Callable[[FetchResult, Any], None] = None,
+                   headers: Dict[str, Dict[str, str]] = None, **fetcher_kwargs) -> Dict[str, Any]:
+    """
+    Blocking convenience wrapper around `AsyncFetcher.fetch_all`.
+
+    Returns {url: parsed} for every URL that was fetched and parsed
+    successfully; `on_result` is called for each URL as soon as it completes.
+    """
+
+    async def _run():
+        parsed_by_url = {}
+        async with AsyncFetcher(**fetcher_kwargs) as fetcher:
+            async for result, parsed in fetcher.fetch_all(urls, parse, headers):
+                if on_result is not None:
+                    on_result(result, parsed)
+                if parsed is not None:
+                    parsed_by_url[result.url] = parsed
+        return parsed_by_url
+
+    return asyncio.run(_run())
+
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """Process-wide blocking client; its keep-alive pool is shared by all crawler threads."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(headers=DEFAULT_HEADERS, timeout=10, follow_redirects=True,
+                                   http2=HTTP2_AVAILABLE,
+                                   limits=httpx.Limits(max_connections=20, max_keepalive_connections=20))
+        return _client
+
+
+def fetch_page(url: str, headers: Dict[str, str] = None) -> FetchResult:
+    """
+    One blocking GET through the shared client, without retries: callers
+    have a slower fallback (the browser) for pages this does not serve.
+    """
+    start = time.perf_counter()
+    result = FetchResult(url, attempts=1)
+    scheduler = get_rate_scheduler()
+    try:
+        scheduler.acquire(url)
+        resp = get_client().get(url, headers=headers)
+        result.status = resp.status_code
+        result.headers = dict(resp.headers)
+        result.text = resp.text
+        result.error = '' if resp.status_code < 400 else f"HTTP {resp.status_code}"
+        scheduler.record(url, resp.status_code, retry_after=resp.headers.get('Retry-After'))
+    except CircuitOpenError as e:
+        result.error = str(e)
+    except httpx.HTTPError as e:
+        result.error = f"{type(e).__name__}: {e}"
+        scheduler.record(url, error=True)
+    except BaseException:
+        scheduler.record(url, error=True)
+        raise
+    result.elapsed = time.perf_counter() - start
+    _record(result, urlsplit(url).netloc)
+    return result
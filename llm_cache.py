@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import metrics
+from cache_store import CACHE_DIR, SQLiteCache
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+# article fields that reach the prompt; urls and merged-url lists do not change the answer
+_ARTICLE_FIELDS = ('title', 'source', 'publish_date', 'content', 'cluster', 'cluster_size')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def model_name(llm) -> str:
+    return getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__
+
+
+def template_hash(template: str) -> str:
+    return _sha256(template)[:16]
+
+
+def articles_hash(news_list: List[Dict[str, Any]]) -> str:
+    """Hash of the article set, insensitive to order, whitespace and fields the prompt does not use."""
+    normalized = sorted(
+        json.dumps([_SPACE_RE.sub(' ', str(article.get(field, ''))).strip() for field in _ARTICLE_FIELDS],
+                   ensure_ascii=False)
+        for article in news_list
+    )
+    return _sha256('\n'.join(normalized))
+
+
+class LLMCache:
+    """
+    Persistent cache of parsed LLM results.
+
+    Keys combine the model name, a hash of the prompt template and the
+    normalized prompt inputs (article sets are reduced to `articles_hash`),
+    so a topic refresh that yields the same articles is answered without
+    calling the model. Entries expire after `ttl` seconds and the store is
+    LRU-bounded to `max_bytes`.
+    """
+
+    def __init__(self, path: str = None, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.store = SQLiteCache(path or os.path.join(CACHE_DIR, 'llm.sqlite'), ttl=ttl, max_bytes=max_bytes)
+        self.stats = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def key(self, llm, template: str, **inputs) -> str:
+        inputs = {name: articles_hash(value) if isinstance(value, list) else value
+                  for name, value in inputs.items()}
+        return _sha256(json.dumps([model_name(llm), template_hash(template), inputs],
+                                  sort_keys=True, ensure_ascii=False))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.store.get(key)
+        with self._lock:
+            self.stats['hits' if value is not None else 'misses'] += 1
+        metrics.inc('llm_cache_total', result='hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key: str, result: Dict[str, Any]):
+        self.store.set(key, result)
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Process-wide LLM result cache, or None when disabled with LLM_CACHE=0."""
+    global _default_cache
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
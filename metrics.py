@@ -0,0 +1,206 @@
+"""
+Counters, timers and optional tracing spans for the pipeline.
+
+Disabled by default: every call returns immediately (timers and spans hand
+back one shared no-op context manager), so instrumented code costs a
+function call and a flag check. Enable with METRICS=1 (and METRICS_TRACE=1
+for spans) or `metrics.enable()`.
+
+    with metrics.timer('stage_seconds', stage='fetch'):
+        ...
+    metrics.inc('pages_fetched_total', source='CNN')
+    metrics.write('metrics.prom')   # Prometheus text; any other extension writes JSON
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+PREFIX = 'news_'
+
+_enabled = os.getenv("METRICS", "0") == "1"
+_tracing = _enabled and os.getenv("METRICS_TRACE", "0") == "1"
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_timers: Dict[Tuple[str, tuple], List[float]] = {}  # [count, sum, max]
+_gauges: Dict[Tuple[str, tuple], float] = {}
+_spans: List[Dict[str, Any]] = []
+_span_stack = threading.local()
+_epoch = time.perf_counter()
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullContext()
+
+
+def enable(tracing: bool = False):
+    global _enabled, _tracing
+    _enabled, _tracing = True, tracing
+
+
+def disable():
+    global _enabled, _tracing
+    _enabled = _tracing = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _gauges.clear()
+        _spans.clear()
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, seconds: float, **labels):
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        stats = _timers.setdefault(key, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+
+@contextmanager
+def _timer(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timer(name: str, **labels):
+    """Context manager observing its duration under `name`."""
+    if not _enabled:
+        return _NULL
+    return _timer(name, labels)
+
+
+@contextmanager
+def _span(name, attributes):
+    stack = getattr(_span_stack, 'names', None)
+    if stack is None:
+        stack = _span_stack.names = []
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack.pop()
+        with _lock:
+            _spans.append({'name': name, 'parent': parent, 'thread': threading.current_thread().name,
+                           'start': start - _epoch, 'seconds': time.perf_counter() - start,
+                           'attributes': attributes})
+
+
+def span(name: str, **attributes):
+    """Tracing span (recorded only with tracing on); nests per thread."""
+    if not _tracing:
+        return _NULL
+    return _span(name, attributes)
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+def snapshot() -> Dict[str, Any]:
+    """Everything recorded so far as a JSON-serialisable dict."""
+    if _enabled:
+        set_gauge('peak_rss_bytes', peak_rss_bytes())
+
+    def rows(table, fmt):
+        return [{'name': PREFIX + name, 'labels': dict(labels), **fmt(value)}
+                for (name, labels), value in sorted(table.items())]
+
+    with _lock:
+        return {
+            'counters': rows(_counters, lambda v: {'value': v}),
+            'gauges': rows(_gauges, lambda v: {'value': v}),
+            'timers': rows(_timers, lambda v: {'count': v[0], 'sum': round(v[1], 6), 'max': round(v[2], 6)}),
+            'spans': list(_spans),
+        }
+
+
+def to_json(indent: int = 2) -> str:
+    return json.dumps(snapshot(), indent=indent)
+
+
+def _labels_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escape = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def to_prometheus() -> str:
+    """Prometheus text exposition format (timers as summaries plus a _max gauge)."""
+    data = snapshot()
+    lines, typed = [], set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+
+    for row in data['counters']:
+        declare(row['name'], 'counter')
+        lines.append(f"{row['name']}{_labels_text(row['labels'])} {row['value']}")
+    for row in data['gauges']:
+        declare(row['name'], 'gauge')
+        lines.append(f"{row['name']}{_labels_text(row['labels'])} {row['value']}")
+    for row in data['timers']:
+        declare(row['name'], 'summary')
+        lines.append(f"{row['name']}_count{_labels_text(row['labels'])} {row['count']}")
+        lines.append(f"{row['name']}_sum{_labels_text(row['labels'])} {row['sum']}")
+    for row in data['timers']:
+        declare(row['name'] + '_max', 'gauge')
+        lines.append(f"{row['name']}_max{_labels_text(row['labels'])} {row['max']}")
+    return '\n'.join(lines) + '\n'
+
+
+def write(path: str):
+    """Write the metrics to path: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = to_prometheus() if path.endswith(('.prom', '.txt')) else to_json()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
@@ -1,132 +1,321 @@
 import os
-import json
-import re
-from datetime import datetime
-from typing import List, Dict, Any
-from jinja2 import Template
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import argparse
+import hashlib
+import importlib
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Tuple
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 # from langchain.prompts import PromptTemplate
-# from langchain.schema import BaseOutputParser
 
-# 上面识别不到的可以用下面这种
-from langchain_core.prompts import PromptTemplate  # PromptTemplate
-from langchain_core.output_parsers.base import BaseOutputParser  # BaseOutputParser
 from prompts import summary_prompt
-
-
-from crawl_cnn import get_cnn_news_with_content
-from crawl_apnews import get_ap_news_with_content
-from crawl_bbc import get_bbc_news_with_content
-
-class SummaryParser(BaseOutputParser):
-
-    def parse(self, text: str) -> Dict[str, Any]:
-        try:
-            data = json.loads(text)
-
-            # validate required fields
-            required_fields = ['topic', 'entities', 'summary', 'timeline']
-            for field in required_fields:
-                if field not in data:
-                    print(f"{field} is not in result")
-                    data[field] = 'na'
-
-            return data
-        except json.JSONDecodeError:
-            return {
-                'topic': 'na',
-                'entities': 'na',
-                'summary': 'na',
-                'timeline': 'na',
-            }
+import metrics
+from llm_cache import LLMCache, get_llm_cache, model_name, template_hash
+from prompt_payload import build_payload
+from checkpoints import STAGES, RunCheckpoints, inputs_hash
+from article_store import ArticleStore, get_article_store
+from tokens import MAX_LLM_CONCURRENCY, SUMMARY_TOKEN_BUDGET
+from watermarks import WatermarkStore
+
+# selenium (crawlers), scikit-learn/scipy (dedup, clustering), langchain
+# (summarize) and jinja2 (render) take seconds to import, so each stage
+# imports them itself and a run that skips a stage never loads them.
+if TYPE_CHECKING:
+    from dedup_index import DedupIndex
+
+# source name -> (module, crawler), in the order their articles are merged
+NEWS_SOURCES = {
+    'CNN': ('crawl_cnn', 'get_cnn_news_with_content'),
+    'AP News': ('crawl_apnews', 'get_ap_news_with_content'),
+    'BBC News': ('crawl_bbc', 'get_bbc_news_with_content'),
+}
+
+# a checkpointed run re-crawls once its fetch checkpoint is older than this;
+# 0 reuses the checkpoint until the run is resumed from 'fetch'
+FETCH_CHECKPOINT_TTL = float(os.getenv("FETCH_CHECKPOINT_TTL", 3600))
+
+
+def get_crawler(name: str) -> Callable:
+    module, function = NEWS_SOURCES[name]
+    return getattr(importlib.import_module(module), function)
+
+
+def create_llm():
+    """The DashScope qwen-plus client; long-running callers create it once and share it."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        api_key=os.getenv("DASHSCOPE_API_KEY"),
+        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+        model="qwen-plus",
+    )
 
 
 class NewsSummaryPipeline:
-    def __init__(self, topic: str = None):
+    def __init__(self, topic: str = None, concurrent_fetch: bool = True, fetch_deadline: float = None,
+                 dedup_index: 'DedupIndex' = None, llm=None, summary_token_budget: int = SUMMARY_TOKEN_BUDGET,
+                 max_llm_concurrency: int = MAX_LLM_CONCURRENCY, trim_to_budget: bool = False,
+                 llm_cache: LLMCache = None, stream_llm: bool = True, gzip_output: bool = False,
+                 watermarks: WatermarkStore = None, article_store: ArticleStore = None,
+                 cluster_top_k: int = None, max_clusters: int = None):
         """
         Initialize the news-summary pipeline.
         In production you would plug in AskNews API; here we demo with crawled data.
+
+        concurrent_fetch: crawl all sources in parallel instead of one after another.
+        fetch_deadline: seconds to wait for the sources; slower sources are dropped.
+        dedup_index: stories seen by earlier runs; known URLs are not fetched and
+            known stories are not summarized again. A report then covers only
+            the stories that are new since the last report, and stories are
+            recorded in the index only once their report is written.
+        llm: chat model to use instead of the DashScope qwen-plus client, which
+            is otherwise created when first needed.
+        summary_token_budget: article tokens per LLM call; larger sets are
+            summarized map-reduce style in chunks of this size.
+        max_llm_concurrency: chunk summaries in flight at once.
+        trim_to_budget: cut articles down to their most informative sentences
+            so the set fits one call, instead of summarizing in chunks.
+        llm_cache: summary result cache; defaults to the shared one in
+            .cache/llm.sqlite (disable with LLM_CACHE=0).
+        stream_llm: stream the single-call summary, parse fields as they arrive
+            and re-request only the fields that come back missing or malformed.
+        gzip_output: also write a pre-compressed <output_file>.gz for serving.
+        watermarks: per-(source, topic) high-water marks; sources then only fetch
+            results earlier runs did not process and merge them into the stored set.
+        article_store: keep every crawl in this store (see article_store.py);
+            deduplication then streams article texts from it.
+        cluster_top_k: group the stories into sub-events and summarize only the
+            this many most central articles of each (see clustering.py); 0 sends
+            every story to the LLM; defaults to CLUSTER_TOP_K.
+        max_clusters: sub-events, largest first, that contribute up to
+            cluster_top_k articles; defaults to MAX_CLUSTERS. Smaller ones
+            add their most central article while summary_token_budget lasts.
         """
-        self.llm = ChatOpenAI(
-            api_key=os.getenv("DASHSCOPE_API_KEY"),
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            model="qwen-plus",
-        )
+        self._llm = llm
+        self.summary_token_budget = summary_token_budget
+        self.max_llm_concurrency = max_llm_concurrency
+        self.trim_to_budget = trim_to_budget
+        # token counts of the last summary payload, see prompt_payload.build_payload
+        self.payload_stats: Dict[str, int] = {}
+        self.llm_cache = llm_cache if llm_cache is not None else get_llm_cache()
+        self.stream_llm = stream_llm
+        # seconds from request to each completed field of the last streamed summary
+        self.summary_field_times: Dict[str, float] = {}
         self.topic = topic
+        self.concurrent_fetch = concurrent_fetch
+        self.fetch_deadline = fetch_deadline
+        # per-source timing of the last fetch: {source: {'status', 'seconds', 'count', 'new', 'paths', 'error'}}
+        self.fetch_stats: Dict[str, Dict[str, Any]] = {}
+        self.dedup_index = dedup_index
+        self.gzip_output = gzip_output
+        self.watermarks = watermarks
+        self.article_store = article_store
+        self.cluster_top_k = cluster_top_k
+        self.max_clusters = max_clusters
+        # TF-IDF rows of the last deduplicated stories, keyed by their urls, reused for clustering
+        self._dedup_matrix = None
+        self._dedup_urls: List[str] = []
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = create_llm()
+        return self._llm
+
+    def _stored_articles(self, name: str, topic: str) -> List[Dict]:
+        """A source's articles from earlier runs (with watermarks), used when its crawl fails or times out."""
+        if self.watermarks is None:
+            return []
+        try:
+            return list(self.watermarks.get(name, topic).articles)
+        except Exception as e:
+            print(f"Could not load the stored {name} articles: {e}")
+            return []
+
+    def _fetch_source(self, name: str, crawler, topic: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        watermark = None
+        try:
+            kwargs = {}
+            if self.dedup_index is not None:
+                kwargs['skip_url'] = self.dedup_index.contains_url
+            watermark = self.watermarks.get(name, topic) if self.watermarks is not None else None
+            if watermark is not None:
+                kwargs['watermark'] = watermark
+            with metrics.span('fetch_source', source=name):
+                news = crawler(topic, **kwargs)
+            metrics.inc('articles_fetched_total', len(news), source=name)
+            for path, count in Counter(item.get('fetched_via', '') for item in news).items():
+                metrics.inc('article_fetch_path_total', count, source=name, path=path or 'unknown')
+            fetched = len(news)
+            if self.article_store is not None:
+                self.article_store.add(news, topic)
+            if watermark is not None:
+                news = self.watermarks.merge(watermark, news)
+                print(f"{name}: {fetched} new articles, {len(news)} in the stored set")
+            return {'status': 'ok', 'news': news, 'new': fetched, 'seconds': time.perf_counter() - start, 'error': ''}
+        except Exception as e:
+            print(f"Error fetching {name}: {e}")
+            metrics.inc('source_failures_total', source=name)
+            # the articles of earlier runs are still valid
+            stored = list(watermark.articles) if watermark is not None else self._stored_articles(name, topic)
+            return {'status': 'failed', 'news': stored, 'new': 0, 'seconds': time.perf_counter() - start,
+                    'error': str(e)}
+        finally:
+            metrics.observe('source_fetch_seconds', time.perf_counter() - start, source=name)
 
     def fetch_news_data(self, topic: str) -> List[Dict]:
         """
         Fetch news data from multiple sources.
+
+        Sources run in parallel unless `concurrent_fetch` is off. A failed
+        source, or one still running at `fetch_deadline`, contributes no
+        articles instead of failing the whole fetch.
         """
         # each method defaults to max_articles=100 internally
-        cnn_news = get_cnn_news_with_content(topic)
-        print(f'Successfully obtained {len(cnn_news)} items from CNN')
-
-        ap_news = get_ap_news_with_content(topic)
-        print(f'Successfully obtained {len(ap_news)} items from AP News')
-
-        bbc_news = get_bbc_news_with_content(topic)
-        print(f'Successfully obtained {len(bbc_news)} items from BBC News')
+        results = {}
+        if self.concurrent_fetch:
+            start = time.perf_counter()
+            executor = ThreadPoolExecutor(max_workers=len(NEWS_SOURCES), thread_name_prefix='fetch')
+            futures = {executor.submit(self._fetch_source, name, get_crawler(name), topic): name
+                       for name in NEWS_SOURCES}
+            wait(futures, timeout=self.fetch_deadline)
+            for future, name in futures.items():
+                if future.done():
+                    results[name] = future.result()
+                else:
+                    print(f"{name} missed the {self.fetch_deadline}s deadline, continuing with its stored articles")
+                    results[name] = {'status': 'timeout', 'news': self._stored_articles(name, topic), 'new': 0,
+                                     'error': 'deadline exceeded', 'seconds': time.perf_counter() - start}
+            # don't block on stragglers; their results are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for name in NEWS_SOURCES:
+                results[name] = self._fetch_source(name, get_crawler(name), topic)
+
+        all_news = []
+        self.fetch_stats = {}
+        for name in NEWS_SOURCES:
+            result = results[name]
+            print(f'Successfully obtained {len(result["news"])} items from {name} in {result["seconds"]:.1f}s')
+            self.fetch_stats[name] = {
+                'status': result['status'],
+                'seconds': round(result['seconds'], 3),
+                'count': len(result['news']),
+                'new': result['new'],  # fewer than count when merged with watermarked articles
+                # what served each article: http, browser, cache or revalidated
+                'paths': dict(Counter(news.get('fetched_via', '') for news in result['news'])),
+                'error': result['error'],
+            }
+            all_news += result['news']
 
-        all_news = cnn_news + ap_news + bbc_news
         return all_news
 
     def deduplicate_news(self, news_list: List[Dict]) -> List[Dict]:
         """
         Deduplicate & merge similar news using TF-IDF + cosine similarity.
+        Similar pairs are found with a sparse search (see dedup.py) rather than
+        a dense n x n similarity matrix.
         """
-        if not news_list:
-            return []
-
-        # merge title + body as text representation
-        texts = [news['title'] + ' ' + news.get('content', '') for news in news_list]
-
-        # compute TF-IDF vectors
-        vectorizer = TfidfVectorizer(stop_words='english')
-        tfidf_matrix = vectorizer.fit_transform(texts)
-
-        # cosine similarity matrix
-        similarity_matrix = cosine_similarity(tfidf_matrix)
-
-        # deduplication logic
-        unique_news = []
-        seen_indices = set()
-        threshold = 0.85  # high threshold for strict dedup
+        from dedup import DEDUP_THRESHOLD, deduplicate
+        unique_news, self._dedup_matrix = deduplicate(news_list, threshold=DEDUP_THRESHOLD, with_matrix=True)
+        self._dedup_urls = [news['url'] for news in unique_news]
+        return unique_news
 
-        for i, news in enumerate(news_list):
-            if i in seen_indices:
+    def filter_known_stories(self, news_list: List[Dict]) -> List[Dict]:
+        """
+        Drop stories already in the dedup index, so continuous runs only
+        summarize what has changed. The new ones are recorded by
+        remember_stories once their report is written.
+        """
+        if self.dedup_index is None:
+            return news_list
+
+        from dedup import news_texts
+        self.dedup_index.expire()
+        new_stories = []
+        for news, text in zip(news_list, news_texts(news_list)):
+            match = self.dedup_index.find_duplicate(text)
+            if match is not None:
+                print(f"Already covered: {news['title']} (matches {match[0]}, similarity {match[1]:.2f})")
                 continue
+            new_stories.append(news)
 
-            # Mark the current news as saved
-            seen_indices.add(i)
-
-            # init url list. By default it contains the url of the current news.
-            news['urls'] = [news['url']]
-
-            # find similar items
-            for j in range(i + 1, len(news_list)):
-                if j not in seen_indices and similarity_matrix[i, j] >= threshold:
-                    # Add the urls of news that are similar to the current news to the url list.
-                    # The content of the similar news are discarded.
-                    news['urls'].append(news_list[j]['url'])
+        print(f"{len(new_stories)} of {len(news_list)} stories are new")
+        return new_stories
 
-                    # merge source if not duplicate
-                    if news_list[j]['source'] not in news['source']:
-                        news['source'] += ', ' + news_list[j]['source']
-
-                    seen_indices.add(j)
+    def remember_stories(self, news_list: List[Dict]):
+        """
+        Add reported stories to the dedup index. Runs after the report is
+        written: if summarizing or rendering fails, the stories stay new and
+        the next run (or the service's retry) covers them.
+        """
+        if self.dedup_index is None or not news_list:
+            return
 
-            unique_news.append(news)
-
-        return unique_news
+        from dedup import news_texts
+        for news, text in zip(news_list, news_texts(news_list)):
+            self.dedup_index.add(news['url'], text, urls=news.get('urls', [news['url']]),
+                                 title=news['title'], topic=self.topic)
+        self.dedup_index.save()
 
     def extract_entities_and_summary(self, news_list: List[Dict]) -> Dict[str, Any]:
         """
         Extract entities and generate summary.
+        Results are cached by model, prompt and article set, so an unchanged
+        article set is not sent to the LLM again.
+        """
+        if self.llm_cache is None:
+            return self._summarize(news_list)
+
+        key = self.llm_cache.key(self.llm, summary_prompt, key_event=self.topic, news_list=news_list,
+                                 token_budget=self.summary_token_budget, trim_to_budget=self.trim_to_budget)
+        result = self.llm_cache.get(key)
+        if result is not None:
+            print("Summary served from the LLM cache")
+            return result
+        result = self._summarize(news_list)
+        from summarize import is_empty_result
+        if result is not None and not is_empty_result(result):
+            self.llm_cache.set(key, result)
+        return result
+
+    def _summarize(self, news_list: List[Dict]) -> Dict[str, Any]:
         """
+        Article sets over the token budget are summarized in chunks and merged.
+        """
+        from summarize import SummaryParser, llm_config, map_reduce_summary, stream_summary
+        budget = self.summary_token_budget
+        payload, self.payload_stats = build_payload(news_list, budget if self.trim_to_budget else None)
+        print(f"Summary payload: {self.payload_stats['payload_tokens']} tokens "
+              f"({self.payload_stats['saved_tokens']} saved)")
+        if not self.trim_to_budget and self.payload_stats['payload_tokens'] > budget:
+            try:
+                return map_reduce_summary(self.llm, self.topic, news_list,
+                                          token_budget=budget,
+                                          max_concurrency=self.max_llm_concurrency,
+                                          render=lambda chunk: build_payload(chunk, budget, with_stats=False)[0],
+                                          cache=self.llm_cache)
+            except Exception as e:
+                print(f"Error: {str(e)}\n\n")
+                return None
+
+        if self.stream_llm:
+            start = time.perf_counter()
+
+            def field_ready(field, value):
+                self.summary_field_times[field] = round(time.perf_counter() - start, 2)
+                print(f"{field} ready after {self.summary_field_times[field]}s")
+
+            self.summary_field_times = {}
+            try:
+                return stream_summary(self.llm, summary_prompt, {"key_event": self.topic, "news_list": payload},
+                                      on_field=field_ready)
+            except Exception as e:
+                print(f"Error: {str(e)}\n\n")
+                return None
+
+        from langchain_core.prompts import PromptTemplate
         prompt = PromptTemplate(
             input_variables=["key_event", "news_list"],
             template=summary_prompt
@@ -135,7 +324,7 @@ class NewsSummaryPipeline:
         llm_chain = prompt | self.llm | SummaryParser()
 
         try:
-            result = llm_chain.invoke({"key_event": self.topic, "news_list": news_list})
+            result = llm_chain.invoke({"key_event": self.topic, "news_list": payload}, config=llm_config())
 
             return result
 
@@ -145,50 +334,164 @@ class NewsSummaryPipeline:
     def generate_html(self, processed_data: Dict, news_list: List[Dict]) -> str:
         """
         Generate HTML page.
+        write_report streams the page to disk instead (see report_render.py).
         """
-        with open('template.html', 'r', encoding='utf-8') as f:
-            template_str = f.read()
+        from report_render import render_html
+        return render_html(processed_data, news_list)
 
-        template = Template(template_str)
+    def fetch_stage(self) -> List[Dict]:
+        print("Fetching news data...")
+        with metrics.timer('stage_seconds', stage='fetch'), metrics.span('fetch', topic=self.topic):
+            return self.fetch_news_data(self.topic)
 
-        html_content = template.render(
-            topic=processed_data['topic'],
-            summary=processed_data['summary'],
-            entities=processed_data['entities'],
-            timeline=processed_data['timeline'],
-            news_articles=news_list,
-            generated_date=datetime.now().strftime("%B %d, %Y %H:%M")
-        )
+    def dedup_stage(self, news_data: List[Dict]) -> List[Dict]:
+        print("Deduplicating...")
+        with metrics.timer('stage_seconds', stage='dedup'), metrics.span('dedup', articles=len(news_data)):
+            if self.article_store is not None:
+                from dedup import DEDUP_THRESHOLD, deduplicate_stored
+                # already stored by the fetch; this only resolves ids (and stores checkpointed crawls)
+                ids = self.article_store.add(news_data, self.topic)
+                unique_news, self._dedup_matrix = deduplicate_stored(self.article_store, ids,
+                                                                     threshold=DEDUP_THRESHOLD, with_matrix=True)
+                self._dedup_urls = [news['url'] for news in unique_news]
+            else:
+                unique_news = self.deduplicate_news(news_data)
+            if self.dedup_index is not None:
+                unique_news = self.filter_known_stories(unique_news)
+                if self._dedup_matrix is not None:
+                    kept = {news['url'] for news in unique_news}
+                    self._dedup_matrix = self._dedup_matrix[[i for i, url in enumerate(self._dedup_urls) if url in kept]]
+                    self._dedup_urls = [url for url in self._dedup_urls if url in kept]
+        metrics.set_gauge('unique_articles', len(unique_news), topic=self.topic)
+        return unique_news
 
-        return html_content
+    def _cluster_settings(self) -> Tuple[int, int, float]:
+        """(top_k, max_clusters, similarity threshold) the clustering step runs with."""
+        from clustering import CLUSTER_THRESHOLD, CLUSTER_TOP_K, MAX_CLUSTERS
+        return (CLUSTER_TOP_K if self.cluster_top_k is None else self.cluster_top_k,
+                MAX_CLUSTERS if self.max_clusters is None else self.max_clusters, CLUSTER_THRESHOLD)
 
-    def run_pipeline(self, output_file: str = "news_summary.html") -> str:
+    def summarize_stage(self, unique_news: List[Dict]) -> Dict[str, Any]:
         """
-        Run the complete data pipeline.
+        Summarize the stories, or with clustering only each sub-event's most
+        central articles; the sub-events are returned under 'clusters'.
         """
-        print(f"Starting topic: {self.topic}")
+        print("Generating summary & entities...")
+        with metrics.timer('stage_seconds', stage='summarize'), metrics.span('summarize', articles=len(unique_news)):
+            top_k, max_clusters, _ = self._cluster_settings()
+            if not top_k:
+                return self.extract_entities_and_summary(unique_news)
+            from clustering import cluster_news
+            # reuse the dedup TF-IDF rows when they belong to exactly these stories
+            matrix = self._dedup_matrix if self._dedup_urls == [news['url'] for news in unique_news] else None
+            representatives, clusters = cluster_news(unique_news, matrix, top_k=top_k, max_clusters=max_clusters,
+                                                     token_budget=self.summary_token_budget)
+            result = self.extract_entities_and_summary(representatives)
+            return {**result, 'clusters': clusters} if result is not None else None
+
+    def render_stage(self, processed_data: Dict[str, Any], unique_news: List[Dict], output_file: str) -> str:
+        # the HTML page is streamed straight into the output file
+        from report_render import render_to_file
+        print("Generating HTML page...")
+        with metrics.timer('stage_seconds', stage='render'), metrics.span('render', output=output_file):
+            render_to_file(processed_data, unique_news, output_file, compress=self.gzip_output)
+        print(f"Pipeline finished! Output file: {output_file}")
+        return output_file
 
-        # 1. fetch news data
-        print("Fetching news data...")
-        news_data = self.fetch_news_data(self.topic)
+    def collect_news(self) -> List[Dict]:
+        """
+        Crawl and deduplicate the topic's articles (pipeline steps 1-2).
+        With a dedup index only stories not seen by earlier runs are returned.
+        """
+        return self.dedup_stage(self.fetch_stage())
 
-        # 2. deduplication
-        print("Deduplicating...")
-        unique_news = self.deduplicate_news(news_data)
+    def write_report(self, unique_news: List[Dict], output_file: str) -> str:
+        """
+        Summarize the articles and write the HTML page (pipeline steps 3-5).
+        """
+        processed_data = self.summarize_stage(unique_news)
+        output_file = self.render_stage(processed_data, unique_news, output_file)
+        if processed_data is not None:
+            self.remember_stories(unique_news)
+        return output_file
 
-        # 3. extract entities & summary
-        print("Generating summary & entities...")
-        processed_data = self.extract_entities_and_summary(unique_news)
+    def run_pipeline(self, output_file: str = "news_summary.html", run_dir: str = None,
+                     from_stage: str = None, until_stage: str = None) -> str:
+        """
+        Run the complete data pipeline.
 
-        # 4. generate HTML
-        print("Generating HTML page...")
-        html_content = self.generate_html(processed_data, unique_news)
+        run_dir: checkpoint every stage's output there (see checkpoints.py);
+            stages whose inputs are unchanged since the last run in that
+            directory are loaded instead of re-run. The crawl is the exception
+            once older than FETCH_CHECKPOINT_TTL seconds (default an hour): it
+            runs again, and the later stages with it if it found anything new.
+        from_stage: with run_dir, re-run from this stage on ('fetch', 'dedup',
+            'summarize' or 'render') using the earlier stages' checkpoints.
+        until_stage: with run_dir, stop after this stage; with from_stage the
+            same, it runs a single stage.
+        """
+        print(f"Starting topic: {self.topic}")
 
-        # 5. save file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with metrics.span('run_pipeline', topic=self.topic):
+            if run_dir is not None:
+                return self._run_checkpointed(output_file, RunCheckpoints(run_dir, from_stage), until_stage)
+
+            unique_news = self.collect_news()
+            if not unique_news and self.dedup_index is not None:
+                print(f"No new stories since the last run, keeping {output_file}")
+                return output_file
+
+            return self.write_report(unique_news, output_file)
+
+    def _dedup_inputs(self, checkpoints: RunCheckpoints) -> str:
+        from dedup import DEDUP_THRESHOLD
+        return inputs_hash(checkpoints.output_hash('fetch'), DEDUP_THRESHOLD, self.dedup_index is not None)
+
+    def _summarize_inputs(self, checkpoints: RunCheckpoints) -> str:
+        return inputs_hash(checkpoints.output_hash('dedup'), model_name(self.llm), template_hash(summary_prompt),
+                           self.summary_token_budget, self.trim_to_budget, *self._cluster_settings())
+
+    def _render_inputs(self, checkpoints: RunCheckpoints, output_file: str) -> str:
+        from report_render import TEMPLATE_DIR, TEMPLATE_NAME
+        with open(os.path.join(TEMPLATE_DIR, TEMPLATE_NAME), 'rb') as f:
+            template_digest = hashlib.sha256(f.read()).hexdigest()
+        return inputs_hash(checkpoints.output_hash('summarize'), checkpoints.output_hash('dedup'),
+                           template_digest, os.path.abspath(output_file), self.gzip_output)
+
+    def _run_checkpointed(self, output_file: str, checkpoints: RunCheckpoints, until_stage: str = None) -> str:
+        # inputs are hashed lazily: a stage loaded from its checkpoint never imports its dependencies
+        last = STAGES.index(until_stage) if until_stage is not None else len(STAGES) - 1
+        news_data = checkpoints.run('fetch', inputs_hash(self.topic, list(NEWS_SOURCES)), self.fetch_stage,
+                                    max_age=FETCH_CHECKPOINT_TTL or None, topic=self.topic)
+        if last < STAGES.index('dedup'):
+            return output_file
+
+        unique_news = checkpoints.run('dedup', lambda: self._dedup_inputs(checkpoints),
+                                      lambda: self.dedup_stage(news_data))
+        if last < STAGES.index('summarize'):
+            return output_file
+        if not unique_news and self.dedup_index is not None:
+            print(f"No new stories since the last run, keeping {output_file}")
+            return output_file
+
+        def summarize():
+            result = self.summarize_stage(unique_news)
+            if result is None:
+                # nothing is checkpointed, so the run can resume here
+                raise RuntimeError(f"summarizing failed, resume with from_stage='summarize' in {checkpoints.run_dir}")
+            return result
 
-        print(f"Pipeline finished! Output file: {output_file}")
+        processed_data = checkpoints.run('summarize', lambda: self._summarize_inputs(checkpoints), summarize)
+        if last < STAGES.index('render'):
+            return output_file
+
+        def render():
+            rendered = self.render_stage(processed_data, unique_news, output_file)
+            self.remember_stories(unique_news)
+            return {'output_file': rendered}
+
+        checkpoints.run('render', lambda: self._render_inputs(checkpoints, output_file), render,
+                        valid=lambda rendered: os.path.exists(rendered['output_file']))
         return output_file
 
 
@@ -201,5 +504,17 @@ if __name__ == "__main__":
     else:
         print("API Key not found, please check environment variables")
 
-    pipeline = NewsSummaryPipeline(topic="Tesla")
-    pipeline.run_pipeline("lwx_test1.html")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Crawl, summarize and render one topic")
+    parser.add_argument('--topic', default="Tesla")
+    parser.add_argument('--output', default="lwx_test1.html")
+    parser.add_argument('--run-dir', help='checkpoint each stage here so the run can be resumed')
+    parser.add_argument('--from-stage', choices=STAGES, help='with --run-dir: re-run from this stage on')
+    parser.add_argument('--store', action='store_true', help='keep the crawled articles in the article store')
+    args = parser.parse_args()
+    if args.from_stage and not args.run_dir:
+        parser.error('--from-stage needs --run-dir')
+
+    pipeline = NewsSummaryPipeline(topic=args.topic, article_store=get_article_store() if args.store else None)
+    pipeline.run_pipeline(args.output, run_dir=args.run_dir, from_stage=args.from_stage)
+    if metrics.enabled():
+        metrics.write(os.getenv("METRICS_FILE", "metrics.json"))
\ No newline at end of file
@@ -0,0 +1,125 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from tokens import count_tokens
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])["”\')\]]*\s+(?=[A-Z0-9"“(])')
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]+|\d[\d,.%$]*")
+
+# sentences at the top of a news article carry the most information
+LEAD_SENTENCES = 3
+
+
+@lru_cache(maxsize=1)
+def _stop_words() -> FrozenSet[str]:
+    # importing scikit-learn takes over a second; only trimming needs its word list
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text or '') if s.strip()]
+
+
+def _article_header(index: int, article: Dict[str, Any]) -> str:
+    meta = ' | '.join(part for part in (article.get('source', ''), article.get('publish_date', '')) if part)
+    header = f"[{index}] {article.get('title', '')}" + (f" ({meta})" if meta else '')
+    if article.get('cluster_size'):
+        # set by clustering.cluster_news: this article stands for a whole sub-event
+        header += f" [sub-event {article['cluster']}, {article['cluster_size']} articles]"
+    return header
+
+
+def article_tokens(article: Dict[str, Any], index: int = 1) -> int:
+    """Tokens the article takes up in build_payload's output (header, content and separator), untrimmed."""
+    return count_tokens(_article_header(index, article)) + 2 + count_tokens(article.get('content', ''))
+
+
+def _word_doc_freq(news_list: List[Dict]) -> Counter:
+    df = Counter()
+    for article in news_list:
+        df.update({w.lower() for w in _WORD_RE.findall(article.get('content', ''))})
+    return df
+
+
+def _sentence_score(position: int, sentence: str, df: Counter, n_articles: int) -> float:
+    words = [w.lower() for w in _WORD_RE.findall(sentence)]
+    stop_words = _stop_words()
+    content_words = [w for w in words if w not in stop_words]
+    if not content_words:
+        return 0.0
+    # words shared by many articles of the set are on-topic; rare noise words score low
+    topical = sum(math.log1p(df.get(w, 0)) for w in content_words) / math.log1p(n_articles + 1)
+    score = topical / math.sqrt(len(content_words))
+    if any(ch.isdigit() for ch in sentence):
+        score *= 1.2  # dates, figures and amounts
+    if position < LEAD_SENTENCES:
+        score *= 1.5
+    return score
+
+
+def _extract(sentences: List[str], scores: List[float], tokens: List[int], budget: int) -> str:
+    """Best-scoring sentences that fit the budget, in their original order."""
+    chosen, used = set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        if used + tokens[i] <= budget:
+            chosen.add(i)
+            used += tokens[i]
+    return ' '.join(sentences[i] for i in sorted(chosen))
+
+
+def build_payload(news_list: List[Dict], token_budget: int = None,
+                  with_stats: bool = True) -> Tuple[str, Dict[str, int]]:
+    """
+    Compact text rendering of the articles for `summary_prompt`'s {news_list}.
+
+    Only title, source, publish date and content are kept (no URLs or repr
+    noise). When `token_budget` is given and the articles do not fit, the
+    content budget is shared across articles (short articles keep all their
+    text, the rest is split among the longer ones) and each long article is
+    cut down to its most informative sentences.
+
+    Returns (payload, stats) where stats has raw_tokens (the old str() of the
+    list), payload_tokens, saved_tokens and trimmed_articles. Counting those
+    tokens is a good part of the cost, so callers that only need the text
+    (e.g. packing chunks) pass with_stats=False and get empty stats.
+    """
+    headers = [_article_header(i, article) for i, article in enumerate(news_list, 1)]
+    contents = [article.get('content', '') for article in news_list]
+    trimmed = 0
+    content_tokens = [count_tokens(content) for content in contents] if token_budget is not None else []
+    header_tokens = sum(count_tokens(header) + 2 for header in headers) if token_budget is not None else 0
+    if token_budget is not None and header_tokens + sum(content_tokens) > token_budget:
+        # water-filling: articles under the fair share keep everything
+        remaining = max(token_budget - header_tokens, 0)
+        shares = [0] * len(news_list)
+        pending = sorted(range(len(news_list)), key=lambda i: content_tokens[i])
+        while pending:
+            share = remaining // len(pending)
+            i = pending.pop(0)
+            shares[i] = min(content_tokens[i], share)
+            remaining -= shares[i]
+
+        df = _word_doc_freq(news_list)
+        for i, content in enumerate(contents):
+            if content_tokens[i] <= shares[i]:
+                continue
+            sentences = split_sentences(content)
+            scores = [_sentence_score(pos, s, df, len(news_list)) for pos, s in enumerate(sentences)]
+            contents[i] = _extract(sentences, scores, [count_tokens(s) for s in sentences], shares[i])
+            trimmed += 1
+
+    payload = '\n\n'.join(f"{header}\n{content}" for header, content in zip(headers, contents))
+    if not with_stats:
+        return payload, {}
+    raw_tokens = count_tokens(str(news_list))
+    payload_tokens = count_tokens(payload)
+    return payload, {
+        'raw_tokens': raw_tokens,
+        'payload_tokens': payload_tokens,
+        'saved_tokens': raw_tokens - payload_tokens,
+        'trimmed_articles': trimmed,
+    }
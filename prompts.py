@@ -77,4 +77,113 @@ Must strictly use the following JSON format:
 - Ensure entity names are accurate and error-free
 - Cover all important aspects in summary, avoid missing key information
 - If certain entity categories have no relevant information, return empty arrays
-"""
\ No newline at end of file
+- An article header may end with [sub-event N, K articles]: that article represents a sub-event covered by K articles in total, so give sub-events weight in proportion to K
+"""
+
+# Map step of the map-reduce summary: one call per chunk of articles.
+chunk_summary_prompt = """
+You are a professional news analysis assistant. You are given one batch of news articles about a news key event. Other batches are analysed separately and all partial analyses will be merged later, so extract everything relevant from this batch without worrying about overall balance.
+
+## Input Information:
+- News Key Event: {key_event}
+- News Articles (batch {chunk_index} of {chunk_count}): {news_list}
+
+## Analysis Requirements:
+1. Topic: a 3-5 word English topic name for the event as covered in this batch
+2. Entities: all organizations, people, locations and key terms (technical terms, policy or product names) mentioned in this batch
+3. Summary: a factual summary of this batch in 100-150 words, keeping specific data and facts
+4. Timeline: every dated event in this batch, each with date (YYYY-MM-DD), event title and description
+
+## Output Format Requirements:
+Must strictly use the following JSON format:
+
+{{
+    "topic": "Extracted topic name",
+    "entities": {{
+        "organizations": ["Organization 1", ...],
+        "people": ["Person 1", ...],
+        "locations": ["Location 1", ...],
+        "key_terms": ["Term 1", ...]
+    }},
+    "summary": "Summary of this batch",
+    "timeline": [
+        {{
+            "date": "2024-01-15",
+            "event": "Event Title",
+            "description": "Specific description of what happened"
+        }}
+    ]
+}}
+
+## Important Notes:
+- All information must be based on the provided articles, no additional information
+- Use consistent YYYY-MM-DD date format
+- If certain entity categories have no relevant information, return empty arrays
+"""
+
+
+# Reduce step of the map-reduce summary: merges partial analyses into the final result.
+reduce_summary_prompt = """
+You are a professional news analysis assistant. Several batches of news articles about one news key event were analysed separately. Merge the partial analyses below into a single final analysis.
+
+## Input Information:
+- News Key Event: {key_event}
+- Partial Analyses (JSON): {partial_results}
+
+## Merge Requirements:
+
+### 1. Topic Identification
+- One accurate and comprehensive topic name that reflects the core event, 3-5 words in English
+
+### 2. Entity Extraction
+- Merge organizations, people, locations and key terms, removing duplicates and variant spellings of the same entity
+- Keep the most representative 5-8 key terms
+
+### 3. Content Summary
+- Start with an overall overview
+- Use numbered lists for major developments
+- Include specific data and facts in each point
+- Conclude with trends or impacts
+- Use concise professional language, 150-250 words
+
+### 4. Timeline Summary
+- Select the 4-6 most milestone events across all partial timelines, merging duplicates
+- Each event should include an accurate date (YYYY-MM-DD), event title and description
+- Ensure correct chronological order
+
+## Output Format Requirements:
+Must strictly use the following JSON format:
+
+{{
+    "topic": "Extracted topic name",
+    "entities": {{
+        "organizations": ["Organization 1", "Organization 2", ...],
+        "people": ["Person 1", "Person 2", ...],
+        "locations": ["Location 1", "Location 2", ...],
+        "key_terms": ["Term 1", "Term 2", ...]
+    }},
+    "summary": "Structured summary content using clear paragraphs and numbering",
+    "timeline": [
+        {{
+            "date": "2024-01-15",
+            "event": "Event Title",
+            "description": "Specific description of what happened"
+        }}
+    ]
+}}
+
+## Important Notes:
+- Only use information contained in the partial analyses, no additional information
+- Maintain objectivity and neutrality, no subjective evaluations
+- If certain entity categories have no relevant information, return empty arrays
+"""
+
+
+# Appended to a summary prompt to re-request only the fields a previous answer was missing.
+missing_fields_prompt = """
+## Partial Result
+A previous answer to this request was incomplete. These fields were already extracted:
+{partial_result}
+
+Output a JSON object containing ONLY the following fields, in the format described above: {missing_fields}
+"""
@@ -0,0 +1,252 @@
+"""
+Adaptive request pacing shared by every crawler.
+
+Each domain gets a token bucket whose rate follows AIMD: every healthy
+response adds CRAWL_RATE_INCREASE requests/s (up to CRAWL_MAX_RATE), and
+every throttled (429/503) or failed (5xx, timeout, connection error)
+response multiplies the rate by CRAWL_RATE_DECREASE (down to
+CRAWL_MIN_RATE). A Retry-After header pauses the domain for that long. So
+a site is crawled as fast as it tolerates instead of at a fixed
+worst-case pace. A global bucket caps requests across all domains.
+
+Every domain also has a circuit breaker. After CRAWL_BREAKER_FAILURES
+failures in a row it opens: requests fail fast with CircuitOpenError for
+CRAWL_BREAKER_COOLDOWN seconds, then one probe request decides whether it
+closes again.
+
+    scheduler = get_rate_scheduler()
+    with pool.lease() as driver:
+        with scheduler.request(url):      # browser loads: exceptions count as failures,
+            driver.get(url)               # so keep only the load itself inside
+
+    scheduler.acquire(url)                # HTTP: report the status yourself
+    resp = client.get(url)
+    scheduler.record(url, resp.status_code, retry_after=resp.headers.get('Retry-After'))
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import metrics
+
+# requests/s per domain at the start; 0 turns pacing off (e.g. for a local test site)
+CRAWL_RATE = float(os.getenv("CRAWL_RATE", 1.0))
+CRAWL_MIN_RATE = float(os.getenv("CRAWL_MIN_RATE", 0.2))
+CRAWL_MAX_RATE = float(os.getenv("CRAWL_MAX_RATE", 8.0))
+# requests a domain may make at once after being idle
+CRAWL_BURST = float(os.getenv("CRAWL_BURST", 2))
+CRAWL_RATE_INCREASE = float(os.getenv("CRAWL_RATE_INCREASE", 0.2))
+CRAWL_RATE_DECREASE = float(os.getenv("CRAWL_RATE_DECREASE", 0.5))
+# requests/s across all domains; 0 for no global cap
+CRAWL_GLOBAL_RATE = float(os.getenv("CRAWL_GLOBAL_RATE", 20))
+CRAWL_BREAKER_FAILURES = int(os.getenv("CRAWL_BREAKER_FAILURES", 5))
+CRAWL_BREAKER_COOLDOWN = float(os.getenv("CRAWL_BREAKER_COOLDOWN", 60))
+
+THROTTLE_STATUSES = {429, 503}
+
+
+class CircuitOpenError(Exception):
+    """The domain failed too often recently; the request was not made."""
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc or url
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """Token bucket that hands out reservations: a negative balance is the queue of callers already waiting."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class _Domain:
+    def __init__(self, rate: float, burst: float):
+        self.bucket = _Bucket(rate, burst)
+        self.paused_until = 0.0
+        self.failures = 0  # in a row
+        self.state = 'closed'  # closed, open or half-open
+        self.open_until = 0.0
+        self.probing = False
+        self.probe_until = 0.0  # a probe that never reports back stops blocking the domain then
+        self.requests = 0
+        self.throttled = 0
+
+
+class RateScheduler:
+    """Per-domain adaptive token buckets, circuit breakers and a global bucket. Thread-safe."""
+
+    def __init__(self, rate: float = CRAWL_RATE, min_rate: float = CRAWL_MIN_RATE, max_rate: float = CRAWL_MAX_RATE,
+                 burst: float = CRAWL_BURST, increase: float = CRAWL_RATE_INCREASE,
+                 decrease: float = CRAWL_RATE_DECREASE, global_rate: float = CRAWL_GLOBAL_RATE,
+                 breaker_failures: int = CRAWL_BREAKER_FAILURES, breaker_cooldown: float = CRAWL_BREAKER_COOLDOWN):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._global = _Bucket(global_rate, max(burst, global_rate))
+        self._domains: Dict[str, _Domain] = {}
+        self._lock = threading.Lock()
+
+    def _domain(self, host: str) -> _Domain:
+        domain = self._domains.get(host)
+        if domain is None:
+            domain = self._domains[host] = _Domain(self.rate, self.burst)
+        return domain
+
+    def reserve(self, url: str) -> float:
+        """
+        Claim the next request slot for url's domain and return how many
+        seconds to wait before sending it. Raises CircuitOpenError instead
+        while the domain's breaker is open. Every successful reserve must be
+        followed by a record(), also when the request raises; a half-open
+        probe that is never recorded expires after the cooldown.
+        """
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            domain = self._domain(host)
+            if domain.state == 'open':
+                if now < domain.open_until:
+                    metrics.inc('crawl_circuit_rejected_total', host=host)
+                    raise CircuitOpenError(f"circuit open for {host}")
+                domain.state = 'half-open'
+            if domain.state == 'half-open':
+                if domain.probing and now < domain.probe_until:
+                    metrics.inc('crawl_circuit_rejected_total', host=host)
+                    raise CircuitOpenError(f"circuit half-open for {host}, probe in flight")
+                domain.probing, domain.probe_until = True, now + self.breaker_cooldown
+            domain.requests += 1
+            wait = max(domain.bucket.reserve(now), self._global.reserve(now), domain.paused_until - now)
+        if wait > 0:
+            metrics.observe('crawl_rate_wait_seconds', wait, host=host)
+        return wait
+
+    def acquire(self, url: str):
+        """Block until a request to url may be sent."""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str):
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, url: str, status: int = 200, error: bool = False, retry_after: Any = None):
+        """
+        Report how a request went: an HTTP status, or error=True for
+        timeouts and connection failures. Adjusts the domain's rate and breaker.
+        """
+        host = host_of(url)
+        throttled = status in THROTTLE_STATUSES
+        failed = error or throttled or status >= 500 or status == 0
+        pause = parse_retry_after(retry_after) if isinstance(retry_after, str) else retry_after
+        with self._lock:
+            now = time.monotonic()
+            domain = self._domain(host)
+            bucket = domain.bucket
+            if failed:
+                domain.failures += 1
+                if throttled:
+                    domain.throttled += 1
+                if bucket.rate > 0:
+                    bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                    bucket.tokens = min(bucket.tokens, 0.0)  # no burst right after a throttle
+                if pause:
+                    domain.paused_until = max(domain.paused_until, now + pause)
+                if domain.state == 'half-open' or domain.failures >= self.breaker_failures:
+                    if domain.state != 'open':
+                        print(f"Circuit open for {host} after {domain.failures} failures, "
+                              f"pausing {self.breaker_cooldown:g}s")
+                        metrics.inc('crawl_circuit_opened_total', host=host)
+                    domain.state, domain.open_until = 'open', now + self.breaker_cooldown
+            else:
+                domain.failures = 0
+                if domain.state != 'closed':
+                    print(f"Circuit closed for {host}")
+                domain.state = 'closed'
+                if bucket.rate > 0:
+                    bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+            domain.probing = False
+            rate = bucket.rate
+        metrics.inc('crawl_responses_total', host=host,
+                    outcome='throttled' if throttled else 'failed' if failed else 'ok')
+        metrics.set_gauge('crawl_rate', rate, host=host)
+
+    @contextmanager
+    def request(self, url: str):
+        """
+        Pace one request whose status is not visible (a browser page load); an
+        exception counts as a failure, so wrap only the load, not lease waits
+        or selector timeouts.
+        """
+        self.acquire(url)
+        try:
+            yield
+        except BaseException:
+            self.record(url, error=True)
+            raise
+        self.record(url)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {host: {'rate': round(domain.bucket.rate, 3), 'state': domain.state,
+                           'requests': domain.requests, 'throttled': domain.throttled,
+                           'failures': domain.failures}
+                    for host, domain in self._domains.items()}
+
+
+_default_scheduler: Optional[RateScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_rate_scheduler() -> RateScheduler:
+    """Process-wide scheduler, shared by all crawler threads."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RateScheduler()
+        return _default_scheduler
+
+
+def set_rate_scheduler(scheduler: Optional[RateScheduler]) -> Optional[RateScheduler]:
+    """Replace the process-wide scheduler (e.g. for benchmarks), returning the old one."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        old, _default_scheduler = _default_scheduler, scheduler
+    return old
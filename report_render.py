@@ -0,0 +1,130 @@
+"""
+Rendering of the HTML topic reports.
+
+The report template is compiled once per process by a long-lived jinja2
+Environment, whose bytecode cache (in .cache/jinja) also lets later
+processes skip compilation. Pages are streamed to disk chunk by chunk
+instead of being built as one string, so memory stays flat however many
+articles or topics are rendered. Each page can also be written pre-gzipped
+next to the HTML for serving.
+"""
+import gzip
+import io
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+import metrics
+from cache_store import CACHE_DIR
+
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_NAME = 'template.html'
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+# rendered text is collected into writes of about this many characters
+WRITE_BUFFER = 64 * 1024
+
+_environment: Optional[Environment] = None
+_environment_lock = threading.Lock()
+
+
+def get_environment() -> Environment:
+    """Process-wide jinja2 environment; templates are reloaded only when the file changes."""
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            bytecode_dir = os.path.join(CACHE_DIR, 'jinja')
+            os.makedirs(bytecode_dir, exist_ok=True)
+            _environment = Environment(
+                loader=FileSystemLoader(TEMPLATE_DIR),
+                bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+                auto_reload=True,
+            )
+        return _environment
+
+
+def render_context(processed_data: Dict[str, Any], news_list: List[Dict], generated_date: str = None) -> Dict:
+    # sub-events from clustering.cluster_news, if the summary was built from them
+    clusters = processed_data.get('clusters') or []
+    return {
+        'topic': processed_data['topic'],
+        'summary': processed_data['summary'],
+        'entities': processed_data['entities'],
+        'timeline': processed_data['timeline'],
+        'news_articles': news_list,
+        'clusters': clusters,
+        'cluster_of': {url: cluster['id'] for cluster in clusters for url in cluster['urls']},
+        'generated_date': generated_date or datetime.now().strftime("%B %d, %Y %H:%M"),
+    }
+
+
+def render_html(processed_data: Dict[str, Any], news_list: List[Dict]) -> str:
+    """The whole page as one string."""
+    template = get_environment().get_template(TEMPLATE_NAME)
+    return template.render(render_context(processed_data, news_list))
+
+
+def _buffered(chunks: Iterable[str]) -> Iterable[str]:
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= WRITE_BUFFER:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _open_gzip(path: str):
+    # mtime=0 keeps the .gz byte-identical for identical pages
+    raw = gzip.GzipFile(path, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def render_to_file(processed_data: Dict[str, Any], news_list: List[Dict], output_file: str,
+                   compress: bool = False) -> str:
+    """
+    Stream the page into output_file, plus output_file + '.gz' with `compress`.
+    Files are written under a temporary name and moved into place when complete,
+    so a reader never sees a half-written page.
+    """
+    template = get_environment().get_template(TEMPLATE_NAME)
+    targets = [(output_file, output_file + '.tmp')]
+    if compress:
+        targets.append((output_file + '.gz', output_file + '.gz.tmp'))
+
+    outputs = []
+    try:
+        outputs.append(open(targets[0][1], 'w', encoding='utf-8'))
+        if compress:
+            outputs.append(_open_gzip(targets[1][1]))
+        with metrics.timer('render_seconds'):
+            for chunk in _buffered(template.generate(render_context(processed_data, news_list))):
+                for f in outputs:
+                    f.write(chunk)
+    except BaseException:
+        for f in outputs:
+            f.close()
+        for _, tmp in targets:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    for f in outputs:
+        f.close()
+    for path, tmp in targets:
+        os.replace(tmp, path)
+    metrics.inc('render_bytes_total', os.path.getsize(output_file))
+    return output_file
+
+
+def render_batch(jobs: Iterable[Tuple[Dict[str, Any], List[Dict], str]], compress: bool = False) -> List[str]:
+    """
+    Render many reports with the one compiled template.
+    `jobs` yields (processed_data, news_list, output_file); pass a generator to
+    keep only one topic's data in memory at a time.
+    """
+    return [render_to_file(processed_data, news_list, output_file, compress=compress)
+            for processed_data, news_list, output_file in jobs]
@@ -0,0 +1,363 @@
+"""
+Long-running service: refreshes a set of topics on a schedule and serves
+the latest reports over HTTP.
+
+Everything expensive is created once and stays warm between refreshes: the
+browser pool, the HTTP client pools, one LLM client, the article, LLM and
+watermark caches and, with --dedup-index, the dedup index. Every topic is
+refreshed every `interval` seconds, give or take `jitter` (a fraction of the
+interval), so topics drift apart instead of hitting the news sites
+together. Topics due at the same time are run as one batch (see
+batch_runner.run_topics). Crawls are incremental unless --full is given.
+With --dedup-index a refresh that finds new stories replaces the topic's
+page with a report on those new stories only; earlier ones are not repeated.
+
+Reports are written under a temporary name and moved into place, so the
+HTTP side always has a complete page to serve and readers never wait on a
+pipeline run. Pages are sent with a content-hash ETag (304 on a matching
+If-None-Match) and pre-gzipped when the client accepts it.
+
+    GET /                 index of topics with their last refresh
+    GET /<topic>.html     latest report
+    GET /status           JSON: per-topic schedule, status and error
+    GET /metrics          Prometheus metrics (with --metrics)
+
+Usage:
+    python service.py Tesla "Federal Reserve" --interval 3600 --port 8000
+    python service.py --topics-file topics.txt --interval 1800 --jitter 0.2 --metrics
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import random
+import signal
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from article_store import get_article_store
+from batch_runner import CRAWL_WORKERS, LLM_WORKERS, run_topics, topic_filename, unique_topics
+from dedup_index import DedupIndex
+from news_pipeline import create_llm
+from rate_scheduler import get_rate_scheduler
+from watermarks import get_watermark_store
+
+SERVICE_INTERVAL = float(os.getenv("SERVICE_INTERVAL", 3600))
+# each refresh is scheduled interval * (1 +/- SERVICE_JITTER) after the last one
+SERVICE_JITTER = float(os.getenv("SERVICE_JITTER", 0.1))
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8000))
+# a failed refresh is retried after this long instead of a full interval
+SERVICE_RETRY = float(os.getenv("SERVICE_RETRY", 300))
+
+
+class ReportService:
+    """
+    Schedule of the topics plus the shared pipeline resources.
+    pipeline_kwargs: passed to every NewsSummaryPipeline (llm, watermarks, ...).
+    """
+
+    def __init__(self, topics: List[str], output_dir: str = 'reports', interval: float = SERVICE_INTERVAL,
+                 jitter: float = SERVICE_JITTER, crawl_workers: int = CRAWL_WORKERS,
+                 llm_workers: int = LLM_WORKERS, **pipeline_kwargs):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.jitter = jitter
+        self.crawl_workers = crawl_workers
+        self.llm_workers = llm_workers
+        self.pipeline_kwargs = pipeline_kwargs
+        self.pipeline_kwargs.setdefault('gzip_output', True)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        os.makedirs(output_dir, exist_ok=True)
+        now = time.time()
+        # topic -> {'file', 'status', 'last_run', 'next_run', 'articles', 'seconds', 'error'}
+        self.topics: Dict[str, Dict[str, Any]] = {}
+        for topic in unique_topics(topics):
+            path = os.path.join(output_dir, topic_filename(topic))
+            last_run = os.path.getmtime(path) if os.path.exists(path) else None
+            # a report from before a restart is served until it is due again
+            self.topics[topic] = {
+                'file': topic_filename(topic),
+                'status': 'ok' if last_run else 'pending',
+                'last_run': last_run,
+                'next_run': self._next_run(last_run) if last_run else now,
+                'articles': None,
+                'seconds': None,
+                'error': '',
+            }
+
+    def _next_run(self, after: float, delay: float = None) -> float:
+        delay = self.interval if delay is None else delay
+        return after + delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def report_path(self, name: str) -> Optional[str]:
+        """Path of a topic's report ('<topic>.html'); None for anything else."""
+        with self._lock:
+            served = {entry['file'] for entry in self.topics.values()}
+        return os.path.join(self.output_dir, name) if name in served else None
+
+    def due(self, now: float = None) -> List[str]:
+        now = time.time() if now is None else now
+        with self._lock:
+            return [topic for topic, entry in self.topics.items() if entry['next_run'] <= now]
+
+    def refresh(self, topics: List[str]) -> List[Dict[str, Any]]:
+        """Run the pipeline for these topics now and reschedule them."""
+        with self._lock:
+            for topic in topics:
+                self.topics[topic]['status'] = 'running'
+        # reports already carry status, errors and timings; failures never raise
+        reports = run_topics(topics, self.output_dir, crawl_workers=self.crawl_workers,
+                             llm_workers=self.llm_workers, **self.pipeline_kwargs)
+        now = time.time()
+        with self._lock:
+            for report in reports:
+                entry = self.topics[report['topic']]
+                failed = report['status'] == 'failed'
+                entry.update(status=report['status'], articles=report.get('articles'),
+                             seconds=report.get('total'), error=report.get('error', ''),
+                             next_run=self._next_run(now, SERVICE_RETRY if failed else None))
+                if not failed:
+                    entry['last_run'] = now
+                metrics.inc('service_refresh_total', status=report['status'])
+        return reports
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'interval': self.interval, 'jitter': self.jitter,
+                    'topics': {topic: dict(entry) for topic, entry in self.topics.items()},
+                    'sites': get_rate_scheduler().stats()}
+
+    def _run(self):
+        while not self._stop.is_set():
+            topics = self.due()
+            if topics:
+                print(f"Refreshing {len(topics)} topic(s): {', '.join(topics)}")
+                self.refresh(topics)
+                continue
+            with self._lock:
+                wait = min(entry['next_run'] for entry in self.topics.values()) - time.time()
+            self._wake.wait(max(wait, 0))
+            self._wake.clear()
+
+    def start(self):
+        """Start refreshing in a background thread."""
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop scheduling; a refresh already running is waited for up to `timeout` seconds."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class _CachedFile:
+    """A served file's bytes and ETag, valid while its mtime and size are unchanged."""
+
+    def __init__(self, path: str, stat: os.stat_result):
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        self.key = (stat.st_mtime_ns, stat.st_size)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.last_modified = stat.st_mtime
+
+
+_file_cache: Dict[str, _CachedFile] = {}
+_file_cache_lock = threading.Lock()
+
+
+def cached_file(path: str) -> Optional[_CachedFile]:
+    """The file as last read, re-read only after the pipeline replaced it."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached is None or cached.key != (stat.st_mtime_ns, stat.st_size):
+            cached = _file_cache[path] = _CachedFile(path, stat)
+        return cached
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    server_version = 'NewsSummary'
+
+    @property
+    def service(self) -> ReportService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        # one line per request would drown the pipeline's own output
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head: bool = False):
+        path = self.path.split('?', 1)[0]
+        endpoint = path if path in ('/', '/status', '/metrics') else 'report'
+        metrics.inc('service_requests_total', endpoint=endpoint)
+        if path in ('/', '/index.html'):
+            body, content_type = self._index().encode('utf-8'), 'text/html; charset=utf-8'
+            self._send_body(body, content_type, head)
+        elif path == '/status':
+            body = json.dumps(self.service.status(), indent=2, ensure_ascii=False).encode('utf-8')
+            self._send_body(body, 'application/json', head)
+        elif path == '/metrics' and metrics.enabled():
+            self._send_body(metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4', head)
+        else:
+            report = self.service.report_path(path.lstrip('/'))
+            if report is None:
+                self._send_error(HTTPStatus.NOT_FOUND, head)
+            else:
+                self._send_report(report, head)
+
+    def _index(self) -> str:
+        rows = []
+        for topic, entry in self.service.status()['topics'].items():
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_run'])) if entry['last_run'] else '-'
+            name = html.escape(topic)
+            link = f'<a href="/{entry["file"]}">{name}</a>' if entry['last_run'] else name
+            rows.append(f'<tr><td>{link}</td><td>{when}</td><td>{html.escape(entry["status"])}</td></tr>')
+        return ('<!DOCTYPE html><html><head><meta charset="UTF-8"><title>News summaries</title></head><body>'
+                '<h1>News summaries</h1><table><tr><th>Topic</th><th>Updated</th><th>Status</th></tr>'
+                + ''.join(rows) + '</table></body></html>')
+
+    def _accepts_gzip(self) -> bool:
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+
+    def _pick_variant(self, path: str) -> Tuple[Optional[_CachedFile], bool]:
+        """(file to send, whether it is the gzip variant)"""
+        page = cached_file(path)
+        if page is None or not self._accepts_gzip():
+            return page, False
+        compressed = cached_file(path + '.gz')
+        # a .gz left over from an older render must not be served for a newer page
+        if compressed is not None and compressed.last_modified >= page.last_modified:
+            return compressed, True
+        return page, False
+
+    def _send_report(self, path: str, head: bool):
+        page, compressed = self._pick_variant(path)
+        if page is None:
+            # scheduled but not rendered yet
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, head, retry_after=60)
+            return
+        etag = page.etag[:-1] + ('-gz"' if compressed else '"')
+        headers = {
+            'ETag': etag,
+            'Last-Modified': self.date_time_string(page.last_modified),
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+        if etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+            metrics.inc('service_not_modified_total')
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        self._send_body(page.body, 'text/html; charset=utf-8', head, headers)
+
+    def _send_body(self, body: bytes, content_type: str, head: bool, headers: Dict[str, str] = None):
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, head: bool, retry_after: int = None):
+        body = f'{status.value} {status.phrase}\n'.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+def serve(service: ReportService, host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> ThreadingHTTPServer:
+    """An HTTP server for the service's reports; call serve_forever() on it."""
+    server = ThreadingHTTPServer((host, port), ReportHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('topics', nargs='*')
+    parser.add_argument('--topics-file', help='file with one topic per line')
+    parser.add_argument('--output-dir', default='reports')
+    parser.add_argument('--interval', type=float, default=SERVICE_INTERVAL, help='seconds between refreshes')
+    parser.add_argument('--jitter', type=float, default=SERVICE_JITTER, help='fraction of the interval')
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--crawl-workers', type=int, default=CRAWL_WORKERS)
+    parser.add_argument('--llm-workers', type=int, default=LLM_WORKERS)
+    parser.add_argument('--full', action='store_true', help='crawl everything on every refresh, not only new results')
+    parser.add_argument('--dedup-index', action='store_true',
+                        help='keep a report until new stories arrive instead of re-summarizing every refresh; '
+                             'the refreshed report then covers only the new stories')
+    parser.add_argument('--store', action='store_true', help='keep every crawl in the article store')
+    parser.add_argument('--metrics', action='store_true', help='collect metrics and serve them at /metrics')
+    args = parser.parse_args()
+
+    topics = list(args.topics)
+    if args.topics_file:
+        with open(args.topics_file, encoding='utf-8') as f:
+            topics += [line.strip() for line in f if line.strip()]
+    if not topics:
+        parser.error('no topics given')
+    try:
+        topics = unique_topics(topics)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.metrics:
+        metrics.enable()
+
+    service = ReportService(
+        topics, args.output_dir, interval=args.interval, jitter=args.jitter, crawl_workers=args.crawl_workers,
+        llm_workers=args.llm_workers, llm=create_llm(),
+        watermarks=None if args.full else get_watermark_store(),
+        dedup_index=DedupIndex.load() if args.dedup_index else None,
+        article_store=get_article_store() if args.store else None)
+    server = serve(service, args.host, args.port)
+
+    def shutdown(signum, frame):
+        # serve_forever() returns once shutdown() runs, which must not be called from its own thread
+        threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGTERM, shutdown)
+
+    service.start()
+    print(f"Serving {len(topics)} topics on http://{args.host}:{args.port}/ "
+          f"(refresh every {args.interval:.0f}s +/- {args.jitter:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop(timeout=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers.base import BaseOutputParser
+from langchain_core.prompts import PromptTemplate
+
+import metrics
+from prompts import chunk_summary_prompt, missing_fields_prompt, reduce_summary_prompt
+from tokens import MAX_LLM_CONCURRENCY, SUMMARY_TOKEN_BUDGET, count_tokens
+
+SUMMARY_FIELDS = ['topic', 'entities', 'summary', 'timeline']
+
+
+class IncrementalJSONParser:
+    """
+    Parses the top-level fields of a JSON object as its text arrives.
+
+    `feed` returns the fields completed by the new text. Anything before the
+    opening brace (code fences, chatter) and after the closing one is
+    ignored, trailing commas are dropped, and each field is parsed on its
+    own, so one malformed field does not lose the others. `finish` also
+    accepts a last field left unterminated when the output stops after a
+    complete value; a field cut off mid-value is left out so it can be
+    requested again.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.closed = False
+        self._text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._segment_start = None
+
+    def _emit(self, segment: str) -> Dict[str, Any]:
+        segment = _strip_trailing_commas(segment).strip()
+        if not segment:
+            return {}
+        try:
+            field = json.loads('{' + segment + '}')
+        except json.JSONDecodeError:
+            print(f"Skipping malformed field: {segment[:80]}")
+            return {}
+        self.fields.update(field)
+        return field
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        completed = {}
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text) and not self.closed:
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._segment_start is None:
+                if ch == '{':
+                    self._depth = 1
+                    self._segment_start = self._pos + 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.update(self._emit(text[self._segment_start:self._pos]))
+                    self.closed = True
+            elif ch == ',' and self._depth == 1:
+                completed.update(self._emit(text[self._segment_start:self._pos]))
+                self._segment_start = self._pos + 1
+            self._pos += 1
+        return completed
+
+    def finish(self) -> Dict[str, Any]:
+        if not self.closed and self._segment_start is not None and self._depth == 1 and not self._in_string:
+            self._emit(self._text[self._segment_start:])
+        return self.fields
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing bracket, outside strings."""
+    out, in_string, escape = [], False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '}]':
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+        out.append(ch)
+    text = ''.join(out).rstrip()
+    return text[:-1] if text.endswith(',') else text
+
+
+class SummaryParser(BaseOutputParser):
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        parser = IncrementalJSONParser()
+        parser.feed(text)
+        data = parser.finish()
+        if not data:
+            return {
+                'topic': 'na',
+                'entities': 'na',
+                'summary': 'na',
+                'timeline': 'na',
+            }
+
+        # validate required fields
+        required_fields = ['topic', 'entities', 'summary', 'timeline']
+        for field in required_fields:
+            if field not in data:
+                print(f"{field} is not in result")
+                data[field] = 'na'
+
+        return data
+
+
+def stream_summary(llm, template: str, inputs: Dict[str, Any],
+                   on_field: Callable[[str, Any], None] = None) -> Dict[str, Any]:
+    """
+    Run `template` with streaming, handing each field to `on_field` as soon
+    as it is complete. Fields that are missing or malformed at the end are
+    requested again with `missing_fields_prompt` (once, only those fields)
+    instead of rerunning the whole summary.
+    """
+    parser = IncrementalJSONParser()
+    for chunk in (PromptTemplate.from_template(template) | llm).stream(inputs, config=llm_config()):
+        for field, value in parser.feed(chunk.content).items():
+            if on_field is not None:
+                on_field(field, value)
+    data = dict(parser.finish())
+
+    missing = [field for field in SUMMARY_FIELDS if field not in data]
+    if missing:
+        print(f"Requesting missing fields: {', '.join(missing)}")
+        retry = IncrementalJSONParser()
+        retry.feed((PromptTemplate.from_template(template + missing_fields_prompt) | llm).invoke({
+            **inputs,
+            'partial_result': json.dumps(data, ensure_ascii=False),
+            'missing_fields': ', '.join(missing),
+        }, config=llm_config()).content)
+        for field, value in retry.finish().items():
+            if field in missing:
+                data[field] = value
+                if on_field is not None:
+                    on_field(field, value)
+
+    # same contract as SummaryParser
+    return SummaryParser().parse(json.dumps(data, ensure_ascii=False))
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Records per-call latency, time to first token and prompt/completion tokens in `metrics`."""
+
+    def __init__(self):
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        params = kwargs.get('invocation_params') or {}
+        model = (metadata or {}).get('ls_model_name') or params.get('model_name') or params.get('model') or 'unknown'
+        prompt_tokens = sum(count_tokens(str(m.content)) for batch in messages for m in batch)
+        with self._lock:
+            self._runs[run_id] = {'start': time.perf_counter(), 'model': model,
+                                  'prompt_tokens': prompt_tokens, 'first_token': None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run['first_token'] is None:
+                run['first_token'] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        model = run['model']
+        metrics.inc('llm_requests_total', model=model)
+        metrics.observe('llm_request_seconds', time.perf_counter() - run['start'], model=model)
+        if run['first_token'] is not None:
+            metrics.observe('llm_first_token_seconds', run['first_token'] - run['start'], model=model)
+
+        # provider-reported usage when available, otherwise our own count
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        prompt_tokens = usage.get('prompt_tokens') or run['prompt_tokens']
+        completion_tokens = usage.get('completion_tokens') or sum(
+            count_tokens(generation.text) for generations in response.generations for generation in generations)
+        metrics.inc('llm_prompt_tokens_total', prompt_tokens, model=model)
+        metrics.inc('llm_completion_tokens_total', completion_tokens, model=model)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        metrics.inc('llm_errors_total', model=run['model'] if run else 'unknown')
+
+
+_metrics_handler = LLMMetricsHandler()
+
+
+def llm_config(**config) -> Dict[str, Any]:
+    """Runnable config for LLM calls, with the metrics callback when metrics are on."""
+    if metrics.enabled():
+        config['callbacks'] = [_metrics_handler]
+    return config
+
+
+def is_empty_result(result: Dict[str, Any]) -> bool:
+    return not result or all(result.get(field) == 'na' for field in SUMMARY_FIELDS)
+
+
+def pack_chunks(items: List[Any], token_budget: int, render: Callable[[List[Any]], str]) -> List[List[Any]]:
+    """
+    Greedily pack items, in order, into chunks whose rendering fits token_budget.
+    An item that is too large on its own gets a chunk to itself.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for item in items:
+        tokens = count_tokens(render([item]))
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _cached_abatch(chain, inputs: List[Dict[str, Any]], keys: List[str], cache, config) -> List[Any]:
+    """chain.abatch over inputs, answering the ones whose key is cached without calling the model."""
+    results = [cache.get(key) if cache is not None else None for key in keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        fresh = await chain.abatch([inputs[i] for i in pending], config=config, return_exceptions=True)
+        for i, result in zip(pending, fresh):
+            results[i] = result
+            if cache is not None and not isinstance(result, Exception) and not is_empty_result(result):
+                cache.set(keys[i], result)
+    return results
+
+
+async def amap_reduce_summary(llm, key_event: str, news_list: List[Dict], token_budget: int = SUMMARY_TOKEN_BUDGET,
+                              max_concurrency: int = MAX_LLM_CONCURRENCY,
+                              render: Callable[[List[Dict]], str] = str, cache=None) -> Dict[str, Any]:
+    """
+    Hierarchical summary for article sets too large for one prompt.
+
+    Map: articles are packed into token-budgeted chunks, and every chunk is
+    summarized concurrently (at most `max_concurrency` calls in flight).
+    Reduce: the partial results are merged with `reduce_summary_prompt`,
+    in several rounds if they do not fit one call. The result has the same
+    topic/entities/summary/timeline structure as the single-call path.
+
+    With an `llm_cache.LLMCache`, chunk and merge results are cached, so
+    when only some articles change only the affected chunks are re-summarized.
+    """
+    config = llm_config(max_concurrency=max_concurrency)
+
+    chunks = pack_chunks(news_list, token_budget, render)
+    print(f"Summarizing {len(news_list)} articles in {len(chunks)} chunks")
+    map_chain = PromptTemplate.from_template(chunk_summary_prompt) | llm | SummaryParser()
+    partials = await _cached_abatch(map_chain, [
+        {'key_event': key_event, 'news_list': render(chunk), 'chunk_index': i, 'chunk_count': len(chunks)}
+        for i, chunk in enumerate(chunks, 1)
+    ], [
+        # batch numbering only labels the prompt, so it is left out of the key
+        cache.key(llm, chunk_summary_prompt, key_event=key_event, news_list=chunk, token_budget=token_budget)
+        if cache is not None else None
+        for chunk in chunks
+    ], cache, config)
+    partials = [p for p in partials if not isinstance(p, Exception) and not is_empty_result(p)]
+    if not partials:
+        raise RuntimeError("every chunk summary failed")
+
+    reduce_chain = PromptTemplate.from_template(reduce_summary_prompt) | llm | SummaryParser()
+    to_json = lambda group: json.dumps(group, ensure_ascii=False)
+    while True:
+        groups = pack_chunks(partials, token_budget, to_json)
+        if 1 < len(partials) <= len(groups):
+            # partials too large to share a call: merge pairwise so every round shrinks
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        # a single partial has nothing left to merge, but still goes through
+        # one reduce call so the final output follows the final-summary rules
+        merged = await _cached_abatch(reduce_chain, [
+            {'key_event': key_event, 'partial_results': to_json(group)} for group in groups
+        ], [
+            cache.key(llm, reduce_summary_prompt, key_event=key_event, partial_results=to_json(group))
+            if cache is not None else None
+            for group in groups
+        ], cache, config)
+        merged = [m for m in merged if not isinstance(m, Exception) and not is_empty_result(m)]
+        if not merged:
+            raise RuntimeError("merging chunk summaries failed")
+        if len(groups) == 1:
+            return merged[0]
+        partials = merged
+
+
+def map_reduce_summary(llm, key_event: str, news_list: List[Dict], **kwargs) -> Dict[str, Any]:
+    """Blocking wrapper around `amap_reduce_summary`."""
+    return asyncio.run(amap_reduce_summary(llm, key_event, news_list, **kwargs))
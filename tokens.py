@@ -0,0 +1,33 @@
+import re
+from functools import lru_cache
+
+# qwen-plus does not ship a tokenizer we can load locally; cl100k_base is close
+# enough for budgeting. Without tiktoken (or its encoding files) we estimate.
+TOKENIZER_ENCODING = "cl100k_base"
+
+# input tokens per LLM call before the map-reduce path is used (see summarize.py)
+SUMMARY_TOKEN_BUDGET = 12000
+# chunk summaries in flight at once
+MAX_LLM_CONCURRENCY = 4
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of prompt tokens in text (exact with tiktoken, otherwise a close estimate)."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # words and punctuation, plus a bit for sub-word splits of long words
+    return sum(1 + len(piece) // 8 for piece in _WORD_RE.findall(text))
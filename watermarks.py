@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from cache_store import CACHE_DIR, SQLiteCache
+
+# a (source, topic) not refreshed for this long starts over with a full crawl
+WATERMARK_TTL = float(os.getenv("WATERMARK_TTL", 7 * 24 * 3600))
+# articles kept per (source, topic) and merged into every refresh
+WATERMARK_MAX_ARTICLES = int(os.getenv("WATERMARK_MAX_ARTICLES", 300))
+# processed URLs remembered besides the kept articles' own, most recent first;
+# older results have long dropped off the newest-first search pages
+WATERMARK_MAX_URLS = int(os.getenv("WATERMARK_MAX_URLS", 1000))
+# consecutive already-processed search results that end a crawl of a
+# newest-first listing (CNN); a pinned or re-promoted story should not end it
+# early; 0 only skips known results. Relevance-ranked listings never stop early.
+WATERMARK_STOP_AFTER = int(os.getenv("WATERMARK_STOP_AFTER", 3))
+
+# article fields stored with the watermark
+_ARTICLE_FIELDS = ('title', 'url', 'content', 'publish_date', 'source', 'fetched_via')
+
+
+class Watermark:
+    """
+    High-water mark of one source's results for one topic: the newest
+    publish date, the URLs already processed (the kept articles' plus the
+    most recent others) and the articles collected so far. Crawlers of
+    newest-first listings use it to stop paging and fetching at the first
+    stretch of known results (`take_new`); relevance-ranked listings can only
+    skip the known ones (`unseen`). `merge` folds the new articles into the
+    stored set.
+    """
+
+    def __init__(self, source: str, topic: str, newest: str = '', urls: Iterable[str] = (),
+                 articles: List[Dict[str, Any]] = None, stop_after: int = WATERMARK_STOP_AFTER):
+        self.source = source
+        self.topic = topic
+        self.newest = newest  # 'YYYY-MM-DD' of the newest article seen, '' before the first run
+        self.urls = dict.fromkeys(urls)  # ordered set: kept articles' URLs, then the most recent others
+        self.articles = articles or []
+        self.stop_after = stop_after
+
+    def is_known(self, url: str) -> bool:
+        return url in self.urls
+
+    def _scan(self, news_list: List[Dict[str, Any]]):
+        """(unprocessed results, whether a run of `stop_after` known results ended the list)"""
+        new, known_run = [], 0
+        for news in news_list:
+            if not self.is_known(news['url']):
+                known_run = 0
+                new.append(news)
+                continue
+            known_run += 1
+            if 0 < self.stop_after <= known_run:
+                return new, True
+        return new, False
+
+    def reached(self, news_list: List[Dict[str, Any]]) -> bool:
+        """Whether a newest-first result list already runs into processed items, so paging can stop."""
+        return self._scan(news_list)[1]
+
+    def take_new(self, news_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Unprocessed results from a newest-first list, up to the first run of known ones."""
+        return self._scan(news_list)[0]
+
+    def unseen(self, news_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Unprocessed results from a list in any order (e.g. ranked by relevance)."""
+        return [news for news in news_list if not self.is_known(news['url'])]
+
+    def is_older(self, publish_date: str) -> bool:
+        """Published before the newest article of the last run (dates are ISO, so they compare as strings)."""
+        return bool(self.newest and publish_date and publish_date < self.newest)
+
+    def merge(self, new_articles: List[Dict[str, Any]], max_articles: int = WATERMARK_MAX_ARTICLES,
+              max_urls: int = WATERMARK_MAX_URLS) -> List[Dict]:
+        """
+        Fold freshly crawled articles into the stored set (newest first) and
+        return the set. Processed URLs are pruned to the kept articles' plus
+        the `max_urls` most recent others, so a long-running refresh loop does
+        not grow the watermark without bound.
+        """
+        merged, seen = [], set()
+        for article in list(new_articles) + self.articles:
+            if article['url'] in seen:
+                continue
+            seen.add(article['url'])
+            merged.append({field: article[field] for field in _ARTICLE_FIELDS if field in article})
+        merged.sort(key=lambda article: article.get('publish_date') or '', reverse=True)
+        self.articles = merged[:max_articles]
+        recent = [article['url'] for article in new_articles] + list(self.urls)
+        kept = [article['url'] for article in self.articles]
+        self.urls = dict.fromkeys(kept + list(dict.fromkeys(recent))[:max_urls])
+        dates = [article['publish_date'] for article in new_articles if article.get('publish_date')]
+        self.newest = max(dates + [self.newest])
+        return list(self.articles)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'newest': self.newest, 'urls': list(self.urls), 'articles': self.articles}
+
+
+class WatermarkStore:
+    """Watermarks persisted per (source, topic) in .cache/watermarks.sqlite."""
+
+    def __init__(self, path: str = None, ttl: float = WATERMARK_TTL):
+        self.store = SQLiteCache(path or os.path.join(CACHE_DIR, 'watermarks.sqlite'), ttl=ttl)
+
+    @staticmethod
+    def _key(source: str, topic: str) -> str:
+        return json.dumps([source, topic.strip().lower()])
+
+    def get(self, source: str, topic: str) -> Watermark:
+        data = self.store.get(self._key(source, topic)) or {}
+        return Watermark(source, topic, **data)
+
+    def save(self, watermark: Watermark):
+        self.store.set(self._key(watermark.source, watermark.topic), watermark.to_dict())
+
+    def merge(self, watermark: Watermark, new_articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge new articles into the watermark, persist it and return the full article set."""
+        articles = watermark.merge(new_articles)
+        self.save(watermark)
+        return articles
+
+    def reset(self, source: str, topic: str):
+        self.store.delete(self._key(source, topic))
+
+
+_default_store: Optional[WatermarkStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_watermark_store() -> WatermarkStore:
+    """Process-wide watermark store."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = WatermarkStore()
+        return _default_store